@@ -0,0 +1,76 @@
+"""
+generates synthetic web traffic logs in the
+`drop,length,path,user_agent,user_id` format of the source CSVs
+"""
+import csv
+import io
+import random
+from itertools import accumulate
+
+
+def zipf_weights(count: int, skew: float) -> list[float]:
+    """
+    returns the cumulative weights of `count` values whose frequencies
+    fall off as 1 / rank ** skew, where a skew of 0 is uniform
+    """
+    return list(accumulate(1 / (rank + 1) ** skew for rank in range(count)))
+
+
+def generate_rows(
+    rows: int,
+    users: int = 1000,
+    paths: int = 100,
+    skew: float = 1.0,
+    user_agent_length: int = 120,
+    seed: int = 0
+) -> list[list[str]]:
+    """
+    returns synthetic CSV rows, without the headers row
+
+    rows  int: the number of page views to generate
+    users  int: the number of distinct user IDs
+    paths  int: the number of distinct page paths
+    skew  float: the Zipf exponent of both user and path popularity
+    user_agent_length  int: the approximate length of each user agent,
+                            which contains commas and so is quoted
+    seed  int: the seed of the random generator
+
+    returns:
+        list[list[str]]: the generated rows
+    """
+    generator = random.Random(seed)
+    user_ids: list[int] = generator.sample(range(1, users * 10), users)
+    path_names: list[str] = [f'/section-{index % 17}/page-{index}'
+                             for index in range(paths)]
+    user_weights: list[float] = zipf_weights(users, skew)
+    path_weights: list[float] = zipf_weights(paths, skew)
+    agent_prefix: str = 'Mozilla/5.0 (X11; Linux x86_64, like Gecko) '
+    user_agents: list[str] = [
+        (agent_prefix + f'Agent/{index} ' * user_agent_length)
+        [:max(user_agent_length, 1)]
+        for index in range(50)
+    ]
+    return [
+        [
+            str(generator.randint(0, 1)),
+            str(generator.randint(1, 600)),
+            path,
+            generator.choice(user_agents),
+            str(user_id)
+        ]
+        for user_id, path in zip(
+            generator.choices(user_ids, cum_weights=user_weights, k=rows),
+            generator.choices(path_names, cum_weights=path_weights, k=rows)
+        )
+    ]
+
+
+def generate_csv(rows: list[list[str]]) -> bytes:
+    """
+    returns the given rows as the body of a source CSV file
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(['drop', 'length', 'path', 'user_agent', 'user_id'])
+    writer.writerows(rows)
+    return buffer.getvalue().encode('utf-8')
@@ -0,0 +1,79 @@
+"""
+measures the memory held per parsed row by `TransformationHandler.Row`
+against the previous, dict-backed and uninterned, row class
+
+usage (from the repository root, with the service's environment set):
+    python -m benchmarks.row_memory [rows] [distinct paths]
+"""
+import gc
+import sys
+import tracemalloc
+from typing import Callable
+
+from src.etl.handlers import TransformationHandler
+
+
+class DictRow:
+    """
+    the row class as it was before slots and path interning
+    """
+    user_id: int
+    path: str
+    length: int
+
+    def __init__(self, user_id, path, length):
+        self.user_id: int = user_id
+        self.path: str = path
+        self.length: int = length
+
+    @classmethod
+    def create(cls, row: list[str]):
+        return cls(user_id=int(row[4]), path=row[2], length=int(row[1]))
+
+
+def generate_rows(count: int, paths: int) -> list[list[str]]:
+    # paths are built per row, as csv.reader does, so that equal
+    # paths are distinct string objects until they are interned
+    return [
+        ['0', str(index % 300), ''.join(['/page/', str(index % paths)]),
+         '', str(index % 1000)]
+        for index in range(count)
+    ]
+
+
+def measure(create: Callable, count: int, paths: int) -> int:
+    """
+    returns the bytes still allocated after parsing every row,
+    once the source rows themselves have been released; the rows
+    are generated while tracing, so that the path strings parsed
+    rows keep from their source rows are counted against them
+    """
+    gc.collect()
+    tracemalloc.start()
+    rows: list[list[str]] = generate_rows(count, paths)
+    parsed_rows: list = [create(row) for row in rows]
+    rows.clear()
+    gc.collect()
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del parsed_rows
+    return allocated
+
+
+def main():
+    count: int = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    paths: int = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    results: dict[str, int] = {
+        'dict row': measure(DictRow.create, count, paths),
+        'slotted row': measure(
+            TransformationHandler.Row.create,
+            count,
+            paths
+        )
+    }
+    for name, allocated in results.items():
+        print(f'{name:>12}: {allocated / count:8.1f} bytes per row')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+class LocalCSVServer:
+    """
+    a local stand-in for the web traffic data host which serves
+    the given CSV bodies by file name from a background thread, for
+    the benchmarks and the tests alike
+    """
+
+    def __init__(
+        self,
+        files: dict[str, bytes],
+        delay: float = 0,
+        failures: Optional[dict[str, int]] = None
+    ):
+        self.files: dict[str, bytes] = files
+        self.delay: float = delay
+        self.failures: dict[str, int] = dict(failures or {})
+        self.requests: list[str] = []
+        self.statuses: list[int] = []
+        self.server: Optional[ThreadingHTTPServer] = None
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def root_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def handle(self, handler: BaseHTTPRequestHandler):
+        """
+        responds to a single request with the matching file body,
+        a 503 while the file still has failures left to serve, or
+        a 404 if no such file is being served
+        """
+        self.requests.append(f'{handler.command} {handler.path}')
+        if self.delay:
+            threading.Event().wait(self.delay)
+        name: str = handler.path.lstrip('/').removesuffix('.csv')
+        body: Optional[bytes] = self.files.get(name)
+        if self.failures.get(name, 0) > 0:
+            self.failures[name] -= 1
+            self.send_empty(handler, 503)
+            return
+        if body is None:
+            self.send_empty(handler, 404)
+            return
+        etag: str = f'"{hashlib.md5(body).hexdigest()}"'
+        if handler.headers.get('If-None-Match') == etag:
+            self.send_empty(handler, 304)
+            return
+        self.statuses.append(200)
+        handler.send_response(200)
+        handler.send_header('ETag', etag)
+        handler.send_header('Content-Type', 'text/csv')
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        if handler.command != 'HEAD':
+            handler.wfile.write(body)
+
+    def send_empty(self, handler: BaseHTTPRequestHandler, status: int):
+        self.statuses.append(status)
+        handler.send_response(status)
+        handler.send_header('Content-Length', '0')
+        handler.end_headers()
+
+    def __enter__(self) -> 'LocalCSVServer':
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                server.handle(self)
+
+            def do_HEAD(self):
+                server.handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(
+            target=self.server.serve_forever,
+            daemon=True
+        )
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
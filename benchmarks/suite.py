@@ -0,0 +1,274 @@
+"""
+times and memory-profiles each stage of the ETL over synthetic web
+traffic, writing the results as JSON so that runs can be compared
+between commits
+
+usage (from the repository root, with the service's environment set):
+    python -m benchmarks.suite [--rows N] [--users N] [--paths N]
+                               [--skew S] [--user-agent-length N]
+                               [--files N] [--repeat N]
+                               [--output results.json]
+                               [--compare baseline.json]
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Optional, Union
+from unittest.mock import patch
+
+from benchmarks.generator import generate_csv, generate_rows
+from benchmarks.server import LocalCSVServer
+from src.etl.columnar import ColumnarTransformer
+from src.etl.handlers import ExtractionHandler, TransformationHandler
+from src.etl.pipeline import Pipeline
+from src.etl.pivot import SparsePivot
+from src.etl.reports import Reports
+from src.etl.selection import PivotSelection
+from src.etl.services import ExtractionService, LoadingService
+from src.etl.useragents import UserAgentClassifier
+
+
+def measure(run: Callable[[], object], repeat: int) -> dict[str, float]:
+    """
+    returns the fastest wall time of `repeat` runs of a stage, and the
+    peak memory allocated by one further run under tracemalloc
+
+    run  Callable[[], object]: runs the stage once
+    repeat  int: the number of timed runs
+
+    returns:
+        dict[str, float]: the stage's 'seconds' and 'peak_bytes'
+    """
+    timings: list[float] = []
+    for _ in range(repeat):
+        gc.collect()
+        start: float = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    run()
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'seconds': min(timings), 'peak_bytes': peak_bytes}
+
+
+def run_suite(args: argparse.Namespace) -> dict[str, dict[str, float]]:
+    """
+    returns the measurements of every benchmarked stage
+    """
+    rows: list[list[str]] = generate_rows(
+        args.rows,
+        users=args.users,
+        paths=args.paths,
+        skew=args.skew,
+        user_agent_length=args.user_agent_length
+    )
+    rows_per_file: int = -(-len(rows) // args.files)
+    files: dict[str, bytes] = {
+        f'file-{index}': generate_csv(
+            rows[index * rows_per_file:(index + 1) * rows_per_file]
+        )
+        for index in range(args.files)
+    }
+    parsed_rows: list[TransformationHandler.Row] = \
+        [TransformationHandler.Row.create(row) for row in rows]
+    sorted_rows, sorted_paths = \
+        TransformationHandler.sort_rows_by_user_id(parsed_rows)
+    pivot: SparsePivot = TransformationHandler.pivot_sorted_rows(
+        {user_id: dict(paths) for user_id, paths in sorted_rows.items()}
+    )
+    pivot_rows: list[list[Union[str, int]]] = list(pivot.iter_rows())
+
+    def fetch():
+        for name in files:
+            for _ in ExtractionService.iter_csv_rows(name):
+                pass
+
+    def parse(parser: str):
+        # each file's rows are held at once, as `fetch_csv_rows` and
+        # concurrent extraction hold them
+        with patch.object(ExtractionService, 'parser', parser):
+            for body in files.values():
+                list(ExtractionService.parse_records([
+                    body[start:start + ExtractionService.chunk_size]
+                    for start in range(
+                        0,
+                        len(body),
+                        ExtractionService.chunk_size
+                    )
+                ]))
+
+    def extract_transform(pipelined: bool):
+        with patch.object(Pipeline, 'enabled', pipelined), \
+                Pipeline.stream('extract', ExtractionHandler.iter_extract()) \
+                as extracted_rows:
+            TransformationHandler.pivot(extracted_rows)
+
+    def spilling_transform():
+        with patch.object(TransformationHandler, 'memory_budget', 2 ** 23):
+            TransformationHandler.pivot(rows)
+
+    def classify(cache_size: int):
+        with patch.multiple(
+            UserAgentClassifier,
+            dimension='device-browser',
+            cache_size=cache_size
+        ):
+            UserAgentClassifier.reset()
+            for row in rows:
+                TransformationHandler.Row.create_with_user_agent(row)
+        UserAgentClassifier.reset()
+
+    def transform_with_reports():
+        with patch.object(
+            Reports,
+            'definitions',
+            'path_totals=path:sum;user_totals=user_id:sum;'
+            'visits=user_id,path:count'
+        ):
+            Reports.reset()
+            TransformationHandler.pivot(rows)
+        Reports.reset()
+
+    def compact():
+        SparsePivot.from_sorted_rows(
+            {user_id: dict(paths) for user_id, paths in sorted_rows.items()},
+            sorted_paths
+        )
+
+    def flatten_top_paths():
+        with patch.object(PivotSelection, 'top_paths', 10):
+            list(PivotSelection.select(pivot).iter_rows())
+
+    results: dict[str, dict[str, float]] = {}
+    with LocalCSVServer(files) as server, \
+            patch.object(ExtractionService, 'root_url', server.root_url), \
+            patch.object(ExtractionService, 'cache', None):
+        results['fetch_csv_rows'] = measure(fetch, args.repeat)
+        with patch.object(
+            ExtractionService,
+            'generate_file_names',
+            lambda: list(files)
+        ):
+            results['extract_transform'] = measure(
+                lambda: extract_transform(False),
+                args.repeat
+            )
+            results['pipelined_extract_transform'] = measure(
+                lambda: extract_transform(True),
+                args.repeat
+            )
+    with tempfile.TemporaryDirectory() as source_path, \
+            patch.object(
+                ExtractionService,
+                'root_url',
+                f'file://{source_path}'
+            ):
+        for name, body in files.items():
+            with open(os.path.join(source_path, f'{name}.csv'), 'wb') as file:
+                file.write(body)
+        results['fetch_local_csv_rows'] = measure(fetch, args.repeat)
+
+    stages: dict[str, Callable[[], object]] = {
+        'parse_csv_records': lambda: parse('csv'),
+        'parse_fast_records': lambda: parse('fast'),
+        'row_create': lambda: [TransformationHandler.Row.create(row)
+                               for row in rows],
+        'classify_user_agents': lambda: classify(4096),
+        'classify_user_agents_uncached': lambda: classify(1),
+        'sort_rows_by_user_id':
+            lambda: TransformationHandler.sort_rows_by_user_id(parsed_rows),
+        'sparse_pivot': compact,
+        'flatten_rows': lambda: list(pivot.iter_rows()),
+        'flatten_top_paths': flatten_top_paths,
+        'row_transform': lambda: TransformationHandler.pivot(rows),
+        'spilling_transform': spilling_transform,
+        'multi_report_transform': transform_with_reports,
+        'sketch_transform': lambda: TransformationHandler.sketch(rows),
+        'columnar_transform': lambda: ColumnarTransformer.pivot(rows)
+    }
+    for name, run in stages.items():
+        results[name] = measure(run, args.repeat)
+
+    with tempfile.TemporaryDirectory() as output_path, \
+            patch.object(LoadingService, 'output_file_path', output_path):
+        results['load'] = measure(
+            lambda: LoadingService.load('output', pivot_rows),
+            args.repeat
+        )
+    return results
+
+
+def current_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: dict[str, dict[str, float]], baseline_path: str):
+    """
+    prints the ratio of each stage's measurements to a baseline run
+    """
+    with open(baseline_path, 'r') as file:
+        baseline: dict = json.load(file)
+    print(f'compared to {baseline.get("commit")}:')
+    for name, measurements in results.items():
+        previous: Optional[dict[str, float]] = \
+            baseline['results'].get(name)
+        if not previous:
+            continue
+        ratios: list[str] = [
+            f'{key} x{measurements[key] / previous[key]:.2f}'
+            for key in ['seconds', 'peak_bytes'] if previous.get(key)
+        ]
+        print(f'{name:>22}: {", ".join(ratios)}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--paths', type=int, default=200)
+    parser.add_argument('--skew', type=float, default=1.0)
+    parser.add_argument('--user-agent-length', type=int, default=120)
+    parser.add_argument('--files', type=int, default=26)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare')
+    args = parser.parse_args()
+
+    results: dict[str, dict[str, float]] = run_suite(args)
+    report: dict = {
+        'commit': current_commit(),
+        'python': platform.python_version(),
+        'parameters': {
+            key: value for key, value in vars(args).items()
+            if key not in ['output', 'compare']
+        },
+        'results': results
+    }
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+
+    for name, measurements in results.items():
+        print(f'{name:>22}: {measurements["seconds"]:8.3f}s '
+              f'{measurements["peak_bytes"] / 2 ** 20:8.1f} MiB peak')
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from typing import BinaryIO, Iterable, Iterator, Mapping, Optional, Union
+
+
+class ResponseCache:
+    """
+    a size-bounded, least recently used on-disk cache of raw
+    response bodies keyed by URL, along with the ETag and
+    Last-Modified validators used to revalidate them
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int,
+        compress: bool = False,
+        chunk_size: int = 65536
+    ):
+        self.path: str = path
+        self.max_bytes: int = max_bytes
+        self.compress: bool = compress
+        self.chunk_size: int = chunk_size
+        self.lock: threading.Lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def key(self, url: str) -> str:
+        """
+        returns the file name stem under which a URL is cached
+        """
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def body_path(self, url: str) -> str:
+        return os.path.join(self.path, f'{self.key(url)}.body')
+
+    def meta_path(self, url: str) -> str:
+        return os.path.join(self.path, f'{self.key(url)}.json')
+
+    def load_meta(self, url: str) \
+            -> Optional[dict[str, Union[str, bool]]]:
+        """
+        returns the stored metadata of a cached URL, or None if
+        the URL has no complete entry in the cache
+        """
+        if not os.path.exists(self.body_path(url)):
+            return None
+        try:
+            with open(self.meta_path(url), 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def validators(self, url: str) -> dict[str, str]:
+        """
+        returns the conditional request headers which revalidate the
+        cached copy of a URL, or an empty dict if it is not cached
+
+        url  str: the URL about to be requested
+
+        returns:
+            dict[str, str]: If-None-Match and/or If-Modified-Since
+                            headers for the cached copy
+        """
+        meta: Optional[dict[str, Union[str, bool]]] = self.load_meta(url)
+        headers: dict[str, str] = {}
+        if meta is None:
+            return headers
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        return headers
+
+    def open_body(self, url: str) \
+            -> Optional[tuple[BinaryIO, dict[str, str]]]:
+        """
+        opens the cached body of a URL, marking the entry as the most
+        recently used
+
+        url  str: the URL whose cached body to open
+
+        returns:
+            Optional[tuple[BinaryIO, dict[str, str]]]: the body, opened
+                for reading, and the ETag and/or Last-Modified it was
+                cached with, or None if the entry has been evicted,
+                such as by another thread or process since it was
+                revalidated
+        """
+        meta: Optional[dict[str, Union[str, bool]]] = self.load_meta(url)
+        if meta is None:
+            return None
+        body_path: str = self.body_path(url)
+        opener = gzip.open if meta.get('compressed') else open
+        try:
+            os.utime(body_path)
+            file: BinaryIO = opener(body_path, 'rb')
+        except FileNotFoundError:
+            return None
+        version: dict[str, str] = {}
+        if meta.get('etag'):
+            version['etag'] = meta['etag']
+        if meta.get('last_modified'):
+            version['last_modified'] = meta['last_modified']
+        return file, version
+
+    def iter_body(self, file: BinaryIO) -> Iterator[bytes]:
+        """
+        yields a cached body opened by `open_body` in chunks, closing
+        it once it is exhausted
+
+        file  BinaryIO: the opened body
+
+        returns:
+            Iterator[bytes]: the raw, uncompressed body
+        """
+        with file:
+            while True:
+                chunk: bytes = file.read(self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def store(
+        self,
+        url: str,
+        headers: Mapping[str, str],
+        chunks: Iterable[bytes]
+    ) -> Iterator[bytes]:
+        """
+        yields the given body chunks unchanged while writing them to the
+        cache, committing the entry only once the body is exhausted so
+        that abandoned or failed downloads never leave a partial entry
+
+        url  str: the URL the body was fetched from
+        headers  Mapping[str, str]: the response headers, from which
+                                    the validators are taken
+        chunks  Iterable[bytes]: the raw body
+
+        returns:
+            Iterator[bytes]: the same body chunks
+        """
+        fd, temp_path = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        committed: bool = False
+        try:
+            with os.fdopen(fd, 'wb') as raw_file:
+                file = gzip.GzipFile(fileobj=raw_file, mode='wb') \
+                    if self.compress else raw_file
+                for chunk in chunks:
+                    file.write(chunk)
+                    yield chunk
+                if self.compress:
+                    file.close()
+            meta: dict[str, Union[str, bool]] = {
+                'url': url,
+                'etag': headers.get('ETag', ''),
+                'last_modified': headers.get('Last-Modified', ''),
+                'compressed': self.compress
+            }
+            with self.lock:
+                os.replace(temp_path, self.body_path(url))
+                with open(self.meta_path(url), 'w') as file:
+                    json.dump(meta, file)
+            committed = True
+            self.evict()
+        finally:
+            if not committed and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def evict(self):
+        """
+        removes the least recently used entries until the cached
+        bodies fit within `max_bytes`
+        """
+        with self.lock:
+            entries: list[tuple[float, int, str]] = []
+            for file_name in os.listdir(self.path):
+                if not file_name.endswith('.body'):
+                    continue
+                stat = os.stat(os.path.join(self.path, file_name))
+                entries.append((stat.st_mtime, stat.st_size, file_name))
+            total_bytes: int = sum(size for _, size, _ in entries)
+            for _, size, file_name in sorted(entries):
+                if total_bytes <= self.max_bytes:
+                    break
+                stem: str = file_name[:-len('.body')]
+                for suffix in ['.body', '.json']:
+                    try:
+                        os.remove(os.path.join(self.path, stem + suffix))
+                    except FileNotFoundError:
+                        pass
+                total_bytes -= size
@@ -0,0 +1,226 @@
+from array import array
+from itertools import islice
+from typing import Iterable, Iterator, Optional
+
+from .exceptions import InvalidParams
+from .pivot import MAX_VALUE, MIN_VALUE, SparsePivot
+from .policy import ErrorPolicy
+from .selection import PivotSelection
+from .useragents import UserAgentClassifier
+
+
+class ColumnarTransformer:
+    """
+    an alternative transformation engine which parses the length,
+    path and user ID columns into typed arrays in batches, dictionary
+    encodes the users and paths into integer codes and aggregates with
+    a single group-by over the combined codes, producing the same
+    pivot as the row engine
+    """
+    batch_size: int = 65536
+
+    class Columns:
+        user_codes: array
+        path_codes: array
+        lengths: array
+        rows: int
+
+        def __init__(self):
+            self.user_codes: array = array('q')
+            self.path_codes: array = array('q')
+            self.lengths: array = array('q')
+            self.rows: int = 0
+
+    class Dictionary:
+        """
+        an insertion-ordered encoding of distinct values to integer codes
+        """
+        codes: dict
+        values: list
+
+        def __init__(self):
+            self.codes: dict = {}
+            self.values: list = []
+
+        def encode(self, value) -> int:
+            code: int = self.codes.get(value, -1)
+            if code == -1:
+                code = self.codes[value] = len(self.values)
+                self.values.append(value)
+            return code
+
+    @classmethod
+    def transform(cls, rows: Iterable[list[str]]) -> Iterator[list[str]]:
+        """
+        yields pivoted user page view length data by user ID and page
+        path, narrowed to the configured selection of paths and users,
+        starting with the headers
+
+        rows  Iterable[list[str]]: a row of a single page view, with user
+                                   ID, page path, and page length
+
+        returns:
+            Iterator[list[str]]: pivoted rows of page length data by
+                                 user ID and page path
+        """
+        pivot: SparsePivot = PivotSelection.select(cls.pivot(rows))
+        yield from pivot.iter_flattened_rows()
+
+    @classmethod
+    def pivot(cls, rows: Iterable[list[str]], source: str = '') \
+            -> SparsePivot:
+        """
+        returns the sparse pivot of user page view length data by user
+        ID and page path, skipping and quarantining malformed rows when
+        the error policy allows it
+
+        rows  Iterable[list[str]]: a row of a single page view, with user
+                                   ID, page path, and page length
+        source  str: the name of the file the rows came from, if known
+
+        returns:
+            SparsePivot: the cumulative length of each path visited
+                         by each user
+        """
+        users = cls.Dictionary()
+        paths = cls.Dictionary()
+        totals: dict[int, int] = {}
+        path_filter: Optional[PivotSelection.PathFilter] = \
+            PivotSelection.path_filter()
+        rows = iter(rows)
+        while True:
+            columns: ColumnarTransformer.Columns = cls.encode(
+                islice(rows, cls.batch_size),
+                users,
+                paths,
+                path_filter,
+                source
+            )
+            if not columns.rows:
+                break
+            ErrorPolicy.count('rows_seen', columns.rows)
+            cls.aggregate(columns, totals)
+        return cls.compact(totals, users.values, paths.values)
+
+    @classmethod
+    def encode(
+        cls,
+        rows: Iterable[list[str]],
+        users: Dictionary,
+        paths: Dictionary,
+        path_filter: Optional[PivotSelection.PathFilter] = None,
+        source: str = ''
+    ) -> Columns:
+        """
+        returns the user ID, path and length columns of the given rows
+        as typed arrays, with users and paths replaced by their codes;
+        rows of paths left out by the filter are dropped, although
+        their users are still encoded in the order first seen, and
+        each path is combined with the family of its user agent
+        when configured; malformed rows raise InvalidParams, or are
+        skipped and quarantined as by the row engine when the error
+        policy skips rows
+
+        rows  Iterable[list[str]]: the CSV rows of a single batch
+        users  Dictionary: the encoding of user IDs seen so far
+        paths  Dictionary: the encoding of paths seen so far
+        path_filter  Optional[PathFilter]: the paths to keep, if not all
+        source  str: the name of the file the rows came from, if known
+
+        returns:
+            Columns: the encoded columns of the batch
+        """
+        columns = cls.Columns()
+        user_codes: array = columns.user_codes
+        path_codes: array = columns.path_codes
+        lengths: array = columns.lengths
+        count: int = 0
+        classifies: bool = UserAgentClassifier.enabled()
+        skips_rows: bool = ErrorPolicy.skips_rows()
+        for row in rows:
+            count += 1
+            try:
+                user_id: int = int(row[4])
+                path: str = row[2]
+                if classifies:
+                    path = UserAgentClassifier.column(path, row[3])
+                length: int = int(row[1])
+                if not (MIN_VALUE <= user_id <= MAX_VALUE
+                        and MIN_VALUE <= length <= MAX_VALUE):
+                    raise ValueError()
+            except (TypeError, ValueError, IndexError, KeyError):
+                if not skips_rows:
+                    raise InvalidParams()
+                ErrorPolicy.reject_row(source, row, InvalidParams())
+                continue
+            user_code: int = users.encode(user_id)
+            if path_filter is not None and not path_filter.selects(path):
+                continue
+            user_codes.append(user_code)
+            path_codes.append(paths.encode(path))
+            lengths.append(length)
+        columns.rows = count
+        return columns
+
+    @classmethod
+    def aggregate(cls, columns: Columns, totals: dict[int, int]):
+        """
+        sums the lengths of a batch into the running totals, grouped
+        by the user code in the high and the path code in the low 32
+        bits of a single integer key
+
+        columns  Columns: the encoded columns of a batch
+        totals  dict[int, int]: the running totals by combined key
+        """
+        get = totals.get
+        for user_code, path_code, length in zip(
+            columns.user_codes,
+            columns.path_codes,
+            columns.lengths
+        ):
+            key: int = (user_code << 32) | path_code
+            totals[key] = get(key, 0) + length
+
+    @classmethod
+    def compact(
+        cls,
+        totals: dict[int, int],
+        user_ids: list[int],
+        paths: list[str]
+    ) -> SparsePivot:
+        """
+        returns the totals as a sparse pivot with users in the order
+        they were first seen and paths in sorted order, including the
+        users left without any totals by a path filter
+
+        totals  dict[int, int]: the totals by combined key
+        user_ids  list[int]: the user IDs, indexed by user code
+        paths  list[str]: the paths, indexed by path code
+
+        returns:
+            SparsePivot: the compacted pivot
+        """
+        order: list[int] = sorted(range(len(paths)), key=paths.__getitem__)
+        ranks: array = array('q', bytes(8 * len(paths)))
+        for rank, path_code in enumerate(order):
+            ranks[path_code] = rank
+        pivot = SparsePivot([paths[path_code] for path_code in order])
+
+        mask: int = (1 << 32) - 1
+        entries: list[tuple[int, int]] = []
+        current_user_code: int = -1
+        for key in sorted(totals):
+            user_code: int = key >> 32
+            if user_code != current_user_code:
+                if current_user_code != -1:
+                    pivot.append(user_ids[current_user_code], sorted(entries))
+                for empty_user_code in range(current_user_code + 1, user_code):
+                    pivot.append(user_ids[empty_user_code], ())
+                current_user_code = user_code
+                entries = []
+            entries.append((ranks[key & mask], totals[key]))
+        if current_user_code != -1:
+            pivot.append(user_ids[current_user_code], sorted(entries))
+        for empty_user_code in range(current_user_code + 1, len(user_ids)):
+            pivot.append(user_ids[empty_user_code], ())
+        return pivot
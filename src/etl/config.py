@@ -3,3 +3,61 @@ import os
 
 WEB_TRAFFIC_DATA_ROOT_URL = os.environ['WEB_TRAFFIC_DATA_ROOT_URL']
 OUTPUT_FILE_PATH = os.environ['OUTPUT_FILE_PATH']
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+SOURCE_LISTING = os.environ.get('SOURCE_LISTING', 'alphabet')
+SOURCE_MANIFEST = os.environ.get('SOURCE_MANIFEST', '')
+SOURCE_DIRECTORY = os.environ.get('SOURCE_DIRECTORY', '')
+SOURCE_GLOB = os.environ.get('SOURCE_GLOB', '*.csv')
+SOURCE_SHARD = os.environ.get('SOURCE_SHARD', '')
+EXTRACTION_CONCURRENCY = int(os.environ.get('EXTRACTION_CONCURRENCY', 1))
+EXTRACTION_CHUNK_SIZE = int(os.environ.get('EXTRACTION_CHUNK_SIZE', 65536))
+EXTRACTION_PARSER = os.environ.get('EXTRACTION_PARSER', 'csv')
+EXTRACTION_POOL_SIZE = int(os.environ.get('EXTRACTION_POOL_SIZE', 10))
+EXTRACTION_TIMEOUT = float(os.environ.get('EXTRACTION_TIMEOUT', 30))
+EXTRACTION_MAX_RETRIES = int(os.environ.get('EXTRACTION_MAX_RETRIES', 3))
+EXTRACTION_BACKOFF_FACTOR = \
+    float(os.environ.get('EXTRACTION_BACKOFF_FACTOR', 0.5))
+EXTRACTION_CACHE_PATH = os.environ.get('EXTRACTION_CACHE_PATH', '')
+EXTRACTION_CACHE_MAX_BYTES = \
+    int(os.environ.get('EXTRACTION_CACHE_MAX_BYTES', 1024 ** 3))
+EXTRACTION_CACHE_COMPRESS = \
+    os.environ.get('EXTRACTION_CACHE_COMPRESS', 'false').lower() == 'true'
+TRANSFORM_ENGINE = os.environ.get('TRANSFORM_ENGINE', 'row')
+TRANSFORM_PROCESSES = int(os.environ.get('TRANSFORM_PROCESSES', 1))
+TRANSFORM_TOP_PATHS = int(os.environ.get('TRANSFORM_TOP_PATHS', 0))
+TRANSFORM_INCLUDE_PATHS = os.environ.get('TRANSFORM_INCLUDE_PATHS', '')
+TRANSFORM_EXCLUDE_PATHS = os.environ.get('TRANSFORM_EXCLUDE_PATHS', '')
+TRANSFORM_MIN_USER_LENGTH = \
+    int(os.environ.get('TRANSFORM_MIN_USER_LENGTH', 0))
+TRANSFORM_MEMORY_BUDGET = int(os.environ.get('TRANSFORM_MEMORY_BUDGET', 0))
+TRANSFORM_SPILL_PATH = os.environ.get('TRANSFORM_SPILL_PATH', '')
+TRANSFORM_SPILL_PARTITIONS = \
+    int(os.environ.get('TRANSFORM_SPILL_PARTITIONS', 16))
+TRANSFORM_USER_AGENT_DIMENSION = \
+    os.environ.get('TRANSFORM_USER_AGENT_DIMENSION', '')
+TRANSFORM_USER_AGENT_CACHE_SIZE = \
+    int(os.environ.get('TRANSFORM_USER_AGENT_CACHE_SIZE', 4096))
+TRANSFORM_REPORTS = os.environ.get('TRANSFORM_REPORTS', '')
+TRANSFORM_APPROXIMATE = \
+    os.environ.get('TRANSFORM_APPROXIMATE', 'false').lower() == 'true'
+TRANSFORM_SKETCH_CAPACITY = \
+    int(os.environ.get('TRANSFORM_SKETCH_CAPACITY', 1024))
+TRANSFORM_SKETCH_EPSILON = \
+    float(os.environ.get('TRANSFORM_SKETCH_EPSILON', 0.001))
+TRANSFORM_SKETCH_DELTA = float(os.environ.get('TRANSFORM_SKETCH_DELTA', 0.01))
+TRANSFORM_SKETCH_PRECISION = \
+    int(os.environ.get('TRANSFORM_SKETCH_PRECISION', 10))
+STATE_PATH = os.environ.get('STATE_PATH', '')
+RESUME = os.environ.get('RESUME', 'false').lower() == 'true'
+PIPELINE_ENABLED = \
+    os.environ.get('PIPELINE_ENABLED', 'false').lower() == 'true'
+PIPELINE_QUEUE_SIZE = int(os.environ.get('PIPELINE_QUEUE_SIZE', 8))
+PIPELINE_BATCH_SIZE = int(os.environ.get('PIPELINE_BATCH_SIZE', 1024))
+METRICS_ENABLED = \
+    os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+PROFILE_MODE = os.environ.get('PROFILE_MODE', '')
+OUTPUT_COMPRESSION = os.environ.get('OUTPUT_COMPRESSION', '')
+OUTPUT_BUFFER_SIZE = int(os.environ.get('OUTPUT_BUFFER_SIZE', 1024 ** 2))
+OUTPUT_FORMAT = os.environ.get('OUTPUT_FORMAT', 'csv')
+ERROR_POLICY = os.environ.get('ERROR_POLICY', 'fail-fast')
+MAX_ERROR_RATIO = float(os.environ.get('MAX_ERROR_RATIO', 1))
@@ -28,3 +28,19 @@ class BadResponse(Exception):
     body is received
     """
     pass
+
+
+class InvalidFormat(Exception):
+    """
+    raised when a file read by the service does
+    not match its expected format
+    """
+    pass
+
+
+class ErrorThresholdExceeded(Exception):
+    """
+    raised when the share of rejected rows or files
+    exceeds the configured maximum error ratio
+    """
+    pass
@@ -0,0 +1,166 @@
+import mmap
+import struct
+import sys
+from array import array
+from typing import BinaryIO, Iterator
+
+from .exceptions import InvalidFormat
+from .pivot import SparsePivot
+
+
+# a sparse pivot file is laid out as, in little-endian byte order:
+#   the magic bytes, then the path, user and entry counts as uint64s
+#   each path as a uint32 byte length followed by its UTF-8 bytes,
+#       padded with zeros to a multiple of 8 bytes
+#   the user IDs as int64s, in output order
+#   the user_count + 1 offsets of each user's entries as int64s
+#   the path index of every entry as int64s
+#   the length of every entry as int64s
+# so that the four integer columns can be memory-mapped in place
+SPARSE_PIVOT_MAGIC: bytes = b'WTPIVOT1'
+SPARSE_PIVOT_HEADER: struct.Struct = struct.Struct('<8sQQQ')
+
+
+class SparsePivotWriter:
+    @classmethod
+    def write(cls, file: BinaryIO, pivot: SparsePivot) -> int:
+        """
+        writes a sparse pivot to a binary file
+
+        file  BinaryIO: the file to write to
+        pivot  SparsePivot: the pivot to write
+
+        returns:
+            int: the number of bytes written
+        """
+        encoded_paths: bytearray = bytearray()
+        for path in pivot.paths:
+            encoded_path: bytes = path.encode('utf-8')
+            encoded_paths += struct.pack('<I', len(encoded_path))
+            encoded_paths += encoded_path
+        encoded_paths += bytes(-len(encoded_paths) % 8)
+
+        written: int = file.write(SPARSE_PIVOT_HEADER.pack(
+            SPARSE_PIVOT_MAGIC,
+            len(pivot.paths),
+            len(pivot.user_ids),
+            len(pivot.lengths)
+        ))
+        written += file.write(encoded_paths)
+        for column in [pivot.user_ids, pivot.offsets,
+                       pivot.path_indexes, pivot.lengths]:
+            if sys.byteorder != 'little':
+                column = array('q', column)
+                column.byteswap()
+            written += file.write(column.tobytes())
+        return written
+
+
+class SparsePivotReader:
+    """
+    a reader of sparse pivot files which memory-maps the file and
+    exposes its integer columns as zero-copy views of the mapping
+    """
+    paths: list[str]
+    user_ids: memoryview
+    offsets: memoryview
+    path_indexes: memoryview
+    lengths: memoryview
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as file:
+            try:
+                self.buffer: mmap.mmap = mmap.mmap(
+                    file.fileno(),
+                    0,
+                    access=mmap.ACCESS_READ
+                )
+            except ValueError:
+                # an empty file cannot be mapped
+                raise InvalidFormat()
+        try:
+            self.read_columns()
+        except (InvalidFormat, struct.error, UnicodeDecodeError):
+            self.buffer.close()
+            raise InvalidFormat()
+
+    def read_columns(self):
+        """
+        parses the header and paths, then maps the integer columns
+        """
+        magic, path_count, user_count, entry_count = \
+            SPARSE_PIVOT_HEADER.unpack_from(self.buffer)
+        if magic != SPARSE_PIVOT_MAGIC:
+            raise InvalidFormat()
+
+        position: int = SPARSE_PIVOT_HEADER.size
+        self.paths: list[str] = []
+        for _ in range(path_count):
+            (length,) = struct.unpack_from('<I', self.buffer, position)
+            position += 4
+            self.paths.append(
+                self.buffer[position:position + length].decode('utf-8')
+            )
+            position += length
+        position += -position % 8
+
+        counts: list[int] = \
+            [user_count, user_count + 1, entry_count, entry_count]
+        if len(self.buffer) != position + 8 * sum(counts):
+            raise InvalidFormat()
+
+        view: memoryview = memoryview(self.buffer)
+        columns: list[memoryview] = []
+        for count in counts:
+            column: memoryview = view[position:position + 8 * count]
+            if sys.byteorder == 'little':
+                columns.append(column.cast('q'))
+            else:
+                swapped = array('q', column.tobytes())
+                swapped.byteswap()
+                columns.append(memoryview(swapped))
+            position += 8 * count
+        self.user_ids, self.offsets, self.path_indexes, self.lengths = \
+            columns
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    def __enter__(self) -> 'SparsePivotReader':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """
+        releases the column views and unmaps the file
+        """
+        for column in [self.user_ids, self.offsets,
+                       self.path_indexes, self.lengths]:
+            column.release()
+        self.buffer.close()
+
+    def iter_triplets(self) -> Iterator[tuple[int, int, int]]:
+        """
+        yields the user ID, path index and length of every entry,
+        user by user in output order
+
+        returns:
+            Iterator[tuple[int, int, int]]: the sparse triplets
+        """
+        offsets: memoryview = self.offsets
+        for position, user_id in enumerate(self.user_ids):
+            for entry in range(offsets[position], offsets[position + 1]):
+                yield user_id, self.path_indexes[entry], self.lengths[entry]
+
+    def to_pivot(self) -> SparsePivot:
+        """
+        returns a copy of the file's contents as a sparse pivot
+        """
+        pivot = SparsePivot(list(self.paths))
+        pivot.user_ids = array('q', self.user_ids)
+        pivot.offsets = array('q', self.offsets)
+        pivot.path_indexes = array('q', self.path_indexes)
+        pivot.lengths = array('q', self.lengths)
+        return pivot
@@ -1,14 +1,56 @@
-from copy import deepcopy
+import functools
+import logging
+import sys
+import time
+from collections import deque
+from concurrent.futures import (
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor
+)
+from typing import Callable, Iterable, Iterator, Optional, Union
 
+from .columnar import ColumnarTransformer
+from .config import (
+    EXTRACTION_CONCURRENCY,
+    OUTPUT_FORMAT,
+    TRANSFORM_APPROXIMATE,
+    TRANSFORM_ENGINE,
+    TRANSFORM_MEMORY_BUDGET,
+    TRANSFORM_PROCESSES,
+    TRANSFORM_SPILL_PARTITIONS,
+    TRANSFORM_SPILL_PATH
+)
 from .exceptions import InvalidParams
+from .metrics import METER_BATCH_SIZE, Meter, Phase, RunMetrics
+from .pipeline import Pipeline
+from .pivot import MAX_VALUE, MIN_VALUE, SparsePivot
+from .reports import Report, Reports
+from .policy import FILE_ERRORS, ROW_ERRORS, ErrorPolicy
+from .selection import PivotSelection
 from .services import ExtractionService, LoadingService
+from .sketches import PathSketch
+from .spill import SpillingAggregator
+from .state import StateStore
+from .useragents import UserAgentClassifier
+
+
+logger = logging.getLogger(__name__)
 
 
 class ExtractionHandler:
+    concurrency: int = EXTRACTION_CONCURRENCY
+    file_timings: dict[str, float] = {}
+
     @classmethod
-    def extract(cls) -> list[list[str]]:
+    def extract(cls, concurrency: Optional[int] = None) -> list[list[str]]:
         """
-        returns all CSV file rows across all CSV files
+        returns all CSV file rows across all CSV files, fetching up to
+        `concurrency` files at once while keeping the rows in file order
+
+        concurrency  Optional[int]: the maximum number of files to fetch
+                                    at once, defaulting to the configured
+                                    EXTRACTION_CONCURRENCY
 
         returns:
             list[list[[str]]: a list of CSV row lists, each list
@@ -20,34 +62,274 @@ class ExtractionHandler:
                                  'user_id'
                              ]
         """
+        return list(cls.iter_extract(concurrency))
+
+    @classmethod
+    def iter_extract(cls, concurrency: Optional[int] = None) \
+            -> Iterator[list[str]]:
+        """
+        yields all CSV file rows across all CSV files in file order,
+        without collecting them into a single list
+
+        concurrency  Optional[int]: the maximum number of files to fetch
+                                    at once, defaulting to the configured
+                                    EXTRACTION_CONCURRENCY
+
+        returns:
+            Iterator[list[str]]: the CSV rows of every file, each
+                                 with the same headers as `extract`
+        """
+        if concurrency is None:
+            concurrency = cls.concurrency
+        if not isinstance(concurrency, int) or concurrency < 1:
+            raise InvalidParams()
+
         file_names: list[str] = ExtractionService.generate_file_names()
-        flattened_rows: list[list[str]] = []
+        cls.file_timings = {}
+        for _, rows in cls.fetch_files(file_names, concurrency):
+            ErrorPolicy.count('files_seen')
+            yield from rows
+
+    @classmethod
+    def fetch_files(cls, file_names: list[str], concurrency: int) \
+            -> Iterator[tuple[str, Iterable[list[str]]]]:
+        """
+        yields the name and CSV rows of each given file in the given
+        order, with at most `concurrency` files in flight at once; a
+        single file at a time is streamed lazily, while files fetched
+        concurrently are read in full on the pool's threads
+
+        file_names  list[str]: the names of the CSV files to fetch
+        concurrency  int: the maximum number of files to fetch at once
+
+        returns:
+            Iterator[tuple[str, Iterable[list[str]]]]: each file name
+                                                       and its CSV rows
+        """
+        if concurrency == 1:
+            for file_name in file_names:
+                yield file_name, cls.iter_file(file_name)
+            return
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for name, future in cls.submit_files(
+                executor,
+                file_names,
+                concurrency
+            ):
+                yield name, future.result()
+
+    @classmethod
+    def submit_files(
+        cls,
+        executor: ThreadPoolExecutor,
+        file_names: list[str],
+        concurrency: int
+    ) -> Iterator[tuple[str, Future]]:
+        """
+        yields the name of each given file in the given order along
+        with its pending fetch by `fetch_file` on the given threads,
+        submitting files ahead of the one yielded so that at most
+        `concurrency` files are in flight at once
+
+        executor  ThreadPoolExecutor: the threads to fetch files on
+        file_names  list[str]: the names of the CSV files to fetch
+        concurrency  int: the maximum number of files to fetch at once
+
+        returns:
+            Iterator[tuple[str, Future]]: each file name and the future
+                                          of its CSV rows
+        """
+        pending: deque[tuple[str, Future]] = deque()
         for file_name in file_names:
-            flattened_rows += ExtractionService.fetch_csv_rows(file_name)
-        return flattened_rows
+            pending.append(
+                (file_name, executor.submit(cls.fetch_file, file_name))
+            )
+            if len(pending) >= concurrency:
+                yield pending.popleft()
+        while pending:
+            yield pending.popleft()
+
+    @classmethod
+    def fetch_file(cls, file_name: str) -> list[list[str]]:
+        """
+        returns the CSV rows of a single file, recording how long
+        the file took to fetch in `file_timings`
+
+        file_name  str: the name of the CSV file to fetch
+
+        returns:
+            list[list[str]]: the CSV rows of the file
+        """
+        return list(cls.iter_file(file_name))
+
+    @classmethod
+    def iter_file(cls, file_name: str) -> Iterator[list[str]]:
+        """
+        yields the CSV rows of a single file as they are parsed,
+        recording the time spent fetching and parsing the file
+        (excluding time spent by the consumer) in `file_timings`,
+        and against the 'extract' phase of the run metrics unless
+        metrics are disabled, in which case the file is timed from
+        its first request to its last row, consumer included
+
+        file_name  str: the name of the CSV file to fetch
+
+        returns:
+            Iterator[list[str]]: the CSV rows of the file
+        """
+        if not RunMetrics.enabled:
+            started: float = time.perf_counter()
+            yield from ExtractionService.iter_csv_rows(file_name)
+            elapsed: float = time.perf_counter() - started
+            cls.file_timings[file_name] = elapsed
+            RunMetrics.increment('files_extracted')
+            logger.info('fetched %s in %.3fs', file_name, elapsed)
+            return
+        phase: Phase = RunMetrics.get_phase('extract')
+        timer: list[float] = RunMetrics.start_timer()
+        try:
+            rows = Meter(
+                phase,
+                ExtractionService.iter_csv_rows(file_name),
+                METER_BATCH_SIZE
+            )
+        finally:
+            elapsed: float = RunMetrics.stop_timer(phase, timer)
+        yield from rows
+        elapsed += rows.wall_seconds
+        cls.file_timings[file_name] = elapsed
+        RunMetrics.increment('files_extracted')
+        logger.info('fetched %s: %d rows in %.3fs',
+                    file_name, rows.rows, elapsed)
 
 
 class TransformationHandler:
+    engine: str = TRANSFORM_ENGINE
+    processes: int = TRANSFORM_PROCESSES
+    memory_budget: int = TRANSFORM_MEMORY_BUDGET
+    spill_partitions: int = TRANSFORM_SPILL_PARTITIONS
+    spill_path: str = TRANSFORM_SPILL_PATH
+    approximate: bool = TRANSFORM_APPROXIMATE
+
     @classmethod
-    def transform(cls, rows: list[list[str]]) \
+    def transform(cls, rows: Iterable[list[str]]) \
             -> list[list[str]]:
         """
         returns pivoted user page view length data by user ID
         and page path from raw page view logs
 
-        rows  list[list[str]]: a row of a single page view, with user
-                               ID, page path, and page length
+        rows  Iterable[list[str]]: a row of a single page view, with user
+                                   ID, page path, and page length
 
         returns:
             list[list[str]]: pivoted rows of page length data by
                              user ID and page path
         """
-        parsed_rows: list[cls.Row] = [cls.Row.create(row) for row in rows]
-        sorted_rows, sorted_paths = cls.sort_rows_by_user_id(parsed_rows)
-        filled_rows = cls.fill_missing_paths(sorted_rows, sorted_paths)
-        return cls.flatten_rows(filled_rows, sorted_paths)
+        return list(cls.iter_transform(rows))
+
+    @classmethod
+    def iter_transform(cls, rows: Iterable[list[str]]) \
+            -> Iterator[list[str]]:
+        """
+        yields pivoted user page view length data by user ID and page
+        path, aggregating the raw page view logs as they are consumed
+        so that neither the raw nor the parsed rows are ever held in
+        a list, narrowed to the configured selection of paths and users
+
+        rows  Iterable[list[str]]: a row of a single page view, with user
+                                   ID, page path, and page length
+
+        returns:
+            Iterator[list[str]]: pivoted rows of page length data by
+                                 user ID and page path, starting with
+                                 the headers
+        """
+        yield from cls.select(cls.pivot(rows)).iter_flattened_rows()
+
+    @classmethod
+    def select(cls, pivot: SparsePivot) -> SparsePivot:
+        """
+        returns the finished pivot narrowed to the top paths and the
+        users selected by `PivotSelection`; this must only be applied
+        to a complete pivot, never to a partial or a shard's output
+
+        pivot  SparsePivot: the pivot of every aggregated path and user
+
+        returns:
+            SparsePivot: the pivot of the selected paths and users
+        """
+        if not PivotSelection.is_selective():
+            return pivot
+        with RunMetrics.phase('select') as phase:
+            phase.rows_in += len(pivot)
+            pivot = PivotSelection.select(pivot)
+            phase.rows_out += len(pivot)
+        return pivot
+
+    @classmethod
+    def pivot(cls, rows: Iterable[list[str]]) -> SparsePivot:
+        """
+        returns the sparse pivot of user page view length data by user
+        ID and page path, using the configured transformation engine,
+        or parsing rows as the row engine does and spilling the sums to
+        disk when a memory budget is configured
+
+        rows  Iterable[list[str]]: a row of a single page view, with user
+                                   ID, page path, and page length
+
+        returns:
+            SparsePivot: the cumulative length of each path visited
+                         by each user
+        """
+        if cls.engine not in ['row', 'columnar']:
+            raise InvalidParams()
+        if cls.memory_budget:
+            parsed_rows: Iterable[cls.Row] = \
+                RunMetrics.meter('parse', cls.parse_rows(rows))
+            with cls.spilling_aggregator() as aggregator:
+                with RunMetrics.phase('sort_rows_by_user_id'):
+                    aggregator.add_rows(
+                        parsed_rows,
+                        PivotSelection.path_filter()
+                    )
+                return aggregator.pivot()
+        if cls.engine == 'columnar':
+            cls.check_engine()
+            with RunMetrics.phase('columnar_pivot') as phase:
+                pivot: SparsePivot = ColumnarTransformer.pivot(rows)
+                phase.rows_out += len(pivot)
+            return pivot
+
+        parsed_rows = RunMetrics.meter('parse', cls.parse_rows(rows))
+        with RunMetrics.phase('sort_rows_by_user_id') as phase:
+            sorted_rows, sorted_paths = cls.sort_rows_by_user_id(parsed_rows)
+            phase.rows_out += len(sorted_rows)
+        with RunMetrics.phase('sparse_pivot') as phase:
+            phase.rows_in += len(sorted_rows)
+            pivot = SparsePivot.from_sorted_rows(sorted_rows, sorted_paths)
+            phase.rows_out += len(pivot)
+        return pivot
+
+    @classmethod
+    def spilling_aggregator(cls) -> SpillingAggregator:
+        """
+        returns an aggregator which spills to disk beyond the
+        configured memory budget
+        """
+        return SpillingAggregator(
+            cls.memory_budget,
+            cls.spill_partitions,
+            cls.spill_path
+        )
 
     class Row:
+        """
+        a single parsed page view; slotted so that rows carry no
+        per-instance __dict__, with paths interned so that every
+        row and pivot key for a path shares a single string
+        """
+        __slots__ = ('user_id', 'path', 'length')
         user_id: int
         path: str
         length: int
@@ -66,27 +348,117 @@ class TransformationHandler:
             row  list[str]: a CSV row, where user ID and
                             length can be parsed as integers
 
+            returns:
+                Row: the provided CSV row as a Row instance
+            """
+            return cls.parse(row, cls.page_path)
+
+        @classmethod
+        def create_with_user_agent(cls, row: list[str]):
+            """
+            returns an instance of the Row class for a given CSV row,
+            with the family of its user agent added to its path
+
+            row  list[str]: a CSV row, where user ID and
+                            length can be parsed as integers
+
+            returns:
+                Row: the provided CSV row as a Row instance
+            """
+            return cls.parse(row, cls.user_agent_path)
+
+        @classmethod
+        def parse(cls, row: list[str], path_of: Callable[[list], str]):
+            """
+            returns an instance of the Row class for a given CSV row,
+            with its path taken from the row by the given function
+
+            row  list[str]: a CSV row, where user ID and
+                            length can be parsed as integers
+            path_of  Callable[[list], str]: returns the path of a row
+
             returns:
                 Row: the provided CSV row as a Row instance
             """
             try:
                 user_id: int = int(row[4])
-                path: str = row[2]
+                path: str = sys.intern(path_of(row))
                 length: int = int(row[1])
             except (TypeError, ValueError, IndexError, KeyError):
                 raise InvalidParams()
+            if not (MIN_VALUE <= user_id <= MAX_VALUE
+                    and MIN_VALUE <= length <= MAX_VALUE):
+                raise InvalidParams()
             return cls(user_id=user_id, path=path, length=length)
 
+        @staticmethod
+        def page_path(row: list[str]) -> str:
+            """
+            returns the page path of a CSV row
+            """
+            return row[2]
+
+        @staticmethod
+        def user_agent_path(row: list[str]) -> str:
+            """
+            returns the page path of a CSV row combined with the
+            family of its user agent
+            """
+            return UserAgentClassifier.column(row[2], row[3])
+
+    @classmethod
+    def parse_rows(cls, rows: Iterable[list[str]], source: str = '') \
+            -> Iterator[Row]:
+        """
+        yields each CSV row parsed into a Row instance, skipping and
+        quarantining malformed rows when the error policy allows it,
+        classifying each row's user agent when configured, and adding
+        each row to the configured reports
+
+        rows  Iterable[list[str]]: the CSV rows to parse
+        source  str: the name of the file the rows came from, if known
+
+        returns:
+            Iterator[Row]: the parsed rows
+        """
+        phase: Phase = RunMetrics.get_phase('parse')
+        create = cls.Row.create_with_user_agent \
+            if UserAgentClassifier.enabled() else cls.Row.create
+        if Reports.enabled():
+            create = Reports.tap(create, PivotSelection.path_filter())
+        count: int = 0
+        try:
+            if not ErrorPolicy.skips_rows():
+                for row in rows:
+                    count += 1
+                    yield create(row)
+                return
+            for row in rows:
+                count += 1
+                try:
+                    parsed_row: cls.Row = create(row)
+                except ROW_ERRORS as error:
+                    ErrorPolicy.reject_row(source, row, error)
+                    continue
+                yield parsed_row
+        finally:
+            with RunMetrics.lock:
+                phase.rows_in += count
+            ErrorPolicy.count('rows_seen', count)
+
     @ classmethod
-    def sort_rows_by_user_id(cls, rows: list[Row]) -> \
+    def sort_rows_by_user_id(cls, rows: Iterable[Row]) -> \
             tuple[dict[int, dict[str, int]], list[str]]:
         """
-        sorts the given list of Row instances into a dict
+        sorts the given Row instances into a dict
         of user IDs to a dict of the pages and cumulative
         length of time spent (in seconds) per page along
-        with a unique list of all paths in the given rows
+        with a unique list of all paths in the given rows; rows
+        of paths left out by `PivotSelection` are not summed, but
+        their users are still kept in the order first seen
 
-        rows  list[Row]: the list of rows to be sorted
+        rows  Iterable[Row]: the rows to be sorted, which are
+                             consumed only once
 
         returns:
             {int: {str: int}}: a of user IDs to paths/durations
@@ -94,12 +466,18 @@ class TransformationHandler:
         """
         sorted_rows: dict[int, dict[str, int]] = {}
         paths: set[str] = set()
+        path_filter: Optional[PivotSelection.PathFilter] = \
+            PivotSelection.path_filter()
 
         for row in rows:
             user_id: int = row.user_id
             path: str = row.path
             length: int = row.length
 
+            if path_filter is not None and not path_filter.selects(path):
+                if user_id not in sorted_rows:
+                    sorted_rows[user_id] = {}
+                continue
             if user_id not in sorted_rows:
                 sorted_rows[user_id] = {
                     path: length
@@ -117,28 +495,528 @@ class TransformationHandler:
         return sorted_rows, sorted_paths
 
     @classmethod
-    def fill_missing_paths(
+    def pivot_files(
+        cls,
+        file_names: list[str],
+        processes: Optional[int] = None
+    ) -> SparsePivot:
+        """
+        returns the sparse pivot of the given files, each of which is
+        extracted and aggregated into a partial pivot, in worker
+        processes when more than one is allowed, before the partials
+        are merged in file order
+
+        file_names  list[str]: the names of the CSV files to pivot
+        processes  Optional[int]: the number of worker processes,
+                                  defaulting to the configured
+                                  TRANSFORM_PROCESSES
+
+        returns:
+            SparsePivot: the cumulative length of each path visited
+                         by each user across all of the files
+        """
+        if processes is None:
+            processes = cls.processes
+        if not isinstance(processes, int) or processes < 1:
+            raise InvalidParams()
+        cls.check_engine()
+
+        return cls.merge_partials(
+            partial_rows for _, partial_rows, _
+            in cls.aggregate_files(file_names, processes)
+        )
+
+    @classmethod
+    def pivot_incremental(
+        cls,
+        file_names: list[str],
+        store: StateStore,
+        processes: Optional[int] = None
+    ) -> SparsePivot:
+        """
+        returns the sparse pivot of the given files, aggregating only
+        the files which are new or have changed since they were last
+        folded into the store and reusing the stored partial pivots of
+        the rest; versions are checked, and files fetched, up to
+        EXTRACTION_CONCURRENCY at once, while files checkpointed by a
+        resumed run are reused without checking their version again
+
+        file_names  list[str]: the names of the CSV files to pivot
+        store  StateStore: the partial pivots of previous runs
+        processes  Optional[int]: the number of worker processes,
+                                  defaulting to the configured
+                                  TRANSFORM_PROCESSES
+
+        returns:
+            SparsePivot: the cumulative length of each path visited
+                         by each user across all of the files
+        """
+        if processes is None:
+            processes = cls.processes
+        if not isinstance(processes, int) or processes < 1:
+            raise InvalidParams()
+        concurrency: int = ExtractionHandler.concurrency
+        if not isinstance(concurrency, int) or concurrency < 1:
+            raise InvalidParams()
+        cls.check_engine()
+        # stored partials hold no report groups, so reports would only
+        # cover the files aggregated again
+        if Reports.enabled():
+            raise InvalidParams()
+
+        for name in list(store.manifest):
+            if name not in file_names:
+                store.remove(name)
+
+        # partials only hold the columns aggregated under the same path
+        # patterns and user agent dimension
+        path_filter_key: str = PivotSelection.path_filter_key()
+        if UserAgentClassifier.dimension:
+            path_filter_key += f'#{UserAgentClassifier.dimension}'
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            checks: dict[str, Future] = {
+                name: executor.submit(ExtractionService.fetch_version, name)
+                for name in file_names if name not in store.checkpoints
+            }
+        versions: dict[str, dict[str, str]] = {}
+        for name in file_names:
+            if name in store.checkpoints:
+                # aggregated by the interrupted run being resumed, whose
+                # counts and rejections for the file are carried over
+                ErrorPolicy.absorb(store.checkpoint_errors.get(
+                    name,
+                    ({'files_seen': 1}, [])
+                ))
+                continue
+            try:
+                version: dict[str, str] = checks[name].result()
+            except FILE_ERRORS as error:
+                if not ErrorPolicy.skips_files():
+                    raise
+                ErrorPolicy.count('files_seen')
+                ErrorPolicy.reject_file(name, error)
+                store.remove(name)
+                continue
+            if version and path_filter_key:
+                version = {**version, 'paths': path_filter_key}
+            if not store.is_current(name, version):
+                versions[name] = version
+            else:
+                # reused files count towards the error ratio as well,
+                # while aggregated files are counted as they are
+                ErrorPolicy.count('files_seen')
+        logger.info('aggregating %d of %d files',
+                    len(versions), len(file_names))
+
+        aggregated: set[str] = set()
+        for name, partial_rows, errors in cls.aggregate_files(
+            list(versions),
+            processes
+        ):
+            # the file is stored under the validators of the response
+            # that was aggregated, in case it changed since it was
+            # checked
+            version = ExtractionService.versions.pop(name, versions[name])
+            if version and path_filter_key:
+                version = {**version, 'paths': path_filter_key}
+            store.save_partial(name, partial_rows, version, errors)
+            aggregated.add(name)
+        # skipped files are dropped so that a stale partial is never
+        # merged in place of a file which failed on this run
+        for name in versions:
+            if name not in aggregated:
+                store.remove(name)
+
+        return cls.merge_partials(
+            store.load_partial(name) for name in file_names
+            if name in store.manifest
+        )
+
+    @classmethod
+    def sketch_files(
+        cls,
+        file_names: list[str],
+        processes: Optional[int] = None
+    ) -> PathSketch:
+        """
+        returns the sketch of the given files, each of which is
+        extracted and sketched on its own, in worker processes when
+        more than one is allowed, before the sketches are merged in
+        file order
+
+        file_names  list[str]: the names of the CSV files to sketch
+        processes  Optional[int]: the number of worker processes,
+                                  defaulting to the configured
+                                  TRANSFORM_PROCESSES
+
+        returns:
+            PathSketch: the top paths and distinct users across all
+                        of the files
+        """
+        if processes is None:
+            processes = cls.processes
+        if not isinstance(processes, int) or processes < 1:
+            raise InvalidParams()
+
+        merged: PathSketch = PathSketch.create()
+        with RunMetrics.phase('merge_sketches') as phase:
+            for _, sketch, _ in cls.aggregate_files(
+                file_names,
+                processes,
+                sketch=True
+            ):
+                phase.rows_in += 1
+                merged.merge(sketch)
+            phase.rows_out += len(merged.counts)
+        return merged
+
+    @classmethod
+    def sketch(cls, rows: Iterable[list[str]], source: str = '') \
+            -> PathSketch:
+        """
+        returns the sketch of the given CSV rows, leaving out the
+        paths left out by the configured path patterns
+
+        rows  Iterable[list[str]]: the CSV rows to sketch
+        source  str: the name of the file the rows came from, if known
+
+        returns:
+            PathSketch: the top paths by total length and the distinct
+                        users of each
+        """
+        sketch: PathSketch = PathSketch.create()
+        with RunMetrics.phase('sketch') as phase:
+            sketch.add_rows(
+                cls.parse_rows(rows, source),
+                PivotSelection.path_filter()
+            )
+            phase.rows_out += len(sketch.counts)
+        return sketch
+
+    @classmethod
+    def aggregate_files(
+        cls,
+        file_names: list[str],
+        processes: int,
+        sketch: bool = False
+    ) -> Iterator[tuple[str, dict[int, dict[str, int]], tuple]]:
+        """
+        yields the name and partial pivot, or sketch, of each given
+        file in the given order, along with the counters and rejections
+        of the error policy recorded while aggregating it, aggregating
+        files in worker processes when more than one process is allowed,
+        and otherwise fetching up to EXTRACTION_CONCURRENCY files at
+        once while each is aggregated in turn in this process
+
+        file_names  list[str]: the names of the CSV files to aggregate
+        processes  int: the number of worker processes
+        sketch  bool: whether to sketch each file instead
+
+        returns:
+            Iterator[tuple[str, dict[int, dict[str, int]], tuple]]: each
+                file name, its partial pivot and its error policy state
+        """
+        aggregate = functools.partial(cls.try_aggregate_file, sketch=sketch)
+        concurrency: int = ExtractionHandler.concurrency
+        if not isinstance(concurrency, int) or concurrency < 1:
+            raise InvalidParams()
+        if processes == 1 and concurrency == 1:
+            results: Iterable[tuple] = map(
+                functools.partial(cls.aggregate_in_process, aggregate),
+                file_names
+            )
+            yield from cls.accept_partials(file_names, results)
+            return
+        if processes == 1:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                results = (
+                    cls.aggregate_in_process(
+                        functools.partial(aggregate, fetched=future),
+                        name
+                    )
+                    for name, future in ExtractionHandler.submit_files(
+                        executor,
+                        file_names,
+                        concurrency
+                    )
+                )
+                yield from cls.accept_partials(file_names, results)
+            return
+
+        with ProcessPoolExecutor(
+            max_workers=processes,
+            initializer=cls.initialize_worker
+        ) as executor:
+            results = executor.map(aggregate, file_names)
+            yield from cls.accept_partials(file_names, results)
+
+    @classmethod
+    def aggregate_in_process(cls, aggregate: Callable, file_name: str) \
+            -> tuple:
+        """
+        returns the result of `try_aggregate_file` for a file aggregated
+        in this process, holding back the state recorded before it, so
+        that only the file's own state is drained with its result, as
+        it is from a worker process
+        """
+        held: tuple = cls.drain_worker()
+        try:
+            return aggregate(file_name)
+        finally:
+            cls.absorb_worker(held)
+
+    @classmethod
+    def accept_partials(cls, file_names: list[str], results: Iterable[tuple]) \
+            -> Iterator[tuple[str, dict[int, dict[str, int]], tuple]]:
+        """
+        yields the name, partial pivot and error policy state of each
+        file which was aggregated by `try_aggregate_file`, absorbing the
+        state recorded while aggregating each file and leaving out the
+        files which were skipped
+
+        file_names  list[str]: the names of the aggregated files
+        results  Iterable[tuple]: the result of `try_aggregate_file`
+                                  for each file
+
+        returns:
+            Iterator[tuple[str, dict[int, dict[str, int]], tuple]]: each
+                file name, its partial pivot and its error policy state
+        """
+        for name, (partial_rows, drained) in zip(
+            file_names,
+            # each file is accepted as soon as it is aggregated
+            RunMetrics.meter('aggregate_files', results, batch_size=1)
+        ):
+            cls.absorb_worker(drained)
+            if partial_rows is not None:
+                yield name, partial_rows, drained[0]
+
+    @classmethod
+    def initialize_worker(cls):
+        """
+        prepares a worker process to aggregate files, without the
+        session or any of the state recorded by its parent
+        """
+        ExtractionService.reset_session()
+        cls.drain_worker()
+
+    @classmethod
+    def drain_worker(cls) -> tuple:
+        """
+        returns and clears the rejections, user agent cache statistics,
+        report groups, file versions and run metrics recorded since
+        they were last drained, so that they can be returned from a
+        worker process
+        """
+        return (
+            ErrorPolicy.drain(),
+            UserAgentClassifier.drain(),
+            Reports.drain(),
+            ExtractionService.drain_versions(),
+            RunMetrics.drain()
+        )
+
+    @classmethod
+    def absorb_worker(cls, drained: tuple):
+        """
+        adds the state drained by `drain_worker` in a worker process
+        """
+        rejections, user_agents, groups, versions, metrics = drained
+        ErrorPolicy.absorb(rejections)
+        UserAgentClassifier.absorb(user_agents)
+        Reports.absorb(groups)
+        ExtractionService.absorb_versions(versions)
+        RunMetrics.absorb(metrics)
+
+    @classmethod
+    def try_aggregate_file(
+        cls,
+        file_name: str,
+        sketch: bool = False,
+        fetched: Optional[Future] = None
+    ) -> tuple[
+        Optional[Union[dict[int, dict[str, int]], PathSketch]],
+        tuple
+    ]:
+        """
+        returns the partial pivot, or sketch, of a single file, or None
+        if the file failed and the error policy skips failed files,
+        along with the state recorded while aggregating it, drained by
+        `drain_worker`, so that it can be returned from a worker process
+
+        file_name  str: the name of the CSV file to aggregate
+        sketch  bool: whether to sketch the file instead
+        fetched  Optional[Future]: the fetch of the file's rows already
+                                   submitted to the extraction threads,
+                                   if any
+
+        returns:
+            Optional[Union[dict, PathSketch]]: the partial pivot or
+                                               sketch
+            tuple: the rejections, user agent cache statistics, report
+                   groups, file versions and run metrics
+        """
+        ErrorPolicy.count('files_seen')
+        partial_rows: Optional[
+            Union[dict[int, dict[str, int]], PathSketch]
+        ] = None
+        try:
+            if fetched is not None:
+                rows: Iterable[list[str]] = fetched.result()
+            else:
+                rows = ExtractionHandler.iter_file(file_name)
+            if sketch:
+                partial_rows = cls.sketch(rows, file_name)
+            else:
+                partial_rows = cls.aggregate_file(file_name, rows)
+        except FILE_ERRORS as error:
+            if not ErrorPolicy.skips_files():
+                raise
+            logger.warning('skipping %s: %s', file_name,
+                           type(error).__name__)
+            ErrorPolicy.reject_file(file_name, error)
+            Reports.discard()
+        return partial_rows, cls.drain_worker()
+
+    @classmethod
+    def merge_partials(
+        cls,
+        partials: Iterable[dict[int, dict[str, int]]]
+    ) -> SparsePivot:
+        """
+        returns the sparse pivot of the given partial pivots, which are
+        merged in the given order, spilling the merged sums to disk
+        when a memory budget is configured
+
+        partials  Iterable[dict[int, dict[str, int]]]: the partial pivots
+
+        returns:
+            SparsePivot: the cumulative length of each path visited
+                         by each user across all of the partials
+        """
+        if cls.memory_budget:
+            with cls.spilling_aggregator() as aggregator:
+                with RunMetrics.phase('merge_partials') as phase:
+                    for partial_rows in partials:
+                        phase.rows_in += 1
+                        aggregator.add_partial(partial_rows)
+                return aggregator.pivot()
+
+        sorted_rows: dict[int, dict[str, int]] = {}
+        with RunMetrics.phase('merge_partials') as phase:
+            for partial_rows in partials:
+                phase.rows_in += 1
+                cls.merge_sorted_rows(sorted_rows, partial_rows)
+            phase.rows_out += len(sorted_rows)
+        return cls.pivot_sorted_rows(sorted_rows)
+
+    @classmethod
+    def merge_pivots(cls, pivots: Iterable[SparsePivot]) -> SparsePivot:
+        """
+        returns the sparse pivot of the given pivots, such as the
+        outputs of sharded runs, which are merged in the given order
+
+        pivots  Iterable[SparsePivot]: the pivots to merge
+
+        returns:
+            SparsePivot: the cumulative length of each path visited
+                         by each user across all of the pivots
+        """
+        return cls.merge_partials(pivot.to_sorted_rows() for pivot in pivots)
+
+    @classmethod
+    def pivot_sorted_rows(cls, sorted_rows: dict[int, dict[str, int]]) \
+            -> SparsePivot:
+        """
+        returns the sparse pivot of merged partial pivots, with
+        the paths of all users in sorted order
+
+        sorted_rows  dict[int, dict[str, int]]: the merged partial pivots
+
+        returns:
+            SparsePivot: the compacted pivot
+        """
+        with RunMetrics.phase('sparse_pivot') as phase:
+            phase.rows_in += len(sorted_rows)
+            paths: set[str] = set()
+            for user_paths in sorted_rows.values():
+                paths.update(user_paths)
+            pivot: SparsePivot = \
+                SparsePivot.from_sorted_rows(sorted_rows, sorted(paths))
+            phase.rows_out += len(pivot)
+        return pivot
+
+    @classmethod
+    def check_engine(cls):
+        """
+        raises InvalidParams for an unknown engine, or for the columnar
+        engine when reports are configured, since reports are summed
+        from the rows parsed by the row engine
+        """
+        if cls.engine not in ['row', 'columnar']:
+            raise InvalidParams()
+        if cls.engine == 'columnar' and Reports.enabled():
+            raise InvalidParams()
+
+    @classmethod
+    def aggregate_file(
+        cls,
+        file_name: str,
+        rows: Optional[Iterable[list[str]]] = None
+    ) -> dict[int, dict[str, int]]:
+        """
+        returns the partial pivot of a single file using the configured
+        transformation engine, as sorted by `sort_rows_by_user_id`
+
+        file_name  str: the name of the CSV file to aggregate
+        rows  Optional[Iterable[list[str]]]: the CSV rows of the file if
+                                             already fetched, otherwise
+                                             they are streamed
+
+        returns:
+            dict[int, dict[str, int]]: the paths and cumulative lengths
+                                       of each user in the file
+        """
+        if rows is None:
+            rows = ExtractionHandler.iter_file(file_name)
+        if cls.engine == 'columnar':
+            with RunMetrics.phase('columnar_pivot') as phase:
+                pivot: SparsePivot = ColumnarTransformer.pivot(
+                    rows,
+                    file_name
+                )
+                phase.rows_out += len(pivot)
+            return pivot.to_sorted_rows()
+        sorted_rows, _ = cls.sort_rows_by_user_id(
+            cls.parse_rows(rows, file_name)
+        )
+        return sorted_rows
+
+    @classmethod
+    def merge_sorted_rows(
         cls,
         sorted_rows: dict[int, dict[str, int]],
-        sorted_paths: list[str]
+        partial_rows: dict[int, dict[str, int]]
     ) -> dict[int, dict[str, int]]:
         """
-        returns the sorted_rows dict with an entry for each
-        user that is missing that path
+        adds the lengths of a partial pivot into another in place; users
+        new to `sorted_rows` are appended in their order in
+        `partial_rows`, so merging partials in file order keeps the
+        users in the order they were first seen
 
-        sorted_rows  dict[int, dict[str, int]]: the data rows to have
-                                                data filled in
-        sorted_paths  list[str]: the list of all unique paths which will
-                                 be used to fill in the data rows
+        sorted_rows  dict[int, dict[str, int]]: the pivot to merge into
+        partial_rows  dict[int, dict[str, int]]: the pivot to merge
 
         returns:
-            dict[int, dict[str, int]]: the data rows with all paths
-                                       filled in for all users
+            dict[int, dict[str, int]]: the merged `sorted_rows`
         """
-        for user_id, paths in sorted_rows.items():
-            for sorted_path in sorted_paths:
-                if sorted_path not in paths.keys():
-                    sorted_rows[user_id][sorted_path] = 0
+        for user_id, partial_paths in partial_rows.items():
+            paths: Optional[dict[str, int]] = sorted_rows.get(user_id)
+            if paths is None:
+                sorted_rows[user_id] = partial_paths
+                continue
+            for path, length in partial_paths.items():
+                paths[path] = paths.get(path, 0) + length
         return sorted_rows
 
     @classmethod
@@ -149,7 +1027,8 @@ class TransformationHandler:
     ) -> list[list[str]]:
         """
         returns the data in the shape of a list of list of strings,
-        with the list of headers as the first item
+        with the list of headers as the first item and zeros for the
+        paths a user never visited
 
         sorted_rows  dict[int, dict[str, int]]: the dictionary of data
                                                 to be transformed into a list
@@ -160,30 +1039,130 @@ class TransformationHandler:
             list[list[str]]: the data transformed as a list of list of
                              strings, starting with the list of headers
         """
-        headers: list[str] = deepcopy(sorted_paths)
-        headers.insert(0, 'user_id')
-        flattened_rows: list[list[str]] = [headers]
+        return list(cls.iter_flattened_rows(sorted_rows, sorted_paths))
 
-        for user_id, _ in sorted_rows.items():
+    @classmethod
+    def iter_flattened_rows(
+        cls,
+        sorted_rows: dict[int, dict[str, int]],
+        sorted_paths: list[str]
+    ) -> Iterator[list[str]]:
+        """
+        yields the data one row of strings at a time, starting with
+        the headers, so the output is never built as a whole
+
+        sorted_rows  dict[int, dict[str, int]]: the dictionary of data
+                                                to be flattened
+        sorted_paths  list[str]: the page paths which will be used as the
+                                 first item (headers)
+
+        returns:
+            Iterator[list[str]]: the headers followed by one row of
+                                 strings per user
+        """
+        yield ['user_id', *sorted_paths]
+
+        for user_id, paths in sorted_rows.items():
             flattened_row = [str(user_id)]
             for sorted_path in sorted_paths:
-                length: str = str(sorted_rows[user_id][sorted_path])
-                flattened_row.append(length)
-            flattened_rows.append(flattened_row)
-
-        return flattened_rows
+                flattened_row.append(str(paths.get(sorted_path, 0)))
+            yield flattened_row
 
 
 class LoadingHandler:
+    output_format: str = OUTPUT_FORMAT
+
     @classmethod
-    def load(cls, rows: list[list[str]]):
+    def load_pivot(
+        cls,
+        pivot: SparsePivot,
+        name: str = 'output',
+        output_format: Optional[str] = None
+    ):
+        """
+        writes the provided pivot in the configured output format,
+        either as CSV rows to /output/{name}.csv or in the binary
+        sparse pivot format to /output/{name}.pivot; CSV rows are
+        flattened as their own pipeline stage when pipelining is
+        enabled, so that they are formatted while others are written
+
+        pivot  SparsePivot: the pivot to write
+        name  str: the name of the file to write to without
+                   the file extension
+        output_format  Optional[str]: the output format, defaulting
+                                      to the configured OUTPUT_FORMAT
+        """
+        if output_format is None:
+            output_format = cls.output_format
+        if output_format == 'csv':
+            with Pipeline.stream(
+                'flatten_rows',
+                RunMetrics.meter('flatten_rows', pivot.iter_rows())
+            ) as rows:
+                cls.load(rows, name)
+        elif output_format == 'sparse':
+            with RunMetrics.phase('load') as phase:
+                phase.rows_in += len(pivot)
+                phase.bytes += LoadingService.load_sparse(name, pivot)
+        else:
+            raise InvalidParams()
+
+    @classmethod
+    def load(cls, rows: Iterable[list[Union[str, int]]], name: str = 'output'):
         """
         writes the provided CSV rows to the given CSV file name
-        at /output/output.csv
+        at /output/{name}.csv
 
+        rows  Iterable[list[Union[str, int]]]: the rows to write, where
+                                               the first item is the
+                                               headers
         name  str: the name of the CSV to write to without
                    the file extension
-        rows  list[list[str]]: the rows to write, where the
-                               the first item is the headers
         """
-        LoadingService.load('output', rows)
+        with RunMetrics.phase('load') as phase:
+            phase.rows_in += LoadingService.load(name, rows)
+
+    @classmethod
+    def load_sketch(cls, sketch: PathSketch, name: str = 'top_paths'):
+        """
+        writes the estimates of the provided sketch as CSV rows to
+        /output/{name}.csv, keeping the configured number of top
+        paths when it is set
+
+        sketch  PathSketch: the sketch to write
+        name  str: the name of the CSV to write to without
+                   the file extension
+        """
+        cls.load(sketch.iter_rows(PivotSelection.top_paths), name)
+
+    @classmethod
+    def load_reports(cls, reports: list[Report]):
+        """
+        writes each of the provided reports as CSV rows to
+        /output/{name}.csv under the report's name
+
+        reports  list[Report]: the reports to write
+        """
+        for report in reports:
+            cls.load(report.iter_rows(), report.name)
+
+    @classmethod
+    def load_quarantine(cls, name: str = 'quarantine') -> int:
+        """
+        writes the rows and files rejected by the error policy to
+        /output/{name}.csv, or removes the quarantine file of an
+        earlier run if none were rejected
+
+        name  str: the name of the CSV to write to without
+                   the file extension
+
+        returns:
+            int: the number of rejections written
+        """
+        if not ErrorPolicy.rejections:
+            LoadingService.remove(name)
+            return 0
+        return LoadingService.load(
+            name,
+            ErrorPolicy.iter_quarantine_rows()
+        ) - 1
@@ -0,0 +1,427 @@
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import resource
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from itertools import chain, islice
+from typing import Iterable, Iterator, Optional
+
+from .config import METRICS_ENABLED, PROFILE_MODE
+
+
+logger = logging.getLogger(__name__)
+# the number of items metered under a single timer
+METER_BATCH_SIZE: int = 1024
+
+
+class Phase:
+    """
+    the metrics of a single ETL phase; wall time is exclusive of any
+    phase nested inside it, while total and CPU time (the latter
+    recorded only for phases run as a block) include them
+    """
+    name: str
+    wall_seconds: float
+    total_seconds: float
+    cpu_seconds: float
+    rows_in: int
+    rows_out: int
+    bytes: int
+
+    def __init__(self, name: str):
+        self.name: str = name
+        self.clear()
+
+    def clear(self):
+        self.wall_seconds: float = 0
+        self.total_seconds: float = 0
+        self.cpu_seconds: float = 0
+        self.rows_in: int = 0
+        self.rows_out: int = 0
+        self.bytes: int = 0
+
+    def add(self, other: 'Phase'):
+        """
+        adds the metrics of the same phase recorded elsewhere, such as
+        in a worker process
+        """
+        self.wall_seconds += other.wall_seconds
+        self.total_seconds += other.total_seconds
+        self.cpu_seconds += other.cpu_seconds
+        self.rows_in += other.rows_in
+        self.rows_out += other.rows_out
+        self.bytes += other.bytes
+
+    def to_dict(self) -> dict[str, float]:
+        return {
+            'wall_seconds': round(self.wall_seconds, 6),
+            'total_seconds': round(self.total_seconds, 6),
+            'cpu_seconds': round(self.cpu_seconds, 6),
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'bytes': self.bytes
+        }
+
+
+class QueueMetrics:
+    """
+    the metrics of the bounded queue between two pipeline stages: how
+    full it was each time a batch was put, how long the producer was
+    held back by a full queue and how long the consumer waited on
+    an empty one
+    """
+    name: str
+    batches: int
+    items: int
+    max_depth: int
+    total_depth: int
+    put_stall_seconds: float
+    get_stall_seconds: float
+
+    def __init__(self, name: str):
+        self.name: str = name
+        self.batches: int = 0
+        self.items: int = 0
+        self.max_depth: int = 0
+        self.total_depth: int = 0
+        self.put_stall_seconds: float = 0
+        self.get_stall_seconds: float = 0
+
+    def to_dict(self) -> dict[str, float]:
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'max_depth': self.max_depth,
+            'mean_depth': round(self.total_depth / (self.batches or 1), 3),
+            'put_stall_seconds': round(self.put_stall_seconds, 6),
+            'get_stall_seconds': round(self.get_stall_seconds, 6)
+        }
+
+
+class Meter:
+    """
+    an iterable which records the wall time spent producing the items
+    of another iterator, and the number of items, against a phase;
+    items are produced in batches of `batch_size` under a single
+    timer, so that metering costs nothing per item
+    """
+    phase: Phase
+    batch_size: int
+    rows: int
+    wall_seconds: float
+
+    def __init__(self, phase: Phase, iterable: Iterable, batch_size: int):
+        self.phase: Phase = phase
+        self.iterator: Iterator = iter(iterable)
+        self.batch_size: int = batch_size
+        self.rows: int = 0
+        self.wall_seconds: float = 0
+
+    def __iter__(self) -> Iterator:
+        # the batches are flattened without resuming a generator
+        # for every item
+        return chain.from_iterable(self.iter_batches())
+
+    def iter_batches(self) -> Iterator[list]:
+        phase: Phase = self.phase
+        while True:
+            timer: list[float] = RunMetrics.start_timer()
+            try:
+                batch: list = list(islice(self.iterator, self.batch_size))
+            except BaseException:
+                self.wall_seconds += RunMetrics.stop_timer(phase, timer)
+                raise
+            self.wall_seconds += \
+                RunMetrics.stop_timer(phase, timer, len(batch))
+            if not batch:
+                return
+            self.rows += len(batch)
+            yield batch
+
+
+class RunMetrics:
+    """
+    collects the metrics of each phase of a run along with counters,
+    peak memory and optional profiles, and emits them as a structured
+    run report
+    """
+    enabled: bool = METRICS_ENABLED
+    profile_mode: str = PROFILE_MODE
+    phases: dict[str, Phase] = {}
+    queues: dict[str, QueueMetrics] = {}
+    counters: dict[str, int] = {}
+    # further named statistics to include in the report as they are
+    sections: dict[str, dict] = {}
+    lock: threading.Lock = threading.Lock()
+    local: threading.local = threading.local()
+    profiler: Optional[cProfile.Profile] = None
+
+    @classmethod
+    def reset(cls):
+        """
+        discards the metrics of any previous run
+        """
+        cls.phases = {}
+        cls.queues = {}
+        cls.counters = {}
+        cls.sections = {}
+
+    @classmethod
+    def get_phase(cls, name: str) -> Phase:
+        with cls.lock:
+            if name not in cls.phases:
+                cls.phases[name] = Phase(name)
+            return cls.phases[name]
+
+    @classmethod
+    def get_queue(cls, name: str) -> QueueMetrics:
+        with cls.lock:
+            if name not in cls.queues:
+                cls.queues[name] = QueueMetrics(name)
+            return cls.queues[name]
+
+    @classmethod
+    def start_timer(cls) -> list[float]:
+        """
+        starts timing a block on the current thread, returning the
+        timer to pass to `stop_timer`
+        """
+        try:
+            stack: list[list[float]] = cls.local.stack
+        except AttributeError:
+            stack = cls.local.stack = []
+        # the start time and the time of the blocks nested inside
+        timer: list[float] = [time.perf_counter(), 0]
+        stack.append(timer)
+        return timer
+
+    @classmethod
+    def stop_timer(cls, phase: Phase, timer: list[float], rows: int = 0) \
+            -> float:
+        """
+        adds the wall time of a timed block to a phase, excluding the
+        time of any block timed inside it on the same thread, along
+        with the rows the block produced, and returns the block's
+        inclusive elapsed time
+        """
+        elapsed: float = time.perf_counter() - timer[0]
+        stack: list[list[float]] = cls.local.stack
+        stack.pop()
+        # phases are shared by the threads fetching files concurrently
+        with cls.lock:
+            phase.wall_seconds += elapsed - timer[1]
+            phase.total_seconds += elapsed
+            phase.rows_out += rows
+        if stack:
+            stack[-1][1] += elapsed
+        return elapsed
+
+    @classmethod
+    @contextmanager
+    def phase(cls, name: str) -> Iterator[Phase]:
+        """
+        records the wall and CPU time of a block against a phase,
+        yielding the phase so the block can record its row counts
+
+        name  str: the name of the phase
+        """
+        phase: Phase = cls.get_phase(name)
+        if not cls.enabled:
+            yield phase
+            return
+        cpu_start: float = time.process_time()
+        timer: list[float] = cls.start_timer()
+        try:
+            yield phase
+        finally:
+            cpu_seconds: float = time.process_time() - cpu_start
+            cls.stop_timer(phase, timer)
+            with cls.lock:
+                phase.cpu_seconds += cpu_seconds
+
+    @classmethod
+    def meter(
+        cls,
+        name: str,
+        iterable: Iterable,
+        batch_size: int = METER_BATCH_SIZE
+    ) -> Iterable:
+        """
+        returns the iterable wrapped so that the time spent producing
+        its items and their number are recorded against a phase
+
+        name  str: the name of the phase
+        iterable  Iterable: the items produced by the phase
+        batch_size  int: the number of items produced under each
+                         timer, which are held until they are consumed
+
+        returns:
+            Iterable: the same items
+        """
+        if not cls.enabled:
+            return iterable
+        return Meter(cls.get_phase(name), iterable, batch_size)
+
+    @classmethod
+    def count_bytes(cls, name: str, chunks: Iterable[bytes]) \
+            -> Iterator[bytes]:
+        """
+        yields the given chunks, adding their size to a phase
+        """
+        phase: Phase = cls.get_phase(name)
+        for chunk in chunks:
+            with cls.lock:
+                phase.bytes += len(chunk)
+            yield chunk
+
+    @classmethod
+    def increment(cls, name: str, amount: int = 1):
+        with cls.lock:
+            cls.counters[name] = cls.counters.get(name, 0) + amount
+
+    @classmethod
+    def drain(cls) -> tuple[dict[str, Phase], dict[str, int]]:
+        """
+        returns and clears the phases and counters recorded since they
+        were last drained, so that a worker process can return them;
+        phases are cleared in place, so that blocks still timing them
+        keep recording to the run's phases
+        """
+        with cls.lock:
+            phases: dict[str, Phase] = {}
+            for name, phase in cls.phases.items():
+                phases[name] = Phase(name)
+                phases[name].add(phase)
+                phase.clear()
+            counters: dict[str, int] = dict(cls.counters)
+            cls.counters.clear()
+        return phases, counters
+
+    @classmethod
+    def absorb(cls, drained: tuple[dict[str, Phase], dict[str, int]]):
+        """
+        adds the phases and counters drained from a worker process
+        """
+        phases, counters = drained
+        for name, phase in phases.items():
+            own_phase: Phase = cls.get_phase(name)
+            with cls.lock:
+                own_phase.add(phase)
+        for name, amount in counters.items():
+            cls.increment(name, amount)
+
+    @classmethod
+    def start_profile(cls):
+        """
+        starts the profiler selected by PROFILE_MODE, if any
+        """
+        if cls.profile_mode == 'cprofile':
+            cls.profiler = cProfile.Profile()
+            cls.profiler.enable()
+        elif cls.profile_mode == 'tracemalloc':
+            tracemalloc.start()
+
+    @classmethod
+    def stop_profile(cls, output_file_path: str) -> dict:
+        """
+        stops the running profiler, saving a cProfile capture next to
+        the output, and returns its summary for the run report
+        """
+        if cls.profile_mode == 'cprofile' and cls.profiler is not None:
+            cls.profiler.disable()
+            cls.profiler.dump_stats(
+                os.path.join(output_file_path, 'profile.pstats')
+            )
+            summary = io.StringIO()
+            pstats.Stats(cls.profiler, stream=summary) \
+                .sort_stats('cumulative').print_stats(20)
+            cls.profiler = None
+            return {'cprofile': summary.getvalue().splitlines()}
+        if cls.profile_mode == 'tracemalloc' and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            _, peak_bytes = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            return {'tracemalloc': {
+                'peak_bytes': peak_bytes,
+                'top_allocations': [
+                    str(statistic) for statistic
+                    in snapshot.statistics('lineno')[:20]
+                ]
+            }}
+        return {}
+
+    @classmethod
+    def peak_rss_bytes(cls) -> dict[str, int]:
+        """
+        returns the peak resident set size of this process and of
+        its largest finished child process, such as a worker
+        """
+        # ru_maxrss is reported in kilobytes on Linux
+        self_usage = resource.getrusage(resource.RUSAGE_SELF)
+        children_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return {
+            'self': self_usage.ru_maxrss * 1024,
+            'children': children_usage.ru_maxrss * 1024
+        }
+
+    @classmethod
+    def report(cls, profile: Optional[dict] = None) -> dict:
+        """
+        returns the structured run report
+
+        profile  Optional[dict]: the summary of the run's profile
+
+        returns:
+            dict: the metrics of each phase, the counters, the peak
+                  resident set size, and the metrics of each pipeline
+                  queue, the further sections and the profile, if any
+        """
+        report: dict = {
+            'phases': {name: phase.to_dict()
+                       for name, phase in cls.phases.items()},
+            'counters': dict(cls.counters),
+            'peak_rss_bytes': cls.peak_rss_bytes()
+        }
+        if cls.queues:
+            report['queues'] = {name: queue.to_dict()
+                                for name, queue in cls.queues.items()}
+        report.update(cls.sections)
+        if profile:
+            report['profile'] = profile
+        return report
+
+    @classmethod
+    def write_report(
+        cls,
+        output_file_path: str,
+        profile: Optional[dict],
+        name: str = 'run_report'
+    ):
+        """
+        writes the run report to {name}.json next to the output
+        and logs a one line summary of each phase
+        """
+        report: dict = cls.report(profile)
+        with open(os.path.join(output_file_path, f'{name}.json'),
+                  'w') as file:
+            json.dump(report, file, indent=2)
+        for name, phase in report['phases'].items():
+            logger.info(
+                '%s: %.3fs wall, %.3fs total, %.3fs cpu, %d rows in, '
+                '%d rows out, %d bytes', name, phase['wall_seconds'],
+                phase['total_seconds'], phase['cpu_seconds'],
+                phase['rows_in'], phase['rows_out'], phase['bytes']
+            )
+        for name, queue in report.get('queues', {}).items():
+            logger.info(
+                '%s queue: %d batches, %d max depth, %.3f mean depth, '
+                '%.3fs put stall, %.3fs get stall', name, queue['batches'],
+                queue['max_depth'], queue['mean_depth'],
+                queue['put_stall_seconds'], queue['get_stall_seconds']
+            )
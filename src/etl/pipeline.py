@@ -0,0 +1,175 @@
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterable, Iterator, Optional
+
+from .config import PIPELINE_BATCH_SIZE, PIPELINE_ENABLED, PIPELINE_QUEUE_SIZE
+from .exceptions import InvalidParams
+from .metrics import QueueMetrics, RunMetrics
+
+
+class Pipeline:
+    """
+    runs the producer of an iterable as its own stage, on a thread
+    which hands its items to the consuming stage in batches through a
+    bounded queue, so that a stage waiting on the network overlaps
+    with a stage using the CPU
+
+    a full queue holds the producer back, so at most `queue_size` + 2
+    batches of `batch_size` items are ever in flight between two
+    stages; an error raised by the producer is raised again in the
+    consumer, and a consumer which stops early or fails cancels the
+    producer and waits for it to stop
+    """
+    enabled: bool = PIPELINE_ENABLED
+    queue_size: int = PIPELINE_QUEUE_SIZE
+    batch_size: int = PIPELINE_BATCH_SIZE
+    # how often a producer held back by a full queue checks whether
+    # it has been cancelled
+    poll_seconds: float = 0.1
+
+    class Failure:
+        """
+        an error raised by a producer, queued in place of a batch
+        """
+        error: BaseException
+
+        def __init__(self, error: BaseException):
+            self.error: BaseException = error
+
+    class Channel:
+        """
+        the bounded queue between two stages, recording its depth and
+        the time each side spends waiting on the other
+        """
+        batches: queue.Queue
+        cancelled: threading.Event
+        metrics: QueueMetrics
+
+        def __init__(self, name: str, size: int):
+            self.batches: queue.Queue = queue.Queue(maxsize=size)
+            self.cancelled: threading.Event = threading.Event()
+            self.metrics: QueueMetrics = RunMetrics.get_queue(name)
+
+        def put(self, batch: list, poll_seconds: float) -> bool:
+            """
+            queues a batch, waiting while the queue is full
+
+            returns:
+                bool: False if the consumer cancelled the stage
+                      before the batch could be queued
+            """
+            start: float = time.perf_counter()
+            if not self.wait_to_put(batch, poll_seconds):
+                return False
+            metrics: QueueMetrics = self.metrics
+            depth: int = self.batches.qsize()
+            metrics.put_stall_seconds += time.perf_counter() - start
+            metrics.batches += 1
+            metrics.items += len(batch)
+            metrics.max_depth = max(metrics.max_depth, depth)
+            metrics.total_depth += depth
+            return True
+
+        def wait_to_put(self, item, poll_seconds: float) -> bool:
+            while not self.cancelled.is_set():
+                try:
+                    self.batches.put(item, timeout=poll_seconds)
+                except queue.Full:
+                    continue
+                return True
+            return False
+
+        def get(self):
+            """
+            returns the next batch, waiting while the queue is empty
+            """
+            start: float = time.perf_counter()
+            batch = self.batches.get()
+            self.metrics.get_stall_seconds += time.perf_counter() - start
+            return batch
+
+        def cancel(self):
+            self.cancelled.set()
+
+    @classmethod
+    @contextmanager
+    def stream(cls, name: str, iterable: Iterable) -> Iterator[Iterable]:
+        """
+        yields an iterator of the items of `iterable`, produced on its
+        own stage thread when pipelining is enabled, and otherwise
+        the iterable itself
+
+        name  str: the name of the producing stage's queue in the
+                   run report
+        iterable  Iterable: the items produced by the stage
+
+        returns:
+            Iterator[Iterable]: the items of `iterable`, in order
+        """
+        if not cls.enabled:
+            yield iterable
+            return
+        if cls.queue_size < 1 or cls.batch_size < 1:
+            raise InvalidParams()
+
+        channel = cls.Channel(name, cls.queue_size)
+        producer = threading.Thread(
+            target=cls.produce,
+            args=(channel, iterable),
+            name=f'pipeline-{name}',
+            daemon=True
+        )
+        producer.start()
+        try:
+            yield cls.consume(channel)
+        finally:
+            channel.cancel()
+            producer.join()
+
+    @classmethod
+    def produce(cls, channel: Channel, iterable: Iterable):
+        """
+        queues the items of an iterable in batches until it is
+        exhausted or fails, or the stage is cancelled, then ends the
+        stream with None or the producer's error
+        """
+        end: Optional[Pipeline.Failure] = None
+        batch: list = []
+        try:
+            iterator: Iterator = iter(iterable)
+            try:
+                for item in iterator:
+                    batch.append(item)
+                    if len(batch) < cls.batch_size:
+                        continue
+                    if not channel.put(batch, cls.poll_seconds):
+                        return
+                    batch = []
+            finally:
+                close = getattr(iterator, 'close', None)
+                if close is not None:
+                    # releases the iterator's resources on this thread,
+                    # such as a cancelled download
+                    close()
+        except BaseException as error:
+            end = cls.Failure(error)
+        # the items produced before an error are consumed before it
+        if batch and not channel.put(batch, cls.poll_seconds):
+            return
+        channel.wait_to_put(end, cls.poll_seconds)
+
+    @classmethod
+    def consume(cls, channel: Channel) -> Iterator:
+        """
+        yields the items of each queued batch, raising the producer's
+        error once the batches before it have been consumed
+        """
+        while True:
+            batch = channel.get()
+            if batch is None:
+                return
+            if isinstance(batch, cls.Failure):
+                raise batch.error
+            yield from batch
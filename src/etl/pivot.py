@@ -0,0 +1,196 @@
+from array import array
+from typing import Iterable, Iterator, Union
+
+from .exceptions import InvalidParams
+
+
+# the range of the 64-bit integers user IDs and lengths are stored as
+MIN_VALUE: int = -2 ** 63
+MAX_VALUE: int = 2 ** 63 - 1
+
+
+class SparsePivot:
+    """
+    a compressed sparse row pivot of cumulative page view lengths by
+    user and path, which keeps only the paths each user visited and
+    produces the zeros for every other path only as rows are written
+    """
+    paths: list[str]
+    user_ids: array
+    offsets: array
+    path_indexes: array
+    lengths: array
+
+    def __init__(self, paths: list[str]):
+        self.paths: list[str] = paths
+        self.user_ids: array = array('q')
+        self.offsets: array = array('q', [0])
+        self.path_indexes: array = array('q')
+        self.lengths: array = array('q')
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    def append(self, user_id: int, entries: Iterable[tuple[int, int]]):
+        """
+        adds a user's row to the end of the pivot
+
+        user_id  int: the user's ID
+        entries  Iterable[tuple[int, int]]: the index into `paths` and
+                                            the cumulative length of
+                                            each path the user visited,
+                                            sorted by path index
+        """
+        # summed lengths can outgrow the 64-bit range of lengths
+        # which were each within it
+        try:
+            self.user_ids.append(user_id)
+            for path_index, length in entries:
+                self.path_indexes.append(path_index)
+                self.lengths.append(length)
+        except OverflowError:
+            raise InvalidParams()
+        self.offsets.append(len(self.lengths))
+
+    @classmethod
+    def from_sorted_rows(
+        cls,
+        sorted_rows: dict[int, dict[str, int]],
+        sorted_paths: list[str]
+    ) -> 'SparsePivot':
+        """
+        returns the sparse pivot of the given rows, emptying each
+        user's dict as it is compacted to bound the peak memory
+
+        sorted_rows  dict[int, dict[str, int]]: the paths and cumulative
+                                                lengths of each user
+        sorted_paths  list[str]: the sorted, unique paths of all users
+
+        returns:
+            SparsePivot: the compacted pivot
+        """
+        pivot = cls(sorted_paths)
+        indexes: dict[str, int] = {
+            path: index for index, path in enumerate(sorted_paths)
+        }
+        for user_id, paths in sorted_rows.items():
+            pivot.append(user_id, sorted(
+                (indexes[path], length) for path, length in paths.items()
+            ))
+            paths.clear()
+        return pivot
+
+    def to_sorted_rows(self) -> dict[int, dict[str, int]]:
+        """
+        returns the pivot expanded back into the paths and cumulative
+        lengths of each user, in the pivot's user order, so that it
+        can be merged with other pivots
+
+        returns:
+            dict[int, dict[str, int]]: the paths and cumulative lengths
+                                       of each user
+        """
+        paths: list[str] = self.paths
+        return {
+            user_id: {
+                paths[path_index]: length
+                for path_index, length in zip(path_indexes, lengths)
+            }
+            for user_id, path_indexes, lengths in self.iter_entries()
+        }
+
+    def path_totals(self) -> array:
+        """
+        returns the total length of each path across all users
+
+        returns:
+            array: the total lengths, indexed like `paths`
+        """
+        totals: array = array('q', bytes(8 * len(self.paths)))
+        for path_index, length in zip(self.path_indexes, self.lengths):
+            totals[path_index] += length
+        return totals
+
+    def select(self, path_indexes: list[int], min_user_length: int = 0) \
+            -> 'SparsePivot':
+        """
+        returns a pivot of only the given paths, leaving out the users
+        who visited none of them or whose total length across them is
+        below `min_user_length`
+
+        path_indexes  list[int]: the sorted indexes of the paths to keep
+        min_user_length  int: the least total length of a user to keep
+
+        returns:
+            SparsePivot: the pivot of the selected paths and users
+        """
+        pivot = SparsePivot([self.paths[index] for index in path_indexes])
+        ranks: dict[int, int] = {
+            path_index: rank for rank, path_index in enumerate(path_indexes)
+        }
+        for user_id, indexes, lengths in self.iter_entries():
+            entries: list[tuple[int, int]] = [
+                (ranks[path_index], length)
+                for path_index, length in zip(indexes, lengths)
+                if path_index in ranks
+            ]
+            if entries and \
+                    sum(length for _, length in entries) >= min_user_length:
+                pivot.append(user_id, entries)
+        return pivot
+
+    def iter_entries(self) -> Iterator[tuple[int, array, array]]:
+        """
+        yields each user's ID with the path indexes and lengths
+        of only the paths they visited
+
+        returns:
+            Iterator[tuple[int, array, array]]: the user ID, path
+                                                indexes and lengths
+        """
+        offsets: array = self.offsets
+        for position, user_id in enumerate(self.user_ids):
+            start: int = offsets[position]
+            end: int = offsets[position + 1]
+            yield (
+                user_id,
+                self.path_indexes[start:end],
+                self.lengths[start:end]
+            )
+
+    def iter_rows(self) -> Iterator[list[Union[str, int]]]:
+        """
+        yields the headers followed by one row per user, leaving the
+        user IDs and lengths as integers for the writer to format and
+        filling in zeros for the paths each user never visited
+
+        returns:
+            Iterator[list[Union[str, int]]]: the pivoted rows, starting
+                                             with the headers
+        """
+        yield ['user_id', *self.paths]
+
+        zeros: list[int] = [0] * len(self.paths)
+        for user_id, path_indexes, lengths in self.iter_entries():
+            row: list[int] = [user_id, *zeros]
+            for path_index, length in zip(path_indexes, lengths):
+                row[path_index + 1] = length
+            yield row
+
+    def iter_flattened_rows(self) -> Iterator[list[str]]:
+        """
+        yields the headers followed by one row of strings per user,
+        filling in zeros for the paths each user never visited
+
+        returns:
+            Iterator[list[str]]: the pivoted rows, starting with
+                                 the headers
+        """
+        yield ['user_id', *self.paths]
+
+        zeros: list[str] = ['0'] * len(self.paths)
+        for user_id, path_indexes, lengths in self.iter_entries():
+            row: list[str] = [str(user_id), *zeros]
+            for path_index, length in zip(path_indexes, lengths):
+                row[path_index + 1] = str(length)
+            yield row
@@ -0,0 +1,153 @@
+import threading
+from typing import Any, Iterator
+
+import requests
+
+from .config import ERROR_POLICY, MAX_ERROR_RATIO
+from .exceptions import (
+    InvalidParams,
+    InvalidFilename,
+    BadRequest,
+    BadResponse,
+    ErrorThresholdExceeded
+)
+from .services import CSV_HEADERS
+
+
+# the errors which reject a single row, and those which reject
+# a whole file, when the error policy allows them to be skipped
+ROW_ERRORS: tuple[type, ...] = (InvalidParams,)
+FILE_ERRORS: tuple[type, ...] = (
+    InvalidParams,
+    InvalidFilename,
+    BadRequest,
+    BadResponse,
+    requests.RequestException
+)
+POLICIES: list[str] = ['fail-fast', 'skip-row', 'skip-file']
+
+
+class ErrorPolicy:
+    """
+    decides whether a malformed row or a failed file aborts the job,
+    and records the rows and files it allows to be skipped so that
+    they can be written to /output/quarantine.csv and counted in the
+    run report
+
+    'fail-fast' aborts on the first error, 'skip-row' skips malformed
+    rows, and 'skip-file' skips any file which fails to download or
+    contains a malformed row; with either skip policy, the job still
+    fails once more than `max_error_ratio` of the rows or files seen
+    have been rejected
+    """
+    policy: str = ERROR_POLICY
+    max_error_ratio: float = MAX_ERROR_RATIO
+    lock: threading.Lock = threading.Lock()
+    counters: dict[str, int] = {}
+    rejections: list[list[str]] = []
+
+    @classmethod
+    def reset(cls):
+        """
+        discards the counters and rejections of any previous run
+        """
+        if cls.policy not in POLICIES:
+            raise InvalidParams()
+        cls.counters = {
+            'rows_seen': 0,
+            'rows_rejected': 0,
+            'files_seen': 0,
+            'files_rejected': 0
+        }
+        cls.rejections = []
+
+    @classmethod
+    def skips_rows(cls) -> bool:
+        return cls.policy == 'skip-row'
+
+    @classmethod
+    def skips_files(cls) -> bool:
+        return cls.policy == 'skip-file'
+
+    @classmethod
+    def count(cls, name: str, amount: int = 1):
+        with cls.lock:
+            cls.counters[name] = cls.counters.get(name, 0) + amount
+
+    @classmethod
+    def reject_row(cls, source: str, row: Any, error: Exception):
+        """
+        records a malformed row which is being skipped
+
+        source  str: the name of the file the row came from, if known
+        row  Any: the row as it was extracted
+        error  Exception: the error the row raised
+        """
+        fields: list[str] = [str(field) for field in row] \
+            if isinstance(row, (list, tuple)) else [repr(row)]
+        with cls.lock:
+            cls.counters['rows_rejected'] = \
+                cls.counters.get('rows_rejected', 0) + 1
+            cls.rejections.append([source, type(error).__name__, *fields])
+
+    @classmethod
+    def reject_file(cls, name: str, error: Exception):
+        """
+        records a file which is being skipped
+
+        name  str: the name of the file
+        error  Exception: the error the file raised
+        """
+        with cls.lock:
+            cls.counters['files_rejected'] = \
+                cls.counters.get('files_rejected', 0) + 1
+            cls.rejections.append([name, type(error).__name__])
+
+    @classmethod
+    def drain(cls) -> tuple[dict[str, int], list[list[str]]]:
+        """
+        returns and clears the counters and rejections recorded so far,
+        so that a worker process can hand them back to its parent
+        """
+        with cls.lock:
+            drained = (cls.counters, cls.rejections)
+            cls.counters = {}
+            cls.rejections = []
+        return drained
+
+    @classmethod
+    def absorb(cls, drained: tuple[dict[str, int], list[list[str]]]):
+        """
+        adds the counters and rejections drained from a worker process
+        """
+        counters, rejections = drained
+        with cls.lock:
+            for name, amount in counters.items():
+                cls.counters[name] = cls.counters.get(name, 0) + amount
+            cls.rejections += rejections
+
+    @classmethod
+    def check(cls):
+        """
+        raises ErrorThresholdExceeded if more than `max_error_ratio`
+        of the rows or of the files seen so far have been rejected
+        """
+        for kind in ['rows', 'files']:
+            seen: int = cls.counters.get(f'{kind}_seen', 0)
+            rejected: int = cls.counters.get(f'{kind}_rejected', 0)
+            if seen and rejected / seen > cls.max_error_ratio:
+                raise ErrorThresholdExceeded()
+
+    @classmethod
+    def iter_quarantine_rows(cls) -> Iterator[list[str]]:
+        """
+        yields the rejected rows and files as CSV rows of the source
+        file name, the error and any fields of the rejected row,
+        starting with the headers
+
+        returns:
+            Iterator[list[str]]: the headers followed by one row per
+                                 rejection
+        """
+        yield ['source', 'error', *CSV_HEADERS]
+        yield from cls.rejections
@@ -0,0 +1,282 @@
+import json
+import re
+from operator import attrgetter
+from typing import Callable, Iterator, Optional, Union
+
+from .config import TRANSFORM_REPORTS
+from .exceptions import InvalidFormat, InvalidParams
+
+
+REPORTS_FORMAT: str = 'reports/1'
+KEYS: list[str] = ['path', 'user_id']
+AGGREGATES: dict[str, str] = {
+    'sum': 'sum_length',
+    'count': 'count',
+    'avg': 'avg_length'
+}
+NAME_PATTERN: re.Pattern = re.compile(r'[\w-]+')
+# the names of the files the job already writes to
+RESERVED_NAMES: list[str] = [
+    'output', 'quarantine', 'run_report', 'top_paths', 'reports'
+]
+
+
+class Report:
+    """
+    a report definition, with the sum and count of the length of the
+    page views in each of its groups
+    """
+    name: str
+    keys: list[str]
+    aggregates: list[str]
+    groups: dict
+
+    def __init__(self, name: str, keys: list[str], aggregates: list[str]):
+        if NAME_PATTERN.fullmatch(name) is None or name in RESERVED_NAMES \
+                or len(set(keys)) != len(keys) \
+                or any(key not in KEYS for key in keys) \
+                or not aggregates \
+                or any(aggregate not in AGGREGATES
+                       for aggregate in aggregates):
+            raise InvalidParams()
+        self.name: str = name
+        self.keys: list[str] = keys
+        self.aggregates: list[str] = aggregates
+        # the group of a row is a single key, a tuple of keys, or the
+        # empty tuple when the report totals every row
+        self.group_of: Callable = attrgetter(*keys) if keys \
+            else lambda row: ()
+        self.groups: dict = {}
+
+    @classmethod
+    def parse(cls, definition: str) -> 'Report':
+        """
+        returns the report of a definition such as
+        'path_totals=path:sum,avg', which names the report, then gives
+        its comma separated group keys and aggregates after '='
+        and ':'
+        """
+        name, _, spec = definition.strip().partition('=')
+        keys, _, aggregates = spec.partition(':')
+        return cls(
+            name.strip(),
+            [key.strip() for key in keys.split(',') if key.strip()],
+            [
+                aggregate.strip() for aggregate in aggregates.split(',')
+                if aggregate.strip()
+            ]
+        )
+
+    def copy(self) -> 'Report':
+        """
+        returns an empty report with the same definition
+        """
+        return Report(self.name, self.keys, self.aggregates)
+
+    def add(self, row):
+        """
+        adds the length of a parsed row to the sums of its group
+
+        row  TransformationHandler.Row: the parsed row
+        """
+        group = self.group_of(row)
+        sums: Optional[list[int]] = self.groups.get(group)
+        if sums is None:
+            self.groups[group] = [row.length, 1]
+        else:
+            sums[0] += row.length
+            sums[1] += 1
+
+    def merge(self, groups: dict):
+        """
+        adds the sums of the groups of another report with the same
+        definition to this one
+        """
+        own_groups: dict = self.groups
+        for group, (total, count) in groups.items():
+            sums: Optional[list[int]] = own_groups.get(group)
+            if sums is None:
+                own_groups[group] = [total, count]
+            else:
+                sums[0] += total
+                sums[1] += count
+
+    def iter_rows(self) -> Iterator[list[Union[str, int, float]]]:
+        """
+        yields a header row, then the keys and aggregates of every
+        group in the order of its keys
+
+        returns:
+            Iterator[list[Union[str, int, float]]]: the CSV rows
+        """
+        yield self.keys + [
+            AGGREGATES[aggregate] for aggregate in self.aggregates
+        ]
+        for group in sorted(self.groups):
+            total, count = self.groups[group]
+            values: dict[str, Union[int, float]] = {
+                'sum': total,
+                'count': count,
+                'avg': round(total / count, 6)
+            }
+            yield self.key_list(group) + [
+                values[aggregate] for aggregate in self.aggregates
+            ]
+
+    def key_list(self, group) -> list[Union[str, int]]:
+        if len(self.keys) == 1:
+            return [group]
+        return list(group)
+
+    def group_from_list(self, key_list: list[Union[str, int]]):
+        if len(self.keys) == 1:
+            return key_list[0]
+        return tuple(key_list)
+
+
+class Reports:
+    """
+    aggregates every configured report in the same pass over the rows
+    as the pivot, from the rows already parsed, and interned, for it
+
+    `definitions` separates reports by ';', such as
+    'path_totals=path:sum,avg;visits=user_id,path:count', where each
+    report groups page views by its `path` and/or `user_id` keys, or
+    totals all of them when it has none, and aggregates their lengths
+    by 'sum', 'count' and/or 'avg'; rows of paths left out by the path
+    patterns are left out of the reports as well
+
+    the groups summed since they were last drained are held apart from
+    those absorbed, so that a worker process can return the groups of
+    each file, and the groups of a file which is skipped can be
+    discarded
+    """
+    definitions: str = TRANSFORM_REPORTS
+    reports: Optional[list[Report]] = None
+    absorbed: list[Report] = []
+
+    @classmethod
+    def reset(cls):
+        """
+        parses the definitions and discards the groups of any
+        previous run
+        """
+        reports: list[Report] = [
+            Report.parse(definition)
+            for definition in cls.definitions.split(';')
+            if definition.strip()
+        ]
+        if len({report.name for report in reports}) != len(reports):
+            raise InvalidParams()
+        cls.reports = reports
+        cls.absorbed = [report.copy() for report in reports]
+
+    @classmethod
+    def enabled(cls) -> bool:
+        if cls.reports is None:
+            cls.reset()
+        return bool(cls.reports)
+
+    @classmethod
+    def tap(cls, create: Callable, path_filter=None) -> Callable:
+        """
+        returns a function which creates a parsed row as `create` does
+        and adds it to every report
+
+        create  Callable[[list[str]], TransformationHandler.Row]: the
+                                                                 parser
+        path_filter  Optional[PivotSelection.PathFilter]: the paths
+                                                          to keep,
+                                                          if not all
+        """
+        adds: list[Callable] = [report.add for report in cls.reports]
+
+        def create_and_add(row: list[str]):
+            parsed_row = create(row)
+            if path_filter is None or path_filter.selects(parsed_row.path):
+                for add in adds:
+                    add(parsed_row)
+            return parsed_row
+        return create_and_add
+
+    @classmethod
+    def drain(cls) -> list[dict]:
+        """
+        returns and clears the groups summed since they were last
+        drained, so that a worker process can return them
+        """
+        if not cls.enabled():
+            return []
+        drained: list[dict] = [report.groups for report in cls.reports]
+        for report in cls.reports:
+            report.groups = {}
+        return drained
+
+    @classmethod
+    def discard(cls):
+        """
+        discards the groups summed since they were last drained
+        """
+        cls.drain()
+
+    @classmethod
+    def absorb(cls, drained: list[dict]):
+        """
+        adds the groups drained from a worker process, or read back
+        from a sharded run
+        """
+        for report, groups in zip(cls.absorbed, drained):
+            report.merge(groups)
+
+    @classmethod
+    def results(cls) -> list[Report]:
+        """
+        returns every report with all of the groups summed in the run,
+        including those absorbed from worker processes
+        """
+        cls.absorb(cls.drain())
+        return cls.absorbed
+
+    @classmethod
+    def to_bytes(cls, reports: list[Report]) -> bytes:
+        """
+        returns the groups of the given reports serialized as JSON,
+        to be merged with those of other shards
+        """
+        return json.dumps({
+            'format': REPORTS_FORMAT,
+            'definitions': cls.definitions,
+            'reports': [
+                [
+                    report.key_list(group) + sums
+                    for group, sums in report.groups.items()
+                ]
+                for report in reports
+            ]
+        }).encode('utf-8')
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> list[dict]:
+        """
+        returns the groups serialized by `to_bytes` for every report,
+        as drained, if they were serialized with the same definitions
+        """
+        cls.enabled()
+        try:
+            document: dict = json.loads(data)
+            if document['format'] != REPORTS_FORMAT or \
+                    document['definitions'] != cls.definitions or \
+                    len(document['reports']) != len(cls.reports):
+                raise InvalidFormat()
+            drained: list[dict] = []
+            for report, rows in zip(cls.reports, document['reports']):
+                width: int = len(report.keys)
+                if any(len(row) != width + 2 for row in rows):
+                    raise InvalidFormat()
+                drained.append({
+                    report.group_from_list(row[:width]): row[width:]
+                    for row in rows
+                })
+        except (KeyError, TypeError, ValueError):
+            raise InvalidFormat()
+        return drained
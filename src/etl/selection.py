@@ -0,0 +1,126 @@
+import heapq
+import re
+from array import array
+from typing import Optional
+
+from .config import (
+    TRANSFORM_EXCLUDE_PATHS,
+    TRANSFORM_INCLUDE_PATHS,
+    TRANSFORM_MIN_USER_LENGTH,
+    TRANSFORM_TOP_PATHS
+)
+from .exceptions import InvalidParams
+from .pivot import SparsePivot
+
+
+class PivotSelection:
+    """
+    narrows the pivot to the paths and users a report needs
+
+    paths matching `include_paths`, and not matching `exclude_paths`,
+    are kept while rows are aggregated, so the page views of any other
+    path are never summed; both are regular expressions matched from
+    the start of the path, so a plain prefix such as '/blog/' selects
+    the paths under it
+
+    the `top_paths` paths with the greatest total length and the users
+    whose total length across the selected paths is at least
+    `min_user_length` can only be known once every row has been
+    aggregated, so they are selected as the pivot is finalized, before
+    any zeros are filled in; users who visited none of the selected
+    paths are always left out
+    """
+    top_paths: int = TRANSFORM_TOP_PATHS
+    include_paths: str = TRANSFORM_INCLUDE_PATHS
+    exclude_paths: str = TRANSFORM_EXCLUDE_PATHS
+    min_user_length: int = TRANSFORM_MIN_USER_LENGTH
+
+    class PathFilter:
+        """
+        the include and exclude patterns, with the result for each
+        path remembered so that each distinct path is matched once
+        """
+        include: Optional[re.Pattern]
+        exclude: Optional[re.Pattern]
+        selected: dict[str, bool]
+
+        def __init__(self, include: str, exclude: str):
+            try:
+                self.include = re.compile(include) if include else None
+                self.exclude = re.compile(exclude) if exclude else None
+            except re.error:
+                raise InvalidParams()
+            self.selected: dict[str, bool] = {}
+
+        def selects(self, path: str) -> bool:
+            selected: Optional[bool] = self.selected.get(path)
+            if selected is None:
+                selected = self.selected[path] = (
+                    self.include is None
+                    or self.include.match(path) is not None
+                ) and (
+                    self.exclude is None
+                    or self.exclude.match(path) is None
+                )
+            return selected
+
+    @classmethod
+    def path_filter(cls) -> Optional[PathFilter]:
+        """
+        returns the filter of the paths to aggregate, or None if every
+        path is aggregated
+        """
+        if not cls.include_paths and not cls.exclude_paths:
+            return None
+        return cls.PathFilter(cls.include_paths, cls.exclude_paths)
+
+    @classmethod
+    def path_filter_key(cls) -> str:
+        """
+        returns a key which changes whenever the paths to aggregate do,
+        so that partial pivots aggregated under other patterns are
+        never reused
+        """
+        if cls.path_filter() is None:
+            return ''
+        return f'{cls.include_paths}\n{cls.exclude_paths}'
+
+    @classmethod
+    def is_selective(cls) -> bool:
+        if cls.top_paths < 0 or cls.min_user_length < 0:
+            raise InvalidParams()
+        return cls.path_filter() is not None or cls.top_paths > 0 \
+            or cls.min_user_length > 0
+
+    @classmethod
+    def select(cls, pivot: SparsePivot) -> SparsePivot:
+        """
+        returns the pivot narrowed to the selected paths and users,
+        or the given pivot itself if nothing is to be left out; the
+        top paths are chosen by total length, breaking ties by path
+
+        pivot  SparsePivot: the pivot of all aggregated paths and users
+
+        returns:
+            SparsePivot: the pivot of the selected paths and users
+        """
+        if not cls.is_selective():
+            return pivot
+
+        path_indexes: list[int] = list(range(len(pivot.paths)))
+        path_filter: Optional[cls.PathFilter] = cls.path_filter()
+        if path_filter is not None:
+            # a no-op after aggregation, except for merged pivots which
+            # were aggregated under other patterns
+            path_indexes = [
+                index for index in path_indexes
+                if path_filter.selects(pivot.paths[index])
+            ]
+        if 0 < cls.top_paths < len(path_indexes):
+            totals: array = pivot.path_totals()
+            path_indexes = sorted(heapq.nsmallest(
+                cls.top_paths,
+                path_indexes,
+                key=lambda index: (-totals[index], index)
+            ))
+        return pivot.select(path_indexes, cls.min_user_length)
@@ -1,25 +1,418 @@
+import bz2
+import codecs
 import csv
+import glob
+import gzip
+import io
+import itertools
+import lzma
+import mmap
+import os
+import re
 import string
-from typing import Iterator
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import (
+    BinaryIO,
+    Callable,
+    Generator,
+    Iterable,
+    Iterator,
+    Mapping,
+    Optional,
+    Union
+)
+from urllib.parse import unquote, urljoin, urlsplit
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from .cache import ResponseCache
 from .exceptions import InvalidParams, InvalidFilename, BadRequest, BadResponse
-from .config import WEB_TRAFFIC_DATA_ROOT_URL, OUTPUT_FILE_PATH
+from .formats import SparsePivotReader, SparsePivotWriter
+from .metrics import RunMetrics
+from .pivot import SparsePivot
+from .reports import Report, Reports
+from .sketches import PathSketch
+from .config import (
+    WEB_TRAFFIC_DATA_ROOT_URL,
+    OUTPUT_FILE_PATH,
+    SOURCE_LISTING,
+    SOURCE_MANIFEST,
+    SOURCE_DIRECTORY,
+    SOURCE_GLOB,
+    SOURCE_SHARD,
+    EXTRACTION_CHUNK_SIZE,
+    EXTRACTION_PARSER,
+    EXTRACTION_POOL_SIZE,
+    EXTRACTION_TIMEOUT,
+    EXTRACTION_MAX_RETRIES,
+    EXTRACTION_BACKOFF_FACTOR,
+    EXTRACTION_CACHE_PATH,
+    EXTRACTION_CACHE_MAX_BYTES,
+    EXTRACTION_CACHE_COMPRESS,
+    OUTPUT_COMPRESSION,
+    OUTPUT_BUFFER_SIZE
+)
+
+
+CSV_HEADERS: list[str] = ['drop', 'length', 'path', 'user_agent', 'user_id']
+# the links to CSV files in an HTML index page
+INDEX_LINK_PATTERN: re.Pattern = \
+    re.compile(r'href=["\']([^"\'?#]+\.csv)["\']', re.IGNORECASE)
+# a line of the `drop,length,path,user_agent,user_id` layout in which
+# only the user agent may be quoted and no field may span several lines,
+# capturing the length, path and user ID and an empty drop and user
+# agent; a match can only cover a single whole line, so a chunk whose
+# lines all match has as many matches as line feeds; lengths and user
+# IDs only match as integers of up to 18 digits, which always fit the
+# pivot's values, so that a row which would be rejected is left to the
+# general reader and quarantined in full
+FAST_RECORD_PATTERN: re.Pattern = re.compile(
+    r'^[^,"\r\n]*(),(-?[0-9]{1,18}),([^,"\r\n]*),'
+    r'(?:"[^"\r\n]*(?:""[^"\r\n]*)*"|[^,"\r\n]*)(),(-?[0-9]{1,18})\r?\n',
+    re.MULTILINE
+)
+RETRY_STATUSES: frozenset[int] = frozenset([500, 502, 503, 504])
+# the file extension and the binary stream wrapper of each output
+# compression; zstd is only available when zstandard is installed
+COMPRESSORS: dict[str, tuple[str, Optional[Callable]]] = {
+    '': ('', None),
+    'gzip': ('.gz', lambda file: gzip.GzipFile(fileobj=file, mode='wb')),
+    'bz2': ('.bz2', lambda file: bz2.BZ2File(file, mode='wb')),
+    'xz': ('.xz', lambda file: lzma.LZMAFile(file, mode='wb'))
+}
+if zstandard is not None:
+    COMPRESSORS['zstd'] = (
+        '.zst',
+        lambda file: zstandard.ZstdCompressor().stream_writer(
+            file,
+            closefd=False
+        )
+    )
 
 
 class ExtractionService:
     root_url: str = WEB_TRAFFIC_DATA_ROOT_URL
+    listing: str = SOURCE_LISTING
+    manifest_path: str = SOURCE_MANIFEST
+    directory: str = SOURCE_DIRECTORY
+    pattern: str = SOURCE_GLOB
+    shard: str = SOURCE_SHARD
+    chunk_size: int = EXTRACTION_CHUNK_SIZE
+    parser: str = EXTRACTION_PARSER
+    pool_size: int = EXTRACTION_POOL_SIZE
+    timeout: float = EXTRACTION_TIMEOUT
+    max_retries: int = EXTRACTION_MAX_RETRIES
+    backoff_factor: float = EXTRACTION_BACKOFF_FACTOR
+    session: Optional[requests.Session] = None
+    session_lock: threading.Lock = threading.Lock()
+    # the version of each file as it was read, by the name of the file
+    versions: dict[str, dict[str, str]] = {}
+    cache: Optional[ResponseCache] = ResponseCache(
+        EXTRACTION_CACHE_PATH,
+        EXTRACTION_CACHE_MAX_BYTES,
+        EXTRACTION_CACHE_COMPRESS,
+        EXTRACTION_CHUNK_SIZE
+    ) if EXTRACTION_CACHE_PATH else None
+
+    @classmethod
+    def get_session(cls) -> requests.Session:
+        """
+        returns the HTTP session shared by all fetches, creating it on
+        first use so that connections are kept alive and reused across
+        files and threads
+
+        returns:
+            requests.Session: the shared, connection-pooled session
+        """
+        with cls.session_lock:
+            if cls.session is None:
+                cls.session = cls.create_session()
+            return cls.session
+
+    @classmethod
+    def reset_session(cls):
+        """
+        discards the shared HTTP session without closing it, so that
+        a forked worker process opens its own connections rather than
+        sharing the parent's sockets
+        """
+        cls.session_lock = threading.Lock()
+        cls.session = None
+
+    @classmethod
+    def create_session(cls) -> requests.Session:
+        """
+        returns a new HTTP session with a connection pool of `pool_size`
+        connections per host, which retries connection errors and 5xx
+        responses up to `max_retries` times with exponential backoff
+
+        returns:
+            requests.Session: the new session
+        """
+        retry = Retry(
+            total=cls.max_retries,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            backoff_factor=cls.backoff_factor
+        )
+        # pool_connections is the number of hosts whose pools are kept,
+        # which is left at its default as every file is on one host
+        adapter = HTTPAdapter(pool_maxsize=cls.pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    @classmethod
+    def connection_stats(cls) -> dict[str, int]:
+        """
+        returns the number of requests sent and connections opened
+        by the shared session's pools, and how many requests reused
+        an already open connection
+
+        returns:
+            dict[str, int]: the 'requests', 'connections' and 'reused'
+                            counters
+        """
+        stats: dict[str, int] = {'requests': 0, 'connections': 0}
+        if cls.session is not None:
+            for adapter in set(cls.session.adapters.values()):
+                pools = adapter.poolmanager.pools
+                for key in pools.keys():
+                    pool = pools[key]
+                    stats['requests'] += pool.num_requests
+                    stats['connections'] += pool.num_connections
+        stats['reused'] = stats['requests'] - stats['connections']
+        return stats
 
     @classmethod
     def generate_file_names(cls) -> list[str]:
         """
-        returns an exhaustive list of the web traffic data file names
+        returns an exhaustive list of the web traffic data file names,
+        enumerated by the configured SOURCE_LISTING, or only those of
+        the configured shard if the files are being sharded
 
         returns:
             list[str]: the list of web traffic data file names
         """
-        return list(string.ascii_lowercase)
+        if cls.listing == 'alphabet':
+            file_names: list[str] = list(string.ascii_lowercase)
+        elif cls.listing == 'manifest':
+            file_names = cls.read_manifest(cls.manifest_path)
+        elif cls.listing == 'glob':
+            file_names = cls.glob_file_names(cls.source_directory())
+        elif cls.listing == 'index':
+            file_names = cls.fetch_index()
+        else:
+            raise InvalidParams()
+
+        if cls.shard:
+            index, count = cls.parse_shard(cls.shard)
+            return cls.select_shard(file_names, index, count)
+        return file_names
+
+    @classmethod
+    def read_manifest(cls, path: str) -> list[str]:
+        """
+        returns the file names listed one per line in a manifest file,
+        ignoring blank lines, comments and any .csv extensions
+
+        path  str: the path of the manifest file
+
+        returns:
+            list[str]: the file names in the manifest's order
+        """
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                lines: list[str] = file.read().splitlines()
+        except (OSError, UnicodeDecodeError):
+            raise InvalidFilename()
+        return [
+            line.strip().removesuffix('.csv') for line in lines
+            if line.strip() and not line.lstrip().startswith('#')
+        ]
+
+    @classmethod
+    def source_directory(cls) -> str:
+        """
+        returns the local directory to enumerate files from, which is
+        SOURCE_DIRECTORY if set and otherwise the path of a file://
+        root URL
+        """
+        if cls.directory:
+            return cls.directory
+        if cls.root_url.startswith('file://'):
+            return unquote(urlsplit(cls.root_url).path)
+        raise InvalidParams()
+
+    @classmethod
+    def glob_file_names(cls, directory: str) -> list[str]:
+        """
+        returns the names of the CSV files in a local directory which
+        match the configured glob pattern, relative to the directory
+        so that date-partitioned files keep their subdirectories
+
+        directory  str: the directory to enumerate
+
+        returns:
+            list[str]: the sorted file names without the extension
+        """
+        if not os.path.isdir(directory):
+            raise InvalidFilename()
+        paths: list[str] = glob.glob(
+            os.path.join(glob.escape(directory), cls.pattern),
+            recursive=True
+        )
+        return sorted(
+            os.path.relpath(path, directory)
+            .replace(os.sep, '/')
+            .removesuffix('.csv')
+            for path in paths
+            if path.endswith('.csv') and os.path.isfile(path)
+        )
+
+    @classmethod
+    def fetch_index(cls) -> list[str]:
+        """
+        returns the names of the CSV files linked from the index page
+        at the root URL, or listed one per line if the index is plain
+        text, keeping only files under the root URL
+
+        returns:
+            list[str]: the file names in the index's order
+        """
+        index_url: str = f'{cls.root_url}/'
+        try:
+            response: requests.Response = cls.get_session().get(
+                index_url,
+                timeout=cls.timeout
+            )
+        except Exception:
+            raise BadRequest()
+        if not response.ok:
+            raise InvalidFilename()
+
+        links: list[str] = INDEX_LINK_PATTERN.findall(response.text)
+        if not links:
+            links = [line.strip() for line in response.text.splitlines()
+                     if line.strip().endswith('.csv')]
+
+        file_names: dict[str, None] = {}
+        for link in links:
+            url: str = urljoin(index_url, link)
+            if url.startswith(index_url):
+                name: str = unquote(url[len(index_url):])
+                file_names[name.removesuffix('.csv')] = None
+        return list(file_names)
+
+    @classmethod
+    def parse_shard(cls, shard: str) -> tuple[int, int]:
+        """
+        returns the index and count of a shard given as 'i/N', where
+        the index counts from zero
+
+        shard  str: the shard, such as '0/4'
+
+        returns:
+            tuple[int, int]: the shard's index and the shard count
+        """
+        try:
+            index, count = (int(part) for part in shard.split('/'))
+        except (AttributeError, ValueError):
+            raise InvalidParams()
+        if count < 1 or not 0 <= index < count:
+            raise InvalidParams()
+        return index, count
+
+    @classmethod
+    def select_shard(cls, file_names: list[str], index: int, count: int) \
+            -> list[str]:
+        """
+        returns the contiguous block of file names belonging to a shard,
+        so that merging the outputs of every shard in shard order sees
+        the files in the same order as a single unsharded run
+
+        file_names  list[str]: the names of all of the files
+        index  int: the shard's index, counting from zero
+        count  int: the number of shards
+
+        returns:
+            list[str]: the file names of the shard
+        """
+        start: int = len(file_names) * index // count
+        end: int = len(file_names) * (index + 1) // count
+        return file_names[start:end]
+
+    @classmethod
+    def fetch_version(cls, name: str) -> dict[str, str]:
+        """
+        returns the validators which identify the current version
+        of a given CSV file name, without downloading its body
+
+        name  str: the name of the CSV file without the file extension
+
+        returns:
+            dict[str, str]: the file's 'etag' and/or 'last_modified',
+                            or an empty dict if the server sends neither
+        """
+        if not isinstance(name, str) or name == '':
+            raise InvalidParams()
+        if cls.is_local():
+            return cls.stat_version(name)
+
+        try:
+            url: str = f'{cls.root_url}/{name}.csv'
+            response: requests.Response = cls.get_session().head(
+                url,
+                timeout=cls.timeout
+            )
+        except Exception:
+            raise BadRequest()
+
+        if not response.ok:
+            raise InvalidFilename()
+        return cls.parse_version(response.headers)
+
+    @classmethod
+    def parse_version(cls, headers: Mapping[str, str]) -> dict[str, str]:
+        """
+        returns the validators among the given response headers
+        """
+        version: dict[str, str] = {}
+        if headers.get('ETag'):
+            version['etag'] = headers['ETag']
+        if headers.get('Last-Modified'):
+            version['last_modified'] = headers['Last-Modified']
+        return version
+
+    @classmethod
+    def drain_versions(cls) -> dict[str, dict[str, str]]:
+        """
+        returns and clears the version of each file read since they
+        were last drained, so that a worker process can return them;
+        versions are popped in place, so that those recorded by threads
+        still fetching files are kept for the next drain
+        """
+        drained: dict[str, dict[str, str]] = {}
+        for name in list(cls.versions):
+            drained[name] = cls.versions.pop(name)
+        return drained
+
+    @classmethod
+    def absorb_versions(cls, drained: dict[str, dict[str, str]]):
+        """
+        adds the versions of the files read by a worker process
+        """
+        cls.versions.update(drained)
 
     @classmethod
     def fetch_csv_rows(cls, name: str) -> list[list[str]]:
@@ -40,47 +433,604 @@ class ExtractionService:
                              ]
 
         """
+        return list(cls.iter_csv_rows(name))
+
+    @classmethod
+    def iter_csv_rows(cls, name: str) -> Iterator[list[str]]:
+        """
+        returns an iterator over the contents of a given CSV file name,
+        which decodes and parses the response body chunk by chunk as it
+        is consumed, having already validated the headers row
+
+        name  str: the name of the CSV file to fetch
+                   without the file extension
+
+        returns:
+            Iterator[list[str]]: the CSV rows, each containing the
+                                 same headers as `fetch_csv_rows`
+        """
         if not isinstance(name, str) or name == '':
             raise InvalidParams()
+        if cls.is_local():
+            return cls.iter_local_csv_rows(name)
+
+        url: str = f'{cls.root_url}/{name}.csv'
+        response: requests.Response = cls.request(
+            url,
+            cls.cache.validators(url) if cls.cache else {}
+        )
+        cached: Optional[tuple[BinaryIO, dict[str, str]]] = None
+        if response.status_code == 304:
+            response.close()
+            cached = cls.cache.open_body(url)
+            if cached is None:
+                # evicted since it was revalidated
+                response = cls.request(url, {})
 
+        if cached is not None:
+            # a body served from the cache is the version it was
+            # cached as
+            file, cls.versions[name] = cached
+            body: Generator[bytes, None, None] = cls.cache.iter_body(file)
+            try:
+                records: Iterator[list[str]] = cls.parse_records(body)
+            except Exception:
+                file.close()
+                raise
+            return cls.open_records(records, body)
+
+        cls.versions[name] = cls.parse_version(response.headers)
         try:
-            url: str = f'{cls.root_url}/{name}.csv'
-            response: requests.Response = requests.get(url)
+            records = cls.parse_records(cls.iter_body(url, response))
+        except Exception:
+            response.close()
+            raise
+        return cls.open_records(records, response)
+
+    @classmethod
+    def request(cls, url: str, headers: dict[str, str]) \
+            -> requests.Response:
+        """
+        returns the streamed response to a GET request for a URL
+
+        url  str: the URL to request
+        headers  dict[str, str]: the request headers, such as the
+                                 validators of a cached copy
+
+        returns:
+            requests.Response: the successful, or not modified, response
+        """
+        try:
+            response: requests.Response = cls.get_session().get(
+                url,
+                stream=True,
+                timeout=cls.timeout,
+                headers=headers
+            )
         except Exception:
             raise BadRequest()
 
         if not response.ok:
+            response.close()
             raise InvalidFilename()
+        return response
 
+    @classmethod
+    def is_local(cls) -> bool:
+        """
+        returns whether the root URL is a file:// URL, whose files are
+        read straight from the local filesystem instead of over HTTP
+        """
+        return cls.root_url.startswith('file://')
+
+    @classmethod
+    def local_path(cls, name: str) -> str:
+        """
+        returns the local path of a given CSV file name under a
+        file:// root URL
+
+        name  str: the name of the CSV file without the file extension
+
+        returns:
+            str: the path of the file
+        """
+        return os.path.join(
+            unquote(urlsplit(cls.root_url).path),
+            f'{name}.csv'
+        )
+
+    @classmethod
+    def stat_version(cls, name: str) -> dict[str, str]:
+        """
+        returns the modification time and size of a given local CSV
+        file name, which identify its version as `fetch_version`'s
+        validators do for a remote one
+
+        name  str: the name of the CSV file without the file extension
+
+        returns:
+            dict[str, str]: the file's 'last_modified' and 'size'
+        """
         try:
-            response_content: Iterator[bytes] = response.iter_lines()
-            if not response_content:
-                raise BadResponse()
-            lines: list[str] = [line.decode('utf-8')
-                                for line in response_content]
-            if lines[0] != 'drop,length,path,user_agent,user_id':
+            stat: os.stat_result = os.stat(cls.local_path(name))
+        except OSError:
+            raise InvalidFilename()
+        return cls.parse_stat(stat)
+
+    @classmethod
+    def parse_stat(cls, stat: os.stat_result) -> dict[str, str]:
+        return {
+            'last_modified': str(stat.st_mtime_ns),
+            'size': str(stat.st_size)
+        }
+
+    @classmethod
+    def iter_local_csv_rows(cls, name: str) -> Iterator[list[str]]:
+        """
+        returns an iterator over the contents of a given local CSV file
+        name, which is memory-mapped and parsed straight from the mapped
+        pages, having already validated the headers row
+
+        name  str: the name of the CSV file without the file extension
+
+        returns:
+            Iterator[list[str]]: the CSV rows, each containing the
+                                 same headers as `fetch_csv_rows`
+        """
+        try:
+            with open(cls.local_path(name), 'rb') as file:
+                stat: os.stat_result = os.fstat(file.fileno())
+                if stat.st_size == 0:
+                    raise BadResponse()
+                cls.versions[name] = cls.parse_stat(stat)
+                buffer: mmap.mmap = mmap.mmap(
+                    file.fileno(),
+                    0,
+                    access=mmap.ACCESS_READ
+                )
+        except OSError:
+            raise InvalidFilename()
+
+        records: Generator[list[str], None, None] = \
+            cls.iter_mapped_records(buffer)
+        return cls.open_records(records, records)
+
+    @classmethod
+    def iter_mapped_records(cls, buffer: mmap.mmap) \
+            -> Generator[list[str], None, None]:
+        """
+        yields the CSV records of a memory-mapped file, parsing zero-copy
+        views of the mapping `chunk_size` bytes at a time, and unmaps the
+        file once the records are exhausted or abandoned
+
+        buffer  mmap.mmap: the mapped file
+
+        returns:
+            Generator[list[str], None, None]: the records of the file
+        """
+        view: memoryview = memoryview(buffer)
+        chunks: Optional[Iterator[memoryview]] = (
+            view[start:start + cls.chunk_size]
+            for start in range(0, len(view), cls.chunk_size)
+        )
+        records: Optional[Iterator[list[str]]] = None
+        try:
+            records = cls.parse_records(
+                RunMetrics.count_bytes('extract', chunks)
+            )
+            yield from records
+        finally:
+            # dropping the parsers releases every slice of the view,
+            # so the view and then the mapping itself can be released
+            records = None
+            chunks = None
+            view.release()
+            buffer.close()
+
+    @classmethod
+    def parse_records(cls, chunks: Iterable[bytes]) -> Iterator[list[str]]:
+        """
+        returns an iterator over the CSV records of a chunked body,
+        parsed by the configured EXTRACTION_PARSER
+
+        chunks  Iterable[bytes]: the raw body, in chunks of any size
+
+        returns:
+            Iterator[list[str]]: the CSV records, starting with
+                                 the headers row
+        """
+        if cls.parser == 'csv':
+            return csv.reader(cls.iter_decoded_lines(chunks))
+        if cls.parser == 'fast':
+            return cls.iter_fast_records(chunks)
+        raise InvalidParams()
+
+    @classmethod
+    def open_records(
+        cls,
+        records: Iterator[list[str]],
+        source: Union[requests.Response, Generator]
+    ) -> Iterator[list[str]]:
+        """
+        returns an iterator over the given CSV records after validating
+        the headers row, which closes the source of the records once
+        they are exhausted or abandoned
+
+        records  Iterator[list[str]]: the records of a CSV file
+        source  Union[requests.Response, Generator]: the streamed
+                                                     response or mapped
+                                                     file being read
+
+        returns:
+            Iterator[list[str]]: the CSV rows after the headers
+        """
+        try:
+            if next(records, None) != CSV_HEADERS:
                 raise BadResponse()
-            lines = lines[1:]  # remove the expected headers row
-        except (AttributeError, TypeError):
+        except (AttributeError, TypeError, ValueError, csv.Error):
+            source.close()
             raise BadResponse()
+        except BadResponse:
+            source.close()
+            raise
 
-        return list(filter(None, csv.reader(lines)))
+        return cls.iter_records(records, source)
+
+    @classmethod
+    def iter_body(cls, url: str, response: requests.Response) \
+            -> Iterator[bytes]:
+        """
+        returns the body of a response in chunks, written through to
+        the cache as it is downloaded when one is configured
+
+        url  str: the URL the response was fetched from
+        response  requests.Response: the streamed response
+
+        returns:
+            Iterator[bytes]: the raw response body
+        """
+        chunks: Iterator[bytes] = RunMetrics.count_bytes(
+            'extract',
+            response.iter_content(cls.chunk_size)
+        )
+        if cls.cache is None:
+            return chunks
+        return cls.cache.store(url, response.headers, chunks)
+
+    @classmethod
+    def iter_records(
+        cls,
+        records: Iterator[list[str]],
+        response: Union[requests.Response, Generator]
+    ) -> Iterator[list[str]]:
+        """
+        yields the non-empty CSV records of a response body, closing
+        the response once the body is exhausted or abandoned
+
+        records  Iterator[list[str]]: the parsed records of the body
+        response  Union[requests.Response, Generator]: the streamed
+                                                       response or
+                                                       mapped file
+                                                       being read
+
+        returns:
+            Iterator[list[str]]: the non-empty CSV records
+        """
+        try:
+            for record in records:
+                if record:
+                    yield record
+        except (TypeError, ValueError, csv.Error):
+            raise BadResponse()
+        finally:
+            response.close()
+
+    @classmethod
+    def iter_fast_records(cls, chunks: Iterable[bytes]) \
+            -> Iterator[list[str]]:
+        """
+        yields the CSV records of a chunked body, specialized for the
+        `drop,length,path,user_agent,user_id` layout: the whole lines
+        of each chunk are decoded and matched at once, keeping only the
+        length, path and user ID of each row and leaving the drop and
+        user agent fields empty, so that the user agents are never
+        allocated; the headers row is parsed in full, and from the
+        first chunk with a line that is unusual in any way (such as a
+        quoted field other than the user agent, a field spanning
+        several lines, a blank line, the wrong number of fields or a
+        length or user ID which is not a plain integer) the rest of
+        the body is handed to the general CSV reader, so the rows are
+        always those it would read, and a malformed row is quarantined
+        with all of its fields
+
+        chunks  Iterable[bytes]: the raw body, in chunks of any size
+
+        returns:
+            Iterator[list[str]]: the CSV records, starting with
+                                 the headers row
+        """
+        chunks = iter(chunks)
+        remainder: bytes = b''
+        for chunk in chunks:
+            remainder += chunk
+            if b'\n' in remainder:
+                break
+        header: bytes = remainder.partition(b'\n')[0]
+        if b'"' in header:
+            # a quoted header may span lines, so is left to the general
+            # reader along with the rest of the body
+            yield from csv.reader(cls.iter_decoded_lines(
+                itertools.chain([remainder], chunks)
+            ))
+            return
+        yield from csv.reader([header.decode('utf-8')])
+        remainder = remainder[len(header) + 1:]
+
+        find_records: Callable = FAST_RECORD_PATTERN.findall
+        while True:
+            chunk: Optional[bytes] = next(chunks, None)
+            if chunk is None:
+                if not remainder:
+                    return
+                # the last line is matched as though it ended in a feed
+                region: bytes = remainder \
+                    if remainder.endswith(b'\n') else remainder + b'\n'
+                end: int = len(region)
+            else:
+                region = remainder + chunk
+                end = region.rfind(b'\n') + 1
+
+            text: str = region[:end].decode('utf-8')
+            records: list[tuple[str, ...]] = find_records(text)
+            if len(records) != text.count('\n'):
+                rest: bytes = region if chunk is not None else remainder
+                yield from csv.reader(cls.iter_decoded_lines(
+                    itertools.chain([rest], chunks)
+                ))
+                return
+            yield from map(list, records)
+            if chunk is None:
+                return
+            remainder = region[end:]
+
+    @classmethod
+    def iter_decoded_lines(cls, chunks: Iterable[bytes]) -> Iterator[str]:
+        """
+        yields the UTF-8 decoded lines of a chunked body, including
+        their line endings so that quoted fields spanning several
+        lines are still parsed as a single CSV record
+
+        chunks  Iterable[bytes]: the raw body, in chunks of any size
+
+        returns:
+            Iterator[str]: the decoded lines of the body
+        """
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        remainder: str = ''
+        for chunk in chunks:
+            lines: list[str] = (remainder + decoder.decode(chunk)).split('\n')
+            remainder = lines.pop()
+            for line in lines:
+                yield line + '\n'
+        remainder += decoder.decode(b'', final=True)
+        if remainder:
+            yield remainder
 
 
 class LoadingService:
     output_file_path: str = OUTPUT_FILE_PATH
+    compression: str = OUTPUT_COMPRESSION
+    buffer_size: int = OUTPUT_BUFFER_SIZE
 
     @classmethod
-    def load(cls, name: str, rows: list[list[str]]):
+    def load(cls, name: str, rows: Iterable[list[Union[str, int]]]) -> int:
         """
         writes the provided CSV rows to the given CSV file name
-        at /output/{name}.csv
+        at /output/{name}.csv, consuming the rows as they are written
+        through a large buffer and optionally compressing them; the
+        file is written under a temporary name and renamed into place
+        once complete, so readers never see a partially written file
 
         name  str: the name of the CSV to write to without
                    the file extension
-        rows  list[list[str]]: the rows to write, where the
-                               the first item is the headers
+        rows  Iterable[list[Union[str, int]]]: the rows to write, where
+                                               the first item is the
+                                               headers and cells may be
+                                               left as integers
+
+        returns:
+            int: the number of rows written, including the headers
         """
-        with open(f'{cls.output_file_path}/{name}.csv', 'w') as file:
+        if cls.compression not in COMPRESSORS:
+            raise InvalidParams()
+        extension, compressor = COMPRESSORS[cls.compression]
+
+        row_count: int = 0
+        path: str = f'{cls.output_file_path}/{name}.csv{extension}'
+        with cls.open_atomically(path) as raw_file:
+            stream: BinaryIO = raw_file
+            if compressor is not None:
+                stream = io.BufferedWriter(
+                    compressor(raw_file),
+                    cls.buffer_size
+                )
+            file = io.TextIOWrapper(stream, encoding='utf-8', newline='')
             writer = csv.writer(file)
-            writer.writerows(rows)
+            for row in rows:
+                writer.writerow(row)
+                row_count += 1
+            # detaching flushes the text layer without closing the file
+            file.detach()
+            if stream is not raw_file:
+                # closing the compressor writes its trailer but leaves
+                # the temporary file open to be synced
+                stream.close()
+        return row_count
+
+    @classmethod
+    def load_sparse(cls, name: str, pivot: SparsePivot) -> int:
+        """
+        writes the provided pivot to the given file name at
+        /output/{name}.pivot in the binary sparse pivot format,
+        atomically as for `load`
+
+        name  str: the name of the file to write to without
+                   the file extension
+        pivot  SparsePivot: the pivot to write
+
+        returns:
+            int: the number of bytes written
+        """
+        path: str = f'{cls.output_file_path}/{name}.pivot'
+        with cls.open_atomically(path) as file:
+            return SparsePivotWriter.write(file, pivot)
+
+    @classmethod
+    def read_sparse(cls, name: str) -> SparsePivot:
+        """
+        returns the pivot written to the given file name at
+        /output/{name}.pivot by `load_sparse`
+
+        name  str: the name of the file to read without
+                   the file extension
+
+        returns:
+            SparsePivot: a copy of the pivot in the file
+        """
+        path: str = f'{cls.output_file_path}/{name}.pivot'
+        if not os.path.isfile(path):
+            raise InvalidFilename()
+        with SparsePivotReader(path) as reader:
+            return reader.to_pivot()
+
+    @classmethod
+    def load_sketch(cls, name: str, sketch: PathSketch) -> int:
+        """
+        writes the provided sketch to the given file name at
+        /output/{name}.sketch, atomically as for `load`
+
+        name  str: the name of the file to write to without
+                   the file extension
+        sketch  PathSketch: the sketch to write
+
+        returns:
+            int: the number of bytes written
+        """
+        path: str = f'{cls.output_file_path}/{name}.sketch'
+        with cls.open_atomically(path) as file:
+            return file.write(sketch.to_bytes())
+
+    @classmethod
+    def read_sketch(cls, name: str) -> PathSketch:
+        """
+        returns the sketch written to the given file name at
+        /output/{name}.sketch by `load_sketch`
+
+        name  str: the name of the file to read without
+                   the file extension
+
+        returns:
+            PathSketch: the sketch in the file
+        """
+        path: str = f'{cls.output_file_path}/{name}.sketch'
+        if not os.path.isfile(path):
+            raise InvalidFilename()
+        with open(path, 'rb') as file:
+            return PathSketch.from_bytes(file.read())
+
+    @classmethod
+    def load_reports(cls, name: str, reports: list[Report]) -> int:
+        """
+        writes the groups of the provided reports to the given file
+        name at /output/{name}.reports, atomically as for `load`
+
+        name  str: the name of the file to write to without
+                   the file extension
+        reports  list[Report]: the reports to write
+
+        returns:
+            int: the number of bytes written
+        """
+        path: str = f'{cls.output_file_path}/{name}.reports'
+        with cls.open_atomically(path) as file:
+            return file.write(Reports.to_bytes(reports))
+
+    @classmethod
+    def read_reports(cls, name: str) -> list[dict]:
+        """
+        returns the report groups written to the given file name at
+        /output/{name}.reports by `load_reports`
+
+        name  str: the name of the file to read without
+                   the file extension
+
+        returns:
+            list[dict]: the groups of each configured report
+        """
+        path: str = f'{cls.output_file_path}/{name}.reports'
+        if not os.path.isfile(path):
+            raise InvalidFilename()
+        with open(path, 'rb') as file:
+            return Reports.from_bytes(file.read())
+
+    @classmethod
+    def remove_temp_files(cls) -> int:
+        """
+        removes the temporary files left at /output by writes which
+        were killed before they could be renamed into place
+
+        returns:
+            int: the number of files removed
+        """
+        removed: int = 0
+        for file_name in os.listdir(cls.output_file_path):
+            if file_name.startswith('.') and file_name.endswith('.tmp'):
+                os.remove(os.path.join(cls.output_file_path, file_name))
+                removed += 1
+        return removed
+
+    @classmethod
+    def remove(cls, name: str):
+        """
+        removes the given CSV file name at /output/{name}.csv, if any
+
+        name  str: the name of the CSV to remove without
+                   the file extension
+        """
+        if cls.compression not in COMPRESSORS:
+            raise InvalidParams()
+        extension, _ = COMPRESSORS[cls.compression]
+        try:
+            os.remove(f'{cls.output_file_path}/{name}.csv{extension}')
+        except FileNotFoundError:
+            pass
+
+    @classmethod
+    @contextmanager
+    def open_atomically(cls, path: str) -> Iterator[BinaryIO]:
+        """
+        opens a buffered temporary file next to the given path, which
+        is synced and renamed to the path if the block succeeds and
+        removed if it fails
+
+        path  str: the path of the file to write
+
+        returns:
+            Iterator[BinaryIO]: the temporary file
+        """
+        directory, file_name = os.path.split(path)
+        fd, temp_path = tempfile.mkstemp(
+            dir=directory,
+            prefix=f'.{file_name}.',
+            suffix='.tmp'
+        )
+        try:
+            with open(fd, 'wb', buffering=cls.buffer_size) as file:
+                yield file
+                file.flush()
+                os.fsync(file.fileno())
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
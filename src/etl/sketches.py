@@ -0,0 +1,474 @@
+import base64
+import functools
+import hashlib
+import heapq
+import json
+import math
+import sys
+from array import array
+from typing import Iterable, Iterator, Optional, Union
+
+from .config import (
+    TRANSFORM_SKETCH_CAPACITY,
+    TRANSFORM_SKETCH_DELTA,
+    TRANSFORM_SKETCH_EPSILON,
+    TRANSFORM_SKETCH_PRECISION
+)
+from .exceptions import InvalidFormat, InvalidParams
+
+
+SKETCH_FORMAT: str = 'path-sketch/1'
+MASK64: int = (1 << 64) - 1
+
+
+class CountMinSketch:
+    """
+    estimates the total added for each key in a fixed table of
+    `depth` rows of `width` counters, never below the true total and,
+    with a probability of at least 1 - delta, at most epsilon times
+    the total added for all keys above it
+
+    keys are hashed with BLAKE2b rather than `hash`, which is salted
+    per process, so that sketches built anywhere can be merged
+    """
+
+    def __init__(self, width: int, depth: int):
+        if width < 1 or depth < 1:
+            raise InvalidParams()
+        self.width: int = width
+        self.depth: int = depth
+        self.table: array = array('q', bytes(8 * width * depth))
+        self.total: int = 0
+
+    @classmethod
+    def for_error(cls, epsilon: float, delta: float) -> 'CountMinSketch':
+        """
+        returns an empty sketch sized for the given error bounds
+
+        epsilon  float: the greatest overestimate, as a share of the
+                        total added for all keys
+        delta  float: the probability of exceeding it
+        """
+        if not 0 < epsilon < 1 or not 0 < delta < 1:
+            raise InvalidParams()
+        return cls(math.ceil(math.e / epsilon), math.ceil(math.log(1 / delta)))
+
+    @staticmethod
+    @functools.lru_cache(maxsize=65536)
+    def hash_key(key: str) -> tuple[int, int]:
+        digest: bytes = hashlib.blake2b(
+            key.encode('utf-8'),
+            digest_size=16
+        ).digest()
+        return (
+            int.from_bytes(digest[:8], 'little'),
+            int.from_bytes(digest[8:], 'little') | 1
+        )
+
+    def indexes(self, key: str) -> list[int]:
+        """
+        returns the position in the table of the counter of a key in
+        each row, derived from two hashes of the key
+        """
+        first, second = self.hash_key(key)
+        width: int = self.width
+        return [
+            row * width + (first + row * second) % width
+            for row in range(self.depth)
+        ]
+
+    def add(self, key: str, count: int):
+        table: array = self.table
+        for index in self.indexes(key):
+            table[index] += count
+        self.total += count
+
+    def estimate(self, key: str) -> int:
+        table: array = self.table
+        return min(table[index] for index in self.indexes(key))
+
+    def merge(self, other: 'CountMinSketch'):
+        """
+        adds the counters of a sketch of the same size to this one
+        """
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise InvalidParams()
+        table: array = self.table
+        for index, count in enumerate(other.table):
+            if count:
+                table[index] += count
+        self.total += other.total
+
+
+class HyperLogLog:
+    """
+    estimates the number of distinct integers added from the longest
+    run of leading zero bits in their hashes, in one of 2 ** precision
+    byte registers, with a relative standard error of about
+    1.04 / sqrt(2 ** precision)
+    """
+    # 2 ** -rank for every possible register value
+    powers: list[float] = [2.0 ** -rank for rank in range(66)]
+
+    def __init__(self, precision: int, registers: Optional[bytes] = None):
+        if not 4 <= precision <= 16:
+            raise InvalidParams()
+        self.precision: int = precision
+        self.registers: bytearray = bytearray(1 << precision) \
+            if registers is None else bytearray(registers)
+        if len(self.registers) != 1 << precision:
+            raise InvalidFormat()
+
+    @staticmethod
+    def mix(value: int) -> int:
+        """
+        returns the 64 bit splitmix64 hash of an integer
+        """
+        value = (value + 0x9E3779B97F4A7C15) & MASK64
+        value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+        value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK64
+        return value ^ (value >> 31)
+
+    def add(self, value: int):
+        hashed: int = self.mix(value & MASK64)
+        bits: int = 64 - self.precision
+        register: int = hashed >> bits
+        rank: int = bits - (hashed & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[register]:
+            self.registers[register] = rank
+
+    def estimate(self) -> int:
+        registers: bytearray = self.registers
+        size: int = len(registers)
+        if size >= 128:
+            alpha: float = 0.7213 / (1 + 1.079 / size)
+        else:
+            alpha = {16: 0.673, 32: 0.697, 64: 0.709}[size]
+        estimate: float = alpha * size * size / sum(
+            map(self.powers.__getitem__, registers)
+        )
+        zeros: int = registers.count(0)
+        if estimate <= 2.5 * size and zeros:
+            # few distinct values are counted more closely by how
+            # many registers were never set
+            estimate = size * math.log(size / zeros)
+        return round(estimate)
+
+    def merge(self, other: 'HyperLogLog'):
+        """
+        counts the values added to a sketch of the same precision
+        as if they were added to this one
+        """
+        if other.precision != self.precision:
+            raise InvalidParams()
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+
+class PathSketch:
+    """
+    tracks the paths with the greatest total length, and estimates
+    the distinct users of each, in memory bounded by the number of
+    paths tracked rather than by the number of users or rows
+
+    paths are tracked by space-saving: once `capacity` paths are
+    tracked, a new path replaces the one with the least total and
+    inherits that total as its possible overestimate, so every path
+    whose total exceeds 1 / capacity of all lengths added is tracked;
+    a count-min sketch of every path's total tightens the estimate,
+    and each tracked path counts its users in a HyperLogLog, which a
+    replacing path also inherits, so that replacing a path only ever
+    errs toward overestimating the path which replaces it
+
+    sketches of different files or runs are merged by adding their
+    totals and taking the union of their users, and are serialized
+    as JSON so that they can be merged anywhere
+    """
+    capacity: int = TRANSFORM_SKETCH_CAPACITY
+    epsilon: float = TRANSFORM_SKETCH_EPSILON
+    delta: float = TRANSFORM_SKETCH_DELTA
+    precision: int = TRANSFORM_SKETCH_PRECISION
+
+    def __init__(self, capacity: int, totals: CountMinSketch, precision: int):
+        if capacity < 1 or not 4 <= precision <= 16:
+            raise InvalidParams()
+        self.capacity: int = capacity
+        self.totals: CountMinSketch = totals
+        self.precision: int = precision
+        # the total and greatest overestimate of each tracked path
+        self.counts: dict[str, int] = {}
+        self.errors: dict[str, int] = {}
+        self.users: dict[str, HyperLogLog] = {}
+        # a heap of every tracked path by its total, which is only
+        # brought up to date when the least total is looked for
+        self.heap: list[tuple[int, str]] = []
+        # the lengths not yet added to the count-min sketch, summed by
+        # path so that each path is hashed once per flush, not per row
+        self.pending: dict[str, int] = {}
+        self.rows: int = 0
+
+    @classmethod
+    def create(cls) -> 'PathSketch':
+        """
+        returns an empty sketch with the configured capacity, error
+        bounds and precision
+        """
+        return cls(
+            cls.capacity,
+            CountMinSketch.for_error(cls.epsilon, cls.delta),
+            cls.precision
+        )
+
+    def add(self, path: str, user_id: int, length: int):
+        """
+        adds a single page view to the sketch
+        """
+        self.rows += 1
+        pending: dict[str, int] = self.pending
+        if path in pending:
+            pending[path] += length
+        else:
+            pending[path] = length
+            if len(pending) > self.capacity:
+                self.flush()
+        counts: dict[str, int] = self.counts
+        if path in counts:
+            counts[path] += length
+            self.users[path].add(user_id)
+            return
+
+        if len(counts) < self.capacity:
+            counts[path] = length
+            self.errors[path] = 0
+            users = HyperLogLog(self.precision)
+            heapq.heappush(self.heap, (length, path))
+        else:
+            least, evicted = self.pop_least()
+            counts[path] = least + length
+            self.errors[path] = least
+            users = self.users.pop(evicted)
+            heapq.heappush(self.heap, (least + length, path))
+        self.users[path] = users
+        users.add(user_id)
+
+    def flush(self):
+        """
+        adds the pending lengths to the count-min sketch
+        """
+        for path, length in self.pending.items():
+            self.totals.add(path, length)
+        self.pending = {}
+
+    def pop_least(self) -> tuple[int, str]:
+        """
+        stops tracking the path with the least total, returning
+        its total and the path
+        """
+        heap: list[tuple[int, str]] = self.heap
+        counts: dict[str, int] = self.counts
+        while True:
+            count, path = heap[0]
+            # totals only grow, so an entry which is up to date and
+            # least in the heap holds the least total of all
+            if counts[path] == count:
+                break
+            heapq.heapreplace(heap, (counts[path], path))
+        heapq.heappop(heap)
+        del counts[path]
+        del self.errors[path]
+        return count, path
+
+    def add_rows(self, rows: Iterable, path_filter=None):
+        """
+        adds parsed rows to the sketch, leaving out the rows of paths
+        left out by the path filter
+
+        rows  Iterable[TransformationHandler.Row]: the parsed rows
+        path_filter  Optional[PivotSelection.PathFilter]: the paths
+                                                          to keep,
+                                                          if not all
+        """
+        add = self.add
+        for row in rows:
+            if path_filter is not None and not path_filter.selects(row.path):
+                continue
+            add(row.path, row.user_id, row.length)
+
+    def least(self) -> int:
+        """
+        returns the least total of a tracked path once every path is
+        taken, which bounds the total of every untracked path
+        """
+        if len(self.counts) < self.capacity:
+            return 0
+        return min(self.counts.values())
+
+    def merge(self, other: 'PathSketch'):
+        """
+        adds the page views of another sketch of the same size to this
+        one, keeping the paths with the greatest merged totals
+
+        a path tracked by only one sketch may have been replaced in the
+        other, so the least total of the other is added to its total
+        and overestimate
+        """
+        if (other.capacity, other.precision) != \
+                (self.capacity, self.precision):
+            raise InvalidParams()
+        self.flush()
+        other.flush()
+        self.totals.merge(other.totals)
+        least: int = self.least()
+        other_least: int = other.least()
+        merged: list[tuple[int, str, int, HyperLogLog]] = []
+        for path in self.counts.keys() | other.counts.keys():
+            users: Optional[HyperLogLog] = self.users.get(path)
+            other_users: Optional[HyperLogLog] = other.users.get(path)
+            if users is None:
+                users = HyperLogLog(self.precision, other_users.registers)
+            elif other_users is not None:
+                users.merge(other_users)
+            merged.append((
+                self.counts.get(path, least)
+                + other.counts.get(path, other_least),
+                path,
+                self.errors.get(path, least)
+                + other.errors.get(path, other_least),
+                users
+            ))
+        merged = heapq.nsmallest(
+            self.capacity,
+            merged,
+            key=lambda record: (-record[0], record[1])
+        )
+
+        self.counts = {path: count for count, path, _, _ in merged}
+        self.errors = {path: error for _, path, error, _ in merged}
+        self.users = {path: users for _, path, _, users in merged}
+        self.heap = [(count, path) for count, path, _, _ in merged]
+        heapq.heapify(self.heap)
+        self.rows += other.rows
+
+    def stats(self) -> dict[str, int]:
+        """
+        returns the rows added to the sketch, the paths it tracks and
+        the sizes which bound its memory
+        """
+        return {
+            'rows': self.rows,
+            'paths': len(self.counts),
+            'capacity': self.capacity,
+            'width': self.totals.width,
+            'depth': self.totals.depth,
+            'precision': self.precision
+        }
+
+    def iter_estimates(self, top: int = 0) \
+            -> Iterator[tuple[str, int, int, int]]:
+        """
+        yields the estimates of the tracked paths with the greatest
+        estimated totals, breaking ties by path
+
+        top  int: the number of paths, or 0 for every tracked path
+
+        returns:
+            Iterator[tuple[str, int, int, int]]: each path, its
+                                                 estimated total, the
+                                                 greatest amount that
+                                                 may be overestimated
+                                                 and its estimated
+                                                 distinct users
+        """
+        self.flush()
+        estimates: list[tuple[int, str, int]] = []
+        for path, count in self.counts.items():
+            total: int = min(count, self.totals.estimate(path))
+            # the space-saving total less its overestimate is never
+            # above the true total
+            estimates.append((
+                total,
+                path,
+                max(total - (count - self.errors[path]), 0)
+            ))
+        estimates.sort(key=lambda estimate: (-estimate[0], estimate[1]))
+        if top:
+            estimates = estimates[:top]
+        for total, path, error in estimates:
+            yield path, total, error, self.users[path].estimate()
+
+    def iter_rows(self, top: int = 0) -> Iterator[list[Union[str, int]]]:
+        """
+        yields the estimates of `iter_estimates` as CSV rows, after
+        a header row
+        """
+        yield ['path', 'total_length', 'total_length_error',
+               'distinct_users']
+        for estimate in self.iter_estimates(top):
+            yield list(estimate)
+
+    def to_bytes(self) -> bytes:
+        """
+        returns the sketch serialized as JSON
+        """
+        self.flush()
+        return json.dumps({
+            'format': SKETCH_FORMAT,
+            'capacity': self.capacity,
+            'precision': self.precision,
+            'width': self.totals.width,
+            'depth': self.totals.depth,
+            'total': self.totals.total,
+            'table': self.encode(self.totals.table),
+            'rows': self.rows,
+            'paths': [
+                [
+                    path,
+                    count,
+                    self.errors[path],
+                    base64.b64encode(self.users[path].registers).decode()
+                ]
+                for path, count in self.counts.items()
+            ]
+        }).encode('utf-8')
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'PathSketch':
+        """
+        returns the sketch serialized by `to_bytes`
+        """
+        try:
+            document: dict = json.loads(data)
+            if document['format'] != SKETCH_FORMAT:
+                raise InvalidFormat()
+            totals = CountMinSketch(document['width'], document['depth'])
+            totals.table = cls.decode(document['table'])
+            totals.total = document['total']
+            if len(totals.table) != totals.width * totals.depth:
+                raise InvalidFormat()
+            sketch = cls(document['capacity'], totals, document['precision'])
+            sketch.rows = document['rows']
+            for path, count, error, registers in document['paths']:
+                sketch.counts[path] = count
+                sketch.errors[path] = error
+                sketch.users[path] = HyperLogLog(
+                    sketch.precision,
+                    base64.b64decode(registers)
+                )
+                sketch.heap.append((count, path))
+        except (KeyError, TypeError, ValueError, InvalidParams):
+            raise InvalidFormat()
+        heapq.heapify(sketch.heap)
+        return sketch
+
+    @classmethod
+    def encode(cls, table: array) -> str:
+        if sys.byteorder != 'little':
+            table = array('q', table)
+            table.byteswap()
+        return base64.b64encode(table.tobytes()).decode()
+
+    @classmethod
+    def decode(cls, encoded: str) -> array:
+        table = array('q', base64.b64decode(encoded))
+        if sys.byteorder != 'little':
+            table.byteswap()
+        return table
@@ -0,0 +1,260 @@
+import heapq
+import os
+import pickle
+import tempfile
+from operator import itemgetter
+from typing import BinaryIO, Iterable, Iterator, Optional
+
+from .exceptions import InvalidParams
+from .metrics import RunMetrics
+from .pivot import SparsePivot
+
+
+class SpillingAggregator:
+    """
+    sums page view lengths by user and path like
+    `TransformationHandler.sort_rows_by_user_id`, but once the
+    estimated size of the sums held in memory exceeds the memory
+    budget, they are hash-partitioned by user ID and spilled to
+    temporary files, and aggregation carries on with empty sums
+
+    when the pivot is built, each partition is merged on its own and
+    written back sorted by when each user was first seen, then the
+    partitions are merged by that order into the same pivot as an
+    in-memory aggregation; only the paths and one partition's sums
+    are ever held at once, besides the compacted pivot itself
+
+    spill files are pickled, so they are only ever written to and
+    read from a private temporary directory
+    """
+    # the approximate size of a user, and of each path they visited,
+    # in the nested dicts of the sums, as measured on CPython
+    user_bytes: int = 250
+    entry_bytes: int = 50
+    # the number of users pickled together, and so read back at once
+    # from each partition as the partitions are merged
+    block_size: int = 256
+
+    def __init__(self, memory_budget: int, partitions: int, spill_path: str):
+        if memory_budget < 1 or partitions < 1:
+            raise InvalidParams()
+        self.memory_budget: int = memory_budget
+        self.partitions: int = partitions
+        self.spill_path: str = spill_path
+        self.directory: Optional[tempfile.TemporaryDirectory] = None
+        self.sorted_rows: dict[int, dict[str, int]] = {}
+        # the order in which each user in `sorted_rows` was first seen
+        # by this aggregator, which is kept when they are spilled
+        self.first_seen: dict[int, int] = {}
+        self.users_seen: int = 0
+        self.paths: set[str] = set()
+        self.size: int = 0
+        self.spills: int = 0
+
+    def __enter__(self) -> 'SpillingAggregator':
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        """
+        removes the spill files
+        """
+        if self.directory is not None:
+            self.directory.cleanup()
+            self.directory = None
+
+    def add_user(self, user_id: int) -> dict[str, int]:
+        """
+        returns the sums of a user, adding them if the user is new
+        """
+        paths: Optional[dict[str, int]] = self.sorted_rows.get(user_id)
+        if paths is None:
+            if self.size + self.user_bytes > self.memory_budget:
+                self.spill()
+            paths = self.sorted_rows[user_id] = {}
+            self.first_seen[user_id] = self.users_seen
+            self.users_seen += 1
+            self.size += self.user_bytes
+        return paths
+
+    def add_rows(self, rows: Iterable, path_filter=None):
+        """
+        adds the lengths of parsed rows to the sums, leaving out the
+        rows of paths left out by the path filter but keeping their
+        users, as `sort_rows_by_user_id` does
+
+        rows  Iterable[TransformationHandler.Row]: the parsed rows
+        path_filter  Optional[PivotSelection.PathFilter]: the paths
+                                                          to keep,
+                                                          if not all
+        """
+        add_user = self.add_user
+        paths_seen: set[str] = self.paths
+        for row in rows:
+            path: str = row.path
+            paths: dict[str, int] = add_user(row.user_id)
+            if path_filter is not None and not path_filter.selects(path):
+                continue
+            if path in paths:
+                paths[path] += row.length
+                continue
+            paths[path] = row.length
+            paths_seen.add(path)
+            self.size += self.entry_bytes
+            if self.size > self.memory_budget:
+                self.spill()
+
+    def add_partial(self, partial_rows: dict[int, dict[str, int]]):
+        """
+        adds a partial pivot to the sums, with the users new to the
+        aggregator first seen in their order in the partial, as
+        `merge_sorted_rows` does
+
+        partial_rows  dict[int, dict[str, int]]: the partial pivot
+        """
+        for user_id, partial_paths in partial_rows.items():
+            paths: dict[str, int] = self.add_user(user_id)
+            for path, length in partial_paths.items():
+                if path in paths:
+                    paths[path] += length
+                    continue
+                paths[path] = length
+                self.paths.add(path)
+                self.size += self.entry_bytes
+            if self.size > self.memory_budget:
+                self.spill()
+
+    def partition_path(self, partition: int, stage: str) -> str:
+        return os.path.join(self.directory.name, f'{stage}-{partition}')
+
+    def spill(self):
+        """
+        appends the sums held in memory to the spill file of each
+        user's partition, then empties them
+        """
+        if self.directory is None:
+            self.directory = tempfile.TemporaryDirectory(
+                prefix='spill-',
+                dir=self.spill_path or None
+            )
+        partitioned: list[list[tuple[int, int, dict[str, int]]]] = [
+            [] for _ in range(self.partitions)
+        ]
+        first_seen: dict[int, int] = self.first_seen
+        for user_id, paths in self.sorted_rows.items():
+            partitioned[hash(user_id) % self.partitions].append(
+                (first_seen[user_id], user_id, paths)
+            )
+        with RunMetrics.phase('spill') as phase:
+            phase.rows_in += len(self.sorted_rows)
+            for partition, records in enumerate(partitioned):
+                if not records:
+                    continue
+                with open(self.partition_path(partition, 'spill'),
+                          'ab') as file:
+                    start: int = file.tell()
+                    self.dump_blocks(file, records)
+                    phase.bytes += file.tell() - start
+        RunMetrics.increment('spills')
+        self.spills += 1
+        self.sorted_rows = {}
+        self.first_seen = {}
+        self.size = 0
+
+    def dump_blocks(
+        self,
+        file: BinaryIO,
+        records: list[tuple[int, int, dict[str, int]]]
+    ):
+        for start in range(0, len(records), self.block_size):
+            pickle.dump(
+                records[start:start + self.block_size],
+                file,
+                protocol=pickle.HIGHEST_PROTOCOL
+            )
+
+    @classmethod
+    def iter_records(cls, path: str) \
+            -> Iterator[tuple[int, int, dict[str, int]]]:
+        """
+        yields the records pickled to a spill or merged file in blocks
+        """
+        with open(path, 'rb') as file:
+            while True:
+                try:
+                    records: list = pickle.load(file)
+                except EOFError:
+                    return
+                yield from records
+
+    def merge_partition(self, partition: int) -> Optional[str]:
+        """
+        sums every spill of a single partition, writing its users sorted
+        by when they were first seen to a merged file, whose path is
+        returned, or None if nothing was spilled to the partition
+        """
+        spill_path: str = self.partition_path(partition, 'spill')
+        if not os.path.exists(spill_path):
+            return None
+        merged: dict[int, tuple[int, dict[str, int]]] = {}
+        # spills are read in the order they were written, so a user's
+        # first record holds when they were first seen
+        for first_seen, user_id, paths in self.iter_records(spill_path):
+            record: Optional[tuple] = merged.get(user_id)
+            if record is None:
+                merged[user_id] = (first_seen, paths)
+                continue
+            merged_paths: dict[str, int] = record[1]
+            for path, length in paths.items():
+                merged_paths[path] = merged_paths.get(path, 0) + length
+        os.remove(spill_path)
+
+        merged_path: str = self.partition_path(partition, 'merged')
+        with open(merged_path, 'wb') as file:
+            self.dump_blocks(file, sorted(
+                (
+                    (first_seen, user_id, paths)
+                    for user_id, (first_seen, paths) in merged.items()
+                ),
+                key=itemgetter(0)
+            ))
+        return merged_path
+
+    def pivot(self) -> SparsePivot:
+        """
+        returns the sparse pivot of everything added, with the users in
+        the order they were first seen and the paths in sorted order
+
+        returns:
+            SparsePivot: the cumulative length of each path visited
+                         by each user
+        """
+        sorted_paths: list[str] = sorted(self.paths)
+        if not self.spills:
+            return SparsePivot.from_sorted_rows(self.sorted_rows, sorted_paths)
+        if self.sorted_rows:
+            self.spill()
+
+        merged_paths: list[str] = []
+        with RunMetrics.phase('merge_spills'):
+            for partition in range(self.partitions):
+                merged_path: Optional[str] = self.merge_partition(partition)
+                if merged_path is not None:
+                    merged_paths.append(merged_path)
+
+        pivot = SparsePivot(sorted_paths)
+        indexes: dict[str, int] = {
+            path: index for index, path in enumerate(sorted_paths)
+        }
+        with RunMetrics.phase('sparse_pivot') as phase:
+            for _, user_id, paths in heapq.merge(
+                *map(self.iter_records, merged_paths),
+                key=itemgetter(0)
+            ):
+                pivot.append(user_id, sorted(
+                    (indexes[path], length) for path, length in paths.items()
+                ))
+            phase.rows_out += len(pivot)
+        return pivot
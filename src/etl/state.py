@@ -0,0 +1,222 @@
+import json
+import os
+import pickle
+import tempfile
+from typing import Optional
+from urllib.parse import quote
+
+
+class StateStore:
+    """
+    a persisted store of the partial pivot of each source file that has
+    been folded into the output, along with a manifest of the version
+    of each file when it was aggregated: its ETag and/or Last-Modified
+    validators over HTTP, or its modification time and size on disk
+
+    each run also keeps a checkpoint of the files it has aggregated,
+    along with the error policy's counters and rejections for each,
+    until it finishes, so that a run which is killed partway can be
+    resumed without checking or aggregating those files again
+
+    partials are pickled, so the store must only ever be read from a
+    directory this service alone writes to
+    """
+
+    def __init__(self, path: str):
+        self.path: str = path
+        os.makedirs(os.path.join(path, 'partials'), exist_ok=True)
+        self.manifest: dict[str, dict[str, str]] = self.load_manifest()
+        self.checkpoints: set[str] = set()
+        self.checkpoint_errors: dict[str, tuple] = {}
+        self.running: bool = False
+
+    @classmethod
+    def for_shard(cls, path: str, index: int, count: int) -> 'StateStore':
+        """
+        returns the store of shard i of N, kept in its own directory
+        under the given path, so that shards sharing a state path never
+        remove or overwrite each other's partials, manifest or run
+
+        path  str: the state path shared by every shard
+        index  int: the index of the shard, counting from 0
+        count  int: the number of shards
+        """
+        return cls(os.path.join(path, f'shard-{index}-of-{count}'))
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.path, 'manifest.json')
+
+    @property
+    def run_path(self) -> str:
+        return os.path.join(self.path, 'run.json')
+
+    def partial_path(self, name: str) -> str:
+        return os.path.join(
+            self.path,
+            'partials',
+            f'{quote(name, safe="")}.pickle'
+        )
+
+    def load_manifest(self) -> dict[str, dict[str, str]]:
+        """
+        returns the stored manifest, or an empty one if none exists
+        """
+        try:
+            with open(self.manifest_path, 'r') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+
+    def write_atomically(self, path: str, content: bytes):
+        """
+        writes the given content to a temporary file which then replaces
+        the target path, so a killed process never leaves a torn file
+        """
+        fd, temp_path = tempfile.mkstemp(
+            dir=os.path.dirname(path),
+            suffix='.tmp'
+        )
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(content)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def save_manifest(self):
+        self.write_atomically(
+            self.manifest_path,
+            json.dumps(self.manifest, sort_keys=True).encode('utf-8')
+        )
+
+    def start_run(self, resume: bool) -> bool:
+        """
+        starts checkpointing a run, removing any temporary files left
+        behind by a killed run; when resuming, the files checkpointed
+        by an earlier run which never finished are kept in
+        `checkpoints`, and otherwise they are discarded
+
+        resume  bool: whether to resume an unfinished earlier run
+
+        returns:
+            bool: True if an unfinished earlier run is being resumed
+        """
+        for directory in [self.path, os.path.join(self.path, 'partials')]:
+            for file_name in os.listdir(directory):
+                if file_name.endswith('.tmp'):
+                    os.remove(os.path.join(directory, file_name))
+
+        self.checkpoints = set()
+        self.checkpoint_errors = {}
+        if resume:
+            try:
+                with open(self.run_path, 'r') as file:
+                    run: dict = json.load(file)
+                self.checkpoints = set(run['checkpoints'])
+                self.checkpoint_errors = {
+                    name: tuple(errors)
+                    for name, errors in run.get('errors', {}).items()
+                }
+            except FileNotFoundError:
+                pass
+        # only files whose partial is still stored can be skipped
+        self.checkpoints &= set(self.manifest)
+        self.checkpoint_errors = {
+            name: errors for name, errors in self.checkpoint_errors.items()
+            if name in self.checkpoints
+        }
+        self.running = True
+        self.save_run()
+        return bool(self.checkpoints)
+
+    def save_run(self):
+        self.write_atomically(
+            self.run_path,
+            json.dumps({
+                'checkpoints': sorted(self.checkpoints),
+                'errors': self.checkpoint_errors
+            }).encode('utf-8')
+        )
+
+    def finish_run(self):
+        """
+        discards the checkpoints of a run once its output is written
+        """
+        self.checkpoints = set()
+        self.checkpoint_errors = {}
+        self.running = False
+        try:
+            os.remove(self.run_path)
+        except FileNotFoundError:
+            pass
+
+    def is_current(self, name: str, version: dict[str, str]) -> bool:
+        """
+        returns whether the stored partial of a file was aggregated
+        from the given version of it; a file without any validators
+        is never considered current
+
+        name  str: the source file name
+        version  dict[str, str]: the file's current validators
+
+        returns:
+            bool: True if the file need not be aggregated again
+        """
+        return bool(version) and self.manifest.get(name) == version \
+            and os.path.exists(self.partial_path(name))
+
+    def load_partial(self, name: str) -> dict[int, dict[str, int]]:
+        """
+        returns the stored partial pivot of a source file
+        """
+        with open(self.partial_path(name), 'rb') as file:
+            return pickle.load(file)
+
+    def save_partial(
+        self,
+        name: str,
+        partial_rows: dict[int, dict[str, int]],
+        version: dict[str, str],
+        errors: Optional[tuple] = None
+    ):
+        """
+        stores the partial pivot of a source file, then records
+        the version it was aggregated from in the manifest and, while
+        a run is in progress, checkpoints the file
+
+        name  str: the source file name
+        partial_rows  dict[int, dict[str, int]]: the file's partial pivot
+        version  dict[str, str]: the file's validators
+        errors  Optional[tuple]: the error policy's counters and
+                                 rejections for the file, to be carried
+                                 over by a resumed run
+        """
+        self.write_atomically(
+            self.partial_path(name),
+            pickle.dumps(partial_rows, protocol=pickle.HIGHEST_PROTOCOL)
+        )
+        self.manifest[name] = version
+        self.save_manifest()
+        if self.running:
+            self.checkpoints.add(name)
+            if errors is not None:
+                self.checkpoint_errors[name] = errors
+            self.save_run()
+
+    def remove(self, name: str):
+        """
+        drops a source file which no longer exists, or which failed
+        on this run, from the store
+        """
+        self.manifest.pop(name, None)
+        self.save_manifest()
+        if name in self.checkpoints:
+            self.checkpoints.discard(name)
+            self.checkpoint_errors.pop(name, None)
+            self.save_run()
+        try:
+            os.remove(self.partial_path(name))
+        except FileNotFoundError:
+            pass
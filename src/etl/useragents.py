@@ -0,0 +1,163 @@
+import functools
+import re
+from typing import Callable, Optional
+
+from .config import (
+    TRANSFORM_USER_AGENT_CACHE_SIZE,
+    TRANSFORM_USER_AGENT_DIMENSION
+)
+from .exceptions import InvalidParams
+from .services import ExtractionService
+
+
+DIMENSIONS: list[str] = ['', 'device', 'browser', 'device-browser']
+# the first pattern found anywhere in a user agent names its family
+BOT_PATTERN: re.Pattern = re.compile(
+    r'bot\b|crawl|spider|slurp|curl/|wget/|python-|java/|httpclient',
+    re.IGNORECASE
+)
+DEVICE_PATTERNS: list[tuple[str, re.Pattern]] = [
+    ('tablet', re.compile(r'iPad|Tablet|Android(?!.*Mobile)')),
+    ('mobile', re.compile(r'Mobi|iPhone|iPod|Windows Phone')),
+    ('desktop', re.compile(r'Windows NT|Macintosh|X11|CrOS'))
+]
+BROWSER_PATTERNS: list[tuple[str, re.Pattern]] = [
+    ('edge', re.compile(r'Edg(?:e|A|iOS)?/')),
+    ('opera', re.compile(r'OPR/|Opera')),
+    ('samsung', re.compile(r'SamsungBrowser/')),
+    ('chrome', re.compile(r'Chrome/|CriOS/|Chromium/')),
+    ('firefox', re.compile(r'Firefox/|FxiOS/')),
+    ('safari', re.compile(r'Version/.*Safari/')),
+    ('ie', re.compile(r'MSIE |Trident/'))
+]
+
+
+class UserAgentClassifier:
+    """
+    classifies the user agent of each page view into its device
+    and/or browser family, which is added to every path as a second
+    pivot dimension, so that the output has a `{path}#{family}`
+    column for each family a path was visited from
+
+    user agents repeat heavily across page views, so each distinct
+    string is only classified once while it stays in a bounded
+    least recently used cache, whose hits and misses are counted in
+    the run report
+    """
+    dimension: str = TRANSFORM_USER_AGENT_DIMENSION
+    cache_size: int = TRANSFORM_USER_AGENT_CACHE_SIZE
+    classify: Optional[Callable[[str], str]] = None
+    # the cache hits and misses already drained from this process,
+    # and those absorbed from worker processes
+    drained: tuple[int, int] = (0, 0)
+    absorbed: tuple[int, int] = (0, 0)
+
+    @classmethod
+    def reset(cls):
+        """
+        discards the cache and statistics of any previous run
+        """
+        if cls.dimension not in DIMENSIONS or cls.cache_size < 1:
+            raise InvalidParams()
+        # the fast parser never reads the user agent column
+        if cls.dimension and ExtractionService.parser != 'csv':
+            raise InvalidParams()
+        cls.classify = None
+        cls.drained = (0, 0)
+        cls.absorbed = (0, 0)
+        if cls.dimension:
+            cls.classify = functools.lru_cache(maxsize=cls.cache_size)(
+                functools.partial(cls.parse, cls.dimension)
+            )
+
+    @classmethod
+    def enabled(cls) -> bool:
+        if cls.dimension and cls.classify is None:
+            cls.reset()
+        return bool(cls.dimension)
+
+    @classmethod
+    def column(cls, path: str, user_agent: str) -> str:
+        """
+        returns the pivot column of a path visited from a user agent
+        """
+        return f'{path}#{cls.classify(user_agent)}'
+
+    @classmethod
+    def parse(cls, dimension: str, user_agent: str) -> str:
+        """
+        returns the family of a user agent along the given dimension
+
+        dimension  str: 'device', 'browser' or 'device-browser'
+        user_agent  str: the raw user agent string
+
+        returns:
+            str: the family, such as 'mobile', 'chrome' or
+                 'mobile/chrome', 'bot' for crawlers and 'other'
+                 if it could not be told
+        """
+        if not user_agent:
+            return 'unknown'
+        if BOT_PATTERN.search(user_agent) is not None:
+            return 'bot'
+        families: list[str] = []
+        if dimension != 'browser':
+            families.append(cls.match(DEVICE_PATTERNS, user_agent))
+        if dimension != 'device':
+            families.append(cls.match(BROWSER_PATTERNS, user_agent))
+        return '/'.join(families)
+
+    @classmethod
+    def match(cls, patterns: list[tuple[str, re.Pattern]], user_agent: str) \
+            -> str:
+        for family, pattern in patterns:
+            if pattern.search(user_agent) is not None:
+                return family
+        return 'other'
+
+    @classmethod
+    def drain(cls) -> tuple[int, int]:
+        """
+        returns the cache hits and misses since they were last drained,
+        so that those of a worker process can be returned from it
+        """
+        if cls.classify is None:
+            return 0, 0
+        info = cls.classify.cache_info()
+        drained: tuple[int, int] = (
+            info.hits - cls.drained[0],
+            info.misses - cls.drained[1]
+        )
+        cls.drained = (info.hits, info.misses)
+        return drained
+
+    @classmethod
+    def absorb(cls, drained: tuple[int, int]):
+        """
+        adds the cache hits and misses drained from a worker process
+        """
+        cls.absorbed = (
+            cls.absorbed[0] + drained[0],
+            cls.absorbed[1] + drained[1]
+        )
+
+    @classmethod
+    def stats(cls) -> dict[str, float]:
+        """
+        returns the cache statistics of the run, including those
+        absorbed from worker processes
+
+        returns:
+            dict[str, float]: the cache hits, misses and hit rate, and
+                              the size and maximum size of the cache
+        """
+        cls.absorb(cls.drain())
+        hits, misses = cls.absorbed
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / ((hits + misses) or 1), 6),
+            'size': cls.classify.cache_info().currsize
+            if cls.classify is not None else 0,
+            'max_size': cls.cache_size
+        }
@@ -1,14 +1,211 @@
+import argparse
+import logging
+from typing import Optional
+
+from etl.config import LOG_LEVEL, OUTPUT_FILE_PATH, RESUME, STATE_PATH
+from etl.exceptions import InvalidParams
 from etl.handlers import (
     ExtractionHandler,
     TransformationHandler,
     LoadingHandler
 )
+from etl.metrics import RunMetrics
+from etl.pipeline import Pipeline
+from etl.pivot import SparsePivot
+from etl.policy import ErrorPolicy
+from etl.reports import Reports
+from etl.sketches import PathSketch
+from etl.services import ExtractionService, LoadingService
+from etl.state import StateStore
+from etl.useragents import UserAgentClassifier
+
+
+logger = logging.getLogger(__name__)
+
+
+def build_pivot(store: Optional[StateStore]) -> SparsePivot:
+    """
+    returns the pivot of all source files, aggregating only new or
+    changed files when a state store is configured, each file in a
+    worker process when several are configured or when the error
+    policy skips bad rows or files, so that each rejection can be
+    traced to its file, and otherwise streaming all rows into a
+    single aggregation, with extraction run as its own pipeline
+    stage when pipelining is enabled
+
+    store  Optional[StateStore]: the partial pivots of previous runs,
+                                 if a state store is configured
+    """
+    if store is not None:
+        return TransformationHandler.pivot_incremental(
+            ExtractionService.generate_file_names(),
+            store
+        )
+    if TransformationHandler.processes > 1 or \
+            ErrorPolicy.policy != 'fail-fast':
+        return TransformationHandler.pivot_files(
+            ExtractionService.generate_file_names()
+        )
+    with Pipeline.stream('extract', ExtractionHandler.iter_extract()) \
+            as rows:
+        return TransformationHandler.pivot(rows)
+
+
+def merge_shards(count: int) -> SparsePivot:
+    """
+    returns the pivot merged from the partial outputs of every shard,
+    in shard order
+
+    count  int: the number of shards
+    """
+    if count < 1:
+        raise InvalidParams()
+    return TransformationHandler.merge_pivots(
+        LoadingService.read_sparse(f'output.shard-{index}-of-{count}')
+        for index in range(count)
+    )
+
+
+def merge_sketches(count: int) -> PathSketch:
+    """
+    returns the sketch merged from the sketches of every shard,
+    in shard order
+
+    count  int: the number of shards
+    """
+    if count < 1:
+        raise InvalidParams()
+    merged: PathSketch = PathSketch.create()
+    for index in range(count):
+        merged.merge(LoadingService.read_sketch(
+            f'top_paths.shard-{index}-of-{count}'
+        ))
+    return merged
+
+
+def load_approximate(merge: Optional[int], suffix: str) -> PathSketch:
+    """
+    writes the top paths estimated by a sketch of all source files,
+    or of the sketches of every shard when merging, instead of the
+    pivot; shards write their sketch to be merged with --merge N
+
+    merge  Optional[int]: the number of shards to merge, if merging
+    suffix  str: the suffix of a shard's output, if running one
+
+    returns:
+        PathSketch: the sketch the top paths were estimated by
+    """
+    if merge is not None:
+        sketch: PathSketch = merge_sketches(merge)
+        LoadingHandler.load_sketch(sketch)
+        return sketch
+    sketch = TransformationHandler.sketch_files(
+        ExtractionService.generate_file_names()
+    )
+    LoadingHandler.load_quarantine(f'quarantine{suffix}')
+    ErrorPolicy.check()
+    if suffix:
+        LoadingService.load_sketch(f'top_paths{suffix}', sketch)
+    else:
+        LoadingHandler.load_sketch(sketch)
+    return sketch
+
+
+def load_reports(merge: Optional[int], suffix: str):
+    """
+    writes every configured report, summed in the same pass over the
+    rows as the pivot, or merged from the report groups of every shard
+    when merging; shards write their groups to be merged with --merge N
+
+    merge  Optional[int]: the number of shards to merge, if merging
+    suffix  str: the suffix of a shard's output, if running one
+    """
+    if merge is not None:
+        if merge < 1:
+            raise InvalidParams()
+        for index in range(merge):
+            Reports.absorb(LoadingService.read_reports(
+                f'reports.shard-{index}-of-{merge}'
+            ))
+    if suffix:
+        LoadingService.load_reports(f'reports{suffix}', Reports.results())
+    else:
+        LoadingHandler.load_reports(Reports.results())
+
+
+def parse_args(args: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Web Traffic ETL')
+    parser.add_argument(
+        '--shard',
+        default=ExtractionService.shard,
+        help='only process shard i of N, given as i/N counting from 0, '
+             'writing a partial output to merge with --merge N'
+    )
+    parser.add_argument(
+        '--merge',
+        type=int,
+        metavar='N',
+        help='merge the partial outputs of N shards into the output'
+    )
+    return parser.parse_args(args)
+
+
+def main(args: Optional[list[str]] = None):
+    options: argparse.Namespace = parse_args(args)
+    logging.basicConfig(level=LOG_LEVEL)
+    RunMetrics.reset()
+    ErrorPolicy.reset()
+    UserAgentClassifier.reset()
+    Reports.reset()
+    RunMetrics.start_profile()
 
+    suffix: str = ''
+    if options.merge is None and options.shard:
+        index, count = ExtractionService.parse_shard(options.shard)
+        ExtractionService.shard = options.shard
+        suffix = f'.shard-{index}-of-{count}'
 
-def main():
-    rows: list[list[str]] = ExtractionHandler.extract()
-    transformed_rows: list[list[str]] = TransformationHandler.transform(rows)
-    LoadingHandler.load(transformed_rows)
+    store: Optional[StateStore] = None
+    if STATE_PATH and options.merge is None and \
+            not TransformationHandler.approximate:
+        store = StateStore.for_shard(STATE_PATH, index, count) \
+            if suffix else StateStore(STATE_PATH)
+        if store.start_run(RESUME):
+            logger.info('resuming after %d checkpointed files',
+                        len(store.checkpoints))
+            LoadingService.remove_temp_files()
+    with RunMetrics.phase('job'):
+        if TransformationHandler.approximate:
+            RunMetrics.sections['sketch'] = \
+                load_approximate(options.merge, suffix).stats()
+        elif options.merge is not None:
+            LoadingHandler.load_pivot(TransformationHandler.select(
+                merge_shards(options.merge)
+            ))
+        else:
+            pivot: SparsePivot = build_pivot(store)
+            LoadingHandler.load_quarantine(f'quarantine{suffix}')
+            ErrorPolicy.check()
+            if suffix:
+                # shards always write the mergeable sparse format, and
+                # leave the top paths and users to be selected on merge
+                LoadingHandler.load_pivot(pivot, f'output{suffix}', 'sparse')
+            else:
+                LoadingHandler.load_pivot(
+                    TransformationHandler.select(pivot)
+                )
+        if Reports.enabled():
+            load_reports(options.merge, suffix)
+    if store is not None:
+        store.finish_run()
+    profile: dict = RunMetrics.stop_profile(OUTPUT_FILE_PATH)
+    for name, count in ExtractionService.connection_stats().items():
+        RunMetrics.increment(f'http_{name}', count)
+    for name, count in ErrorPolicy.counters.items():
+        RunMetrics.increment(name, count)
+    if UserAgentClassifier.enabled():
+        RunMetrics.sections['user_agent_cache'] = UserAgentClassifier.stats()
+    RunMetrics.write_report(OUTPUT_FILE_PATH, profile, f'run_report{suffix}')
 
 
 if __name__ == '__main__':
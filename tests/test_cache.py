@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+
+from src.etl.cache import ResponseCache
+
+
+class TestResponseCache(unittest.TestCase):
+    test_url: str = 'http://localhost/a.csv'
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+
+    def test_store(self):
+        """
+        Tests that a stored body is passed through unchanged,
+        read back from disk and revalidated with its validators
+        """
+        for compress in [False, True]:
+            cache = ResponseCache(self.temp_dir.name, 1024, compress)
+            chunks: list[bytes] = [b'drop,length', b',path\n', b'0,1,/\n']
+            headers: dict[str, str] = {
+                'ETag': '"abc"',
+                'Last-Modified': 'Wed, 21 Oct 2015 07:28:00 GMT'
+            }
+
+            passed_chunks: list[bytes] = list(
+                cache.store(self.test_url, headers, chunks)
+            )
+
+            self.assertEqual(passed_chunks, chunks)
+            self.assertEqual(
+                b''.join(cache.iter_body(
+                    cache.open_body(self.test_url)[0]
+                )),
+                b''.join(chunks)
+            )
+            self.assertEqual(cache.validators(self.test_url), {
+                'If-None-Match': '"abc"',
+                'If-Modified-Since': 'Wed, 21 Oct 2015 07:28:00 GMT'
+            })
+
+    def test_store_abandoned(self):
+        """
+        Tests that a body which is not fully read is never cached
+        """
+        cache = ResponseCache(self.temp_dir.name, 1024)
+
+        chunks = cache.store(self.test_url, {}, [b'a', b'b'])
+        next(chunks)
+        chunks.close()
+
+        self.assertEqual(cache.validators(self.test_url), {})
+        self.assertEqual(os.listdir(self.temp_dir.name), [])
+
+    def test_evict(self):
+        """
+        Tests that the least recently used bodies are evicted
+        once the cache grows beyond its size limit
+        """
+        cache = ResponseCache(self.temp_dir.name, 25)
+        urls: list[str] = [f'http://localhost/{name}.csv'
+                           for name in ['a', 'b', 'c']]
+
+        for index, url in enumerate(urls):
+            list(cache.store(url, {'ETag': url}, [b'x' * 10]))
+            os.utime(cache.body_path(url), (index, index))
+            if index == 1:
+                # reading the first body makes it the most recently used
+                list(cache.iter_body(cache.open_body(urls[0])[0]))
+
+        self.assertNotEqual(cache.validators(urls[0]), {})
+        self.assertEqual(cache.validators(urls[1]), {})
+        self.assertIsNone(cache.open_body(urls[1]))
+        self.assertNotEqual(cache.validators(urls[2]), {})
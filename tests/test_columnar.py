@@ -0,0 +1,110 @@
+import random
+import unittest
+from unittest.mock import patch
+
+from src.etl.columnar import ColumnarTransformer
+from src.etl.exceptions import InvalidParams
+from src.etl.handlers import TransformationHandler
+from src.etl.policy import ErrorPolicy
+
+
+class TestColumnarTransformer(unittest.TestCase):
+    def generate_rows(self, count: int) -> list[list[str]]:
+        generator = random.Random(count)
+        return [
+            [
+                str(generator.randint(0, 1)),
+                str(generator.randint(0, 100)),
+                f'/{generator.randint(0, 30)}',
+                'Mozilla/5.0, "quoted"',
+                str(generator.randint(1, 50))
+            ]
+            for _ in range(count)
+        ]
+
+    def test_transform(self):
+        """
+        Tests that the columnar engine's output is identical to
+        the row engine's, including across batch boundaries
+        """
+        for count in [0, 1, 2000]:
+            test_rows: list[list[str]] = self.generate_rows(count)
+            expected_flattened_rows: list[list[str]] = \
+                TransformationHandler.transform(test_rows)
+
+            with patch.object(ColumnarTransformer, 'batch_size', 7):
+                actual_flattened_rows: list[list[str]] = list(
+                    ColumnarTransformer.transform(test_rows)
+                )
+
+            self.assertEqual(actual_flattened_rows, expected_flattened_rows)
+
+    def test_transform_with_engine(self):
+        """
+        Tests that the transformation handler dispatches to the
+        configured engine
+        """
+        test_rows: list[list[str]] = [
+            ['0', '1', '/b', '', '2'],
+            ['0', '2', '/a', '', '1'],
+            ['0', '3', '/b', '', '2']
+        ]
+
+        with patch.object(TransformationHandler, 'engine', 'columnar'):
+            actual_flattened_rows: list[list[str]] = \
+                TransformationHandler.transform(test_rows)
+
+        self.assertEqual(actual_flattened_rows, [
+            ['user_id', '/a', '/b'],
+            ['2', '0', '4'],
+            ['1', '2', '0']
+        ])
+
+    def test_transform_with_invalid_params(self):
+        """
+        Tests that invalid rows are rejected as by the row engine
+        """
+        for invalid_row in [['1'], 1, None, ['a', 'a', 'a', 'a', 'a'],
+                            ['', '', '', '', ''], {'a': 'a'}]:
+            with self.assertRaises(InvalidParams):
+                list(ColumnarTransformer.transform([invalid_row]))
+
+    @patch.object(ErrorPolicy, 'policy', 'skip-row')
+    def test_transform_with_skipped_rows(self):
+        """
+        Tests that invalid rows are skipped and quarantined one at a time
+        as by the row engine when the error policy skips rows
+        """
+        test_rows: list = [
+            ['0', '1', '/b', '', '2'],
+            ['0', 'x', '/a', '', '1'],
+            ['0', '3', '/b', '', str(2 ** 63)],
+            ['0', '2', '/a', '', '1']
+        ]
+        ErrorPolicy.reset()
+
+        try:
+            actual_pivot: dict = ColumnarTransformer.pivot(
+                test_rows,
+                'a.csv'
+            ).to_sorted_rows()
+            counters: dict = dict(ErrorPolicy.counters)
+            rejections: list = list(ErrorPolicy.rejections)
+        finally:
+            ErrorPolicy.reset()
+
+        self.assertEqual(actual_pivot, {1: {'/a': 2}, 2: {'/b': 1}})
+        self.assertEqual(counters['rows_seen'], 4)
+        self.assertEqual(counters['rows_rejected'], 2)
+        self.assertEqual(rejections, [
+            ['a.csv', 'InvalidParams', '0', 'x', '/a', '', '1'],
+            ['a.csv', 'InvalidParams', '0', '3', '/b', '', str(2 ** 63)]
+        ])
+
+    def test_transform_with_invalid_engine(self):
+        """
+        Tests that an unknown engine is rejected
+        """
+        with patch.object(TransformationHandler, 'engine', 'unknown'), \
+                self.assertRaises(InvalidParams):
+            TransformationHandler.transform([])
@@ -0,0 +1,78 @@
+import io
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from src.etl.exceptions import InvalidFormat, InvalidParams
+from src.etl.formats import SparsePivotReader, SparsePivotWriter
+from src.etl.handlers import LoadingHandler
+from src.etl.pivot import SparsePivot
+from src.etl.services import LoadingService
+
+
+class TestSparsePivotFormat(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.pivot = SparsePivot(['/', '/hélp', '/test'])
+        self.pivot.append(10, [(0, 10), (2, 5)])
+        self.pivot.append(2, [(0, 1)])
+        self.pivot.append(30, [(1, 12)])
+
+    def test_write_and_read(self):
+        """
+        Tests that a written pivot is read back with its paths,
+        columns and triplets intact
+        """
+        path: str = os.path.join(self.temp_dir.name, 'output.pivot')
+        with open(path, 'wb') as file:
+            written: int = SparsePivotWriter.write(file, self.pivot)
+
+        with SparsePivotReader(path) as reader:
+            self.assertEqual(written, os.path.getsize(path))
+            self.assertEqual(reader.paths, ['/', '/hélp', '/test'])
+            self.assertEqual(len(reader), 3)
+            self.assertEqual(reader.user_ids.tolist(), [10, 2, 30])
+            self.assertEqual(list(reader.iter_triplets()), [
+                (10, 0, 10),
+                (10, 2, 5),
+                (2, 0, 1),
+                (30, 1, 12)
+            ])
+            self.assertEqual(
+                list(reader.to_pivot().iter_rows()),
+                list(self.pivot.iter_rows())
+            )
+
+    def test_read_invalid_file(self):
+        """
+        Tests that empty, foreign and truncated files are rejected
+        """
+        buffer = io.BytesIO()
+        SparsePivotWriter.write(buffer, self.pivot)
+        for content in [b'', b'drop,length,path,user_agent,user_id\n',
+                        buffer.getvalue()[:-8]]:
+            path: str = os.path.join(self.temp_dir.name, 'invalid.pivot')
+            with open(path, 'wb') as file:
+                file.write(content)
+
+            with self.assertRaises(InvalidFormat):
+                SparsePivotReader(path)
+
+    def test_load_pivot(self):
+        """
+        Tests that the loading handler writes the configured format
+        """
+        with patch.object(LoadingService, 'output_file_path',
+                          self.temp_dir.name), \
+                patch.object(LoadingHandler, 'output_format', 'sparse'):
+            LoadingHandler.load_pivot(self.pivot)
+
+        path: str = os.path.join(self.temp_dir.name, 'output.pivot')
+        with SparsePivotReader(path) as reader:
+            self.assertEqual(reader.lengths.tolist(), [10, 5, 1, 12])
+
+        with patch.object(LoadingHandler, 'output_format', 'unknown'), \
+                self.assertRaises(InvalidParams):
+            LoadingHandler.load_pivot(self.pivot)
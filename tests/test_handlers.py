@@ -1,20 +1,29 @@
 import csv
 import os
+import tempfile
 import unittest
+from typing import Iterator
 from unittest.mock import patch, call
 
+from benchmarks.server import LocalCSVServer
+from src.etl.columnar import ColumnarTransformer
 from src.etl.exceptions import InvalidParams
 from src.etl.handlers import (
     ExtractionHandler,
     TransformationHandler,
     LoadingHandler
 )
+from src.etl.metrics import RunMetrics
+from src.etl.policy import ErrorPolicy
+from src.etl.selection import PivotSelection
+from src.etl.services import ExtractionService
+from src.etl.state import StateStore
 
 
 class TestExtractionHandler(unittest.TestCase):
     @patch('src.etl.services.ExtractionService.generate_file_names')
-    @patch('src.etl.services.ExtractionService.fetch_csv_rows')
-    def test_extract(self, fetch_csv_rows_mock, generate_file_names_mock):
+    @patch('src.etl.services.ExtractionService.iter_csv_rows')
+    def test_extract(self, iter_csv_rows_mock, generate_file_names_mock):
         """
         Tests that the extraction handler is successful
         """
@@ -24,20 +33,106 @@ class TestExtractionHandler(unittest.TestCase):
             ['0', '11', '/', 'Mozilla/5.0 (iPhone; CPU iPhone OS 9_3_2 like Mac OS X) AppleWebKit/601.1.46 (KHTML, like Gecko) Version/9.0 Mobile/13F69 Safari/601.1', '220']  # noqa: E501
         ]
         generate_file_names_mock.return_value = mocked_file_names
-        fetch_csv_rows_mock.return_value = mocked_csv_rows
+        iter_csv_rows_mock.return_value = mocked_csv_rows
         # expect a flat list of the mocked data repeated for each mocked file
         expected_csv_rows: list[list[str]] = []
         for _ in range(len(mocked_file_names)):
             expected_csv_rows += mocked_csv_rows
-        expected_fetch_csv_rows_calls = [
+        expected_iter_csv_rows_calls = [
             call(file_name) for file_name in mocked_file_names
         ]
 
         actual_csv_rows: list[list[str]] = ExtractionHandler.extract()
 
         generate_file_names_mock.assert_called_once_with()
-        fetch_csv_rows_mock.assert_has_calls(expected_fetch_csv_rows_calls)
+        iter_csv_rows_mock.assert_has_calls(
+            expected_iter_csv_rows_calls,
+            any_order=True
+        )
+        self.assertEqual(actual_csv_rows, expected_csv_rows)
+
+    @patch('src.etl.services.ExtractionService.generate_file_names')
+    def test_extract_concurrently(self, generate_file_names_mock):
+        """
+        Tests that concurrent extraction against a local server keeps
+        the rows in file order and records a timing for every file
+        """
+        mocked_file_names: list[str] = ['a', 'b', 'c', 'd', 'e']
+        generate_file_names_mock.return_value = mocked_file_names
+        files: dict[str, bytes] = {
+            name: b'drop,length,path,user_agent,user_id\n'
+                  + f'0,{index},/{name},"agent, with comma",{index}\n'
+                  .encode('utf-8')
+            for index, name in enumerate(mocked_file_names)
+        }
+        expected_csv_rows: list[list[str]] = [
+            ['0', str(index), f'/{name}', 'agent, with comma', str(index)]
+            for index, name in enumerate(mocked_file_names)
+        ]
+
+        with LocalCSVServer(files, delay=0.05) as server, \
+                patch.object(ExtractionService, 'root_url', server.root_url):
+            actual_csv_rows: list[list[str]] = \
+                ExtractionHandler.extract(concurrency=3)
+
         self.assertEqual(actual_csv_rows, expected_csv_rows)
+        self.assertEqual(
+            sorted(ExtractionHandler.file_timings),
+            mocked_file_names
+        )
+        for elapsed in ExtractionHandler.file_timings.values():
+            self.assertGreater(elapsed, 0)
+
+    @patch('src.etl.services.ExtractionService.generate_file_names')
+    @patch('src.etl.services.ExtractionService.iter_csv_rows')
+    def test_iter_extract(self, iter_csv_rows_mock,
+                          generate_file_names_mock):
+        """
+        Tests that rows are yielded lazily, fetching each file
+        only once the previous file's rows have been consumed, and
+        that every file is seen by the error policy
+        """
+        generate_file_names_mock.return_value = ['a', 'b']
+        iter_csv_rows_mock.side_effect = [
+            [['0', '1', '/', '', '1']],
+            [['0', '2', '/', '', '2']]
+        ]
+        ErrorPolicy.reset()
+
+        rows = ExtractionHandler.iter_extract(concurrency=1)
+
+        iter_csv_rows_mock.assert_not_called()
+        self.assertEqual(next(rows), ['0', '1', '/', '', '1'])
+        iter_csv_rows_mock.assert_called_once_with('a')
+        self.assertEqual(list(rows), [['0', '2', '/', '', '2']])
+        self.assertEqual(ErrorPolicy.counters['files_seen'], 2)
+
+    @patch('src.etl.services.ExtractionService.generate_file_names')
+    @patch('src.etl.services.ExtractionService.iter_csv_rows')
+    @patch.object(RunMetrics, 'enabled', False)
+    def test_extract_without_metrics(self, iter_csv_rows_mock,
+                                     generate_file_names_mock):
+        """
+        Tests that a timing is still recorded for every file when
+        metrics are disabled
+        """
+        generate_file_names_mock.return_value = ['a', 'b']
+        iter_csv_rows_mock.side_effect = [
+            [['0', '1', '/', '', '1']],
+            [['0', '2', '/', '', '2']]
+        ]
+
+        ExtractionHandler.extract(concurrency=1)
+
+        self.assertEqual(sorted(ExtractionHandler.file_timings), ['a', 'b'])
+
+    def test_extract_with_invalid_concurrency(self):
+        """
+        Tests that extraction cannot run with an invalid concurrency
+        """
+        for concurrency in [0, -1, 1.5, '2']:
+            with self.assertRaises(InvalidParams):
+                ExtractionHandler.extract(concurrency=concurrency)
 
 
 class TestTransformationHandler(unittest.TestCase):
@@ -64,12 +159,34 @@ class TestTransformationHandler(unittest.TestCase):
         self.assertEqual(actual_row.path, expected_row.path)
         self.assertEqual(actual_row.length, expected_row.length)
 
+    def test_create_row_with_slots_and_interned_path(self):
+        """
+        Tests that rows carry no per-instance __dict__, and that rows
+        parsed from separate CSV rows share a single string per path
+        """
+        paths: list[str] = [''.join(['/page/', str(1)]) for _ in range(2)]
+        self.assertIsNot(paths[0], paths[1])
+
+        rows: list[TransformationHandler.Row] = [
+            TransformationHandler.Row.create(['0', '1', path, '', '1'])
+            for path in paths
+        ]
+
+        self.assertEqual(
+            TransformationHandler.Row.__slots__,
+            ('user_id', 'path', 'length')
+        )
+        self.assertFalse(hasattr(rows[0], '__dict__'))
+        self.assertIs(rows[0].path, rows[1].path)
+
     def test_create_row_with_invalid_params(self):
         """
         Tests that an invalid CSV row is handled correctly during creation
         """
         for invalid_row in [['1'], 1, '', None, ['a', 'a', 'a', 'a', 'a'],
-                            ['', '', '', '', ''], {'a': 'a'}]:
+                            ['', '', '', '', ''], {'a': 'a'},
+                            ['0', str(2 ** 63), '/', '', '1'],
+                            ['0', '1', '/', '', str(-2 ** 63 - 1)]]:
             with self.assertRaises(InvalidParams):
                 TransformationHandler.Row.create(invalid_row)
 
@@ -134,50 +251,62 @@ class TestTransformationHandler(unittest.TestCase):
 
         self.assertEqual(actual_flattened_rows, expected_flattened_rows)
 
-    def test_fill_missing_paths(self):
+    def test_iter_transform(self):
         """
-        Tests that the provided sorted rows are filled in with
-        the paths that each user is missing
+        Tests that rows are transformed from a single-use iterator
+        into a stream of pivoted rows
         """
-        expected_sorted_rows: dict[int, dict[str, int]] = {
-            1: {
-                '/': 10,
-                '/help': 0,
-                '/test': 5
-            },
-            2: {
-                '/': 1,
-                '/help': 0,
-                '/test': 0
-            },
-            3: {
-                '/': 0,
-                '/help': 12,
-                '/test': 0
-            }
-        }
+        test_rows: Iterator[list[str]] = iter([
+            ['0', '4', '/b', '', '2'],
+            ['0', '3', '/a', '', '1'],
+            ['0', '1', '/b', '', '2'],
+        ])
 
-        test_rows: dict[int, dict[str, int]] = {
-            1: {
-                '/': 10,
-                '/test': 5
-            },
-            2: {
-                '/': 1
-            },
-            3: {
-                '/help': 12
-            }
-        }
-        test_paths: list[str] = ['/', '/test', '/help']
+        actual_flattened_rows: Iterator[list[str]] = \
+            TransformationHandler.iter_transform(test_rows)
 
-        actual_sorted_rows: dict[int, dict[str, int]] = \
-            TransformationHandler.fill_missing_paths(
-                test_rows,
-                test_paths
+        self.assertEqual(next(actual_flattened_rows), ['user_id', '/a', '/b'])
+        self.assertEqual(
+            list(actual_flattened_rows),
+            [['2', '0', '5'], ['1', '3', '0']]
         )
 
-        self.assertEqual(actual_sorted_rows, expected_sorted_rows)
+    def test_transform_with_selection(self):
+        """
+        Tests that left out paths are never aggregated, and that both
+        engines keep the users of the selected paths in the order
+        they were first seen, whatever paths they were first seen on
+        """
+        test_rows: list[list[str]] = [
+            ['0', '4', '/x', '', '3'],
+            ['0', '3', '/a', '', '1'],
+            ['0', '1', '/b', '', '2'],
+            ['0', '6', '/c', '', '3'],
+            ['0', '2', '/a', '', '2'],
+            ['0', '9', '/x', '', '4']
+        ]
+
+        with patch.object(PivotSelection, 'exclude_paths', '/x'):
+            sorted_rows, sorted_paths = \
+                TransformationHandler.sort_rows_by_user_id(
+                    TransformationHandler.parse_rows(test_rows)
+                )
+            with patch.object(PivotSelection, 'top_paths', 2):
+                for engine in ['row', 'columnar']:
+                    with patch.object(TransformationHandler, 'engine', engine):
+                        self.assertEqual(
+                            TransformationHandler.transform(test_rows),
+                            [
+                                ['user_id', '/a', '/c'],
+                                ['3', '0', '6'],
+                                ['1', '3', '0'],
+                                ['2', '2', '0']
+                            ]
+                        )
+
+        self.assertEqual(sorted_paths, ['/a', '/b', '/c'])
+        self.assertEqual(list(sorted_rows), [3, 1, 2, 4])
+        self.assertEqual(sorted_rows[4], {})
 
     def test_flatten_rows(self):
         """
@@ -218,6 +347,523 @@ class TestTransformationHandler(unittest.TestCase):
 
         self.assertEqual(actual_flattened_rows, expected_flattened_rows)
 
+    @patch('src.etl.services.ExtractionService.generate_file_names')
+    def test_pivot_files(self, generate_file_names_mock):
+        """
+        Tests that pivoting files in worker processes produces
+        the same output as transforming all of their rows at once
+        """
+        mocked_file_names: list[str] = ['a', 'b', 'c']
+        generate_file_names_mock.return_value = mocked_file_names
+        files: dict[str, bytes] = {
+            'a': b'drop,length,path,user_agent,user_id\n'
+                 b'0,1,/b,,2\n0,2,/a,,1\n',
+            'b': b'drop,length,path,user_agent,user_id\n'
+                 b'0,3,/c,,3\n0,4,/b,,2\n',
+            'c': b'drop,length,path,user_agent,user_id\n'
+                 b'0,5,/a,,1\n0,6,/d,,4\n'
+        }
+
+        with LocalCSVServer(files) as server, \
+                patch.object(ExtractionService, 'root_url', server.root_url):
+            expected_flattened_rows: list[list[str]] = \
+                TransformationHandler.transform(ExtractionHandler.extract())
+            pivot = TransformationHandler.pivot_files(
+                mocked_file_names,
+                processes=2
+            )
+
+        self.assertEqual(
+            list(pivot.iter_flattened_rows()),
+            expected_flattened_rows
+        )
+
+    def test_pivot_files_columnar(self):
+        """
+        Tests that files are aggregated with the columnar engine when it
+        is configured, producing the same pivot as the row engine
+        """
+        header: bytes = b'drop,length,path,user_agent,user_id\n'
+        files: dict[str, bytes] = {
+            'a': header + b'0,1,/b,,2\n0,2,/a,,1\n0,3,/x,,5\n',
+            'b': header + b'0,3,/c,,3\n0,4,/b,,2\n'
+        }
+
+        with LocalCSVServer(files) as server, \
+                patch.object(ExtractionService, 'root_url', server.root_url), \
+                patch.object(PivotSelection, 'exclude_paths', '/x'):
+            expected_pivot = TransformationHandler.pivot_files(
+                ['a', 'b'],
+                processes=1
+            )
+            with patch.object(TransformationHandler, 'engine', 'columnar'), \
+                    patch.object(ColumnarTransformer, 'pivot',
+                                 wraps=ColumnarTransformer.pivot) \
+                    as pivot_mock:
+                pivot = TransformationHandler.pivot_files(
+                    ['a', 'b'],
+                    processes=1
+                )
+
+        self.assertEqual(pivot_mock.call_count, 2)
+        self.assertEqual(
+            list(pivot.iter_flattened_rows()),
+            list(expected_pivot.iter_flattened_rows())
+        )
+
+    def test_pivot_incremental(self):
+        """
+        Tests that an incremental run only aggregates the files which
+        are new or changed and still produces the full output
+        """
+        header: bytes = b'drop,length,path,user_agent,user_id\n'
+        files: dict[str, bytes] = {
+            'a': header + b'0,1,/b,,2\n0,2,/a,,1\n',
+            'b': header + b'0,3,/c,,3\n'
+        }
+
+        with tempfile.TemporaryDirectory() as state_path, \
+                LocalCSVServer(files) as server, \
+                patch.object(ExtractionService, 'root_url', server.root_url):
+            TransformationHandler.pivot_incremental(
+                ['a', 'b'],
+                StateStore(state_path),
+                processes=1
+            )
+            files['b'] = header + b'0,4,/c,,3\n0,5,/a,,2\n'
+            files['c'] = header + b'0,6,/d,,4\n'
+            server.requests.clear()
+            pivot = TransformationHandler.pivot_incremental(
+                ['a', 'b', 'c'],
+                StateStore(state_path),
+                processes=1
+            )
+
+        self.assertEqual(
+            [request for request in server.requests
+             if request.startswith('GET')],
+            ['GET /b.csv', 'GET /c.csv']
+        )
+        self.assertEqual(list(pivot.iter_flattened_rows()), [
+            ['user_id', '/a', '/b', '/c', '/d'],
+            ['2', '5', '1', '0', '0'],
+            ['1', '2', '0', '0', '0'],
+            ['3', '0', '0', '4', '0'],
+            ['4', '0', '0', '0', '6']
+        ])
+
+    def test_pivot_incremental_with_change_before_get(self):
+        """
+        Tests that a file which changes between its version being
+        checked and its body being fetched is stored under the version
+        of the body that was aggregated
+        """
+        header: bytes = b'drop,length,path,user_agent,user_id\n'
+        files: dict[str, bytes] = {'a': header + b'0,1,/b,,2\n'}
+        fetch_version = ExtractionService.fetch_version
+
+        def fetch_version_then_change(name: str) -> dict[str, str]:
+            version: dict[str, str] = fetch_version(name)
+            files['a'] = header + b'0,2,/b,,2\n'
+            return version
+
+        with tempfile.TemporaryDirectory() as state_path, \
+                LocalCSVServer(files) as server, \
+                patch.object(ExtractionService, 'root_url', server.root_url):
+            with patch.object(ExtractionService, 'fetch_version',
+                              fetch_version_then_change):
+                TransformationHandler.pivot_incremental(
+                    ['a'],
+                    StateStore(state_path),
+                    processes=1
+                )
+            server.requests.clear()
+            pivot = TransformationHandler.pivot_incremental(
+                ['a'],
+                StateStore(state_path),
+                processes=1
+            )
+
+        self.assertEqual(server.requests, ['HEAD /a.csv'])
+        self.assertEqual(list(pivot.iter_flattened_rows()), [
+            ['user_id', '/b'],
+            ['2', '2']
+        ])
+
+    def test_pivot_incremental_with_shards(self):
+        """
+        Tests that shards sharing a state path keep their own partials,
+        so that neither aggregates again the files of its last run
+        """
+        header: bytes = b'drop,length,path,user_agent,user_id\n'
+        files: dict[str, bytes] = {
+            'a': header + b'0,1,/b,,2\n',
+            'b': header + b'0,3,/c,,3\n'
+        }
+
+        with tempfile.TemporaryDirectory() as state_path, \
+                LocalCSVServer(files) as server, \
+                patch.object(ExtractionService, 'root_url', server.root_url):
+            for _ in range(2):
+                server.requests.clear()
+                for index, name in enumerate(['a', 'b']):
+                    pivot = TransformationHandler.pivot_incremental(
+                        [name],
+                        StateStore.for_shard(state_path, index, 2),
+                        processes=1
+                    )
+            self.assertEqual(sorted(os.listdir(state_path)),
+                             ['shard-0-of-2', 'shard-1-of-2'])
+
+        self.assertNotIn('GET /a.csv', server.requests)
+        self.assertNotIn('GET /b.csv', server.requests)
+        self.assertEqual(list(pivot.iter_flattened_rows()), [
+            ['user_id', '/c'],
+            ['3', '3']
+        ])
+
+    def test_pivot_incremental_with_path_filter(self):
+        """
+        Tests that partials aggregated under other path patterns
+        are aggregated again rather than reused
+        """
+        header: bytes = b'drop,length,path,user_agent,user_id\n'
+        files: dict[str, bytes] = {'a': header + b'0,1,/b,,2\n0,2,/a,,1\n'}
+
+        with tempfile.TemporaryDirectory() as state_path, \
+                LocalCSVServer(files) as server, \
+                patch.object(ExtractionService, 'root_url', server.root_url):
+            TransformationHandler.pivot_incremental(
+                ['a'],
+                StateStore(state_path),
+                processes=1
+            )
+            server.requests.clear()
+            with patch.object(PivotSelection, 'include_paths', '/a'):
+                pivot = TransformationHandler.pivot_incremental(
+                    ['a'],
+                    StateStore(state_path),
+                    processes=1
+                )
+
+        self.assertIn('GET /a.csv', server.requests)
+        self.assertEqual(list(pivot.iter_flattened_rows()), [
+            ['user_id', '/a'],
+            ['2', '0'],
+            ['1', '2']
+        ])
+
+    def test_pivot_files_skipping_rows(self):
+        """
+        Tests that malformed rows are skipped and quarantined when the
+        error policy skips rows, and abort the job when it fails fast
+        """
+        header: bytes = b'drop,length,path,user_agent,user_id\n'
+        files: dict[str, bytes] = {
+            'a': header + b'0,1,/b,,2\n0,x,/a,,1\n',
+            'b': header + b'0,3,/c,,3\n'
+        }
+
+        with LocalCSVServer(files) as server, \
+                patch.object(ExtractionService, 'root_url', server.root_url):
+            ErrorPolicy.reset()
+            with self.assertRaises(InvalidParams):
+                TransformationHandler.pivot_files(['a', 'b'], processes=1)
+            with patch.object(ErrorPolicy, 'policy', 'skip-row'):
+                ErrorPolicy.reset()
+                pivot = TransformationHandler.pivot_files(
+                    ['a', 'b'],
+                    processes=2
+                )
+
+        self.assertEqual(list(pivot.iter_flattened_rows()), [
+            ['user_id', '/b', '/c'],
+            ['2', '1', '0'],
+            ['3', '0', '3']
+        ])
+        self.assertEqual(ErrorPolicy.counters['rows_seen'], 3)
+        self.assertEqual(ErrorPolicy.counters['rows_rejected'], 1)
+        self.assertEqual(
+            ErrorPolicy.rejections,
+            [['a', 'InvalidParams', '0', 'x', '/a', '', '1']]
+        )
+
+    @patch.object(ErrorPolicy, 'policy', 'skip-row')
+    @patch.object(ExtractionHandler, 'concurrency', 3)
+    def test_pivot_files_fetching_concurrently(self):
+        """
+        Tests that files aggregated in this process are fetched up to
+        EXTRACTION_CONCURRENCY at once, while their partials and
+        rejections are still accepted in file order
+        """
+        header: bytes = b'drop,length,path,user_agent,user_id\n'
+        files: dict[str, bytes] = {
+            name: header + f'0,{index},/{name},,{index}\n0,x,/,,1\n'.encode()
+            for index, name in enumerate('abcde', start=1)
+        }
+
+        with LocalCSVServer(files) as server, \
+                patch.object(ExtractionService, 'root_url', server.root_url):
+            ErrorPolicy.reset()
+            pivot = TransformationHandler.pivot_files(
+                list(files),
+                processes=1
+            )
+
+        self.assertEqual(list(pivot.iter_flattened_rows()), [
+            ['user_id', '/a', '/b', '/c', '/d', '/e'],
+            ['1', '1', '0', '0', '0', '0'],
+            ['2', '0', '2', '0', '0', '0'],
+            ['3', '0', '0', '3', '0', '0'],
+            ['4', '0', '0', '0', '4', '0'],
+            ['5', '0', '0', '0', '0', '5']
+        ])
+        self.assertEqual(ErrorPolicy.counters['files_seen'], 5)
+        self.assertEqual(ErrorPolicy.counters['rows_seen'], 10)
+        self.assertEqual(
+            [rejection[0] for rejection in ErrorPolicy.rejections],
+            list(files)
+        )
+
+    @patch.object(ErrorPolicy, 'policy', 'skip-file')
+    def test_pivot_incremental_skipping_files(self):
+        """
+        Tests that missing files and files with malformed rows are
+        skipped whole, and dropped from the state store, when the
+        error policy skips files, and that every file is seen once
+        whether it is reused, aggregated or skipped
+        """
+        header: bytes = b'drop,length,path,user_agent,user_id\n'
+        files: dict[str, bytes] = {
+            'a': header + b'0,1,/b,,2\n',
+            'b': header + b'0,3,/c,,3\n'
+        }
+
+        ErrorPolicy.reset()
+        with tempfile.TemporaryDirectory() as state_path, \
+                LocalCSVServer(files) as server, \
+                patch.object(ExtractionService, 'root_url', server.root_url):
+            TransformationHandler.pivot_incremental(
+                ['a', 'b'],
+                StateStore(state_path),
+                processes=1
+            )
+            files['b'] = header + b'0,4,/c,,3\n0,x,/a,,1\n'
+            ErrorPolicy.reset()
+            pivot = TransformationHandler.pivot_incremental(
+                ['a', 'b', 'c'],
+                StateStore(state_path),
+                processes=1
+            )
+            manifest: dict = StateStore(state_path).manifest
+
+        self.assertEqual(list(pivot.iter_flattened_rows()), [
+            ['user_id', '/b'],
+            ['2', '1']
+        ])
+        self.assertEqual(list(manifest), ['a'])
+        self.assertEqual(ErrorPolicy.counters['files_seen'], 3)
+        self.assertEqual(ErrorPolicy.counters['files_rejected'], 2)
+        self.assertEqual(
+            [rejection[0] for rejection in ErrorPolicy.rejections],
+            ['c', 'b']
+        )
+
+    @patch.object(ErrorPolicy, 'policy', 'skip-file')
+    @patch.object(ExtractionHandler, 'concurrency', 3)
+    def test_pivot_incremental_fetching_concurrently(self):
+        """
+        Tests that versions are checked, and changed files aggregated,
+        up to EXTRACTION_CONCURRENCY at once, while missing files are
+        still rejected and partials stored in file order
+        """
+        header: bytes = b'drop,length,path,user_agent,user_id\n'
+        files: dict[str, bytes] = {
+            name: header + f'0,{index},/{name},,{index}\n'.encode()
+            for index, name in enumerate('abcd', start=1)
+        }
+
+        ErrorPolicy.reset()
+        with tempfile.TemporaryDirectory() as state_path, \
+                LocalCSVServer(files) as server, \
+                patch.object(ExtractionService, 'root_url', server.root_url):
+            TransformationHandler.pivot_incremental(
+                ['a', 'b', 'c'],
+                StateStore(state_path),
+                processes=1
+            )
+            files['b'] = header + b'0,5,/b,,2\n'
+            ErrorPolicy.reset()
+            pivot = TransformationHandler.pivot_incremental(
+                ['a', 'x', 'b', 'c', 'd'],
+                StateStore(state_path),
+                processes=1
+            )
+            manifest: dict = StateStore(state_path).manifest
+            requests: list[str] = server.requests
+
+        self.assertEqual(list(pivot.iter_flattened_rows()), [
+            ['user_id', '/a', '/b', '/c', '/d'],
+            ['1', '1', '0', '0', '0'],
+            ['2', '0', '5', '0', '0'],
+            ['3', '0', '0', '3', '0'],
+            ['4', '0', '0', '0', '4']
+        ])
+        self.assertEqual(list(manifest), ['a', 'b', 'c', 'd'])
+        self.assertEqual(requests.count('GET /b.csv'), 2)
+        self.assertEqual(requests.count('GET /c.csv'), 1)
+        self.assertEqual(ErrorPolicy.counters['files_seen'], 5)
+        self.assertEqual(ErrorPolicy.rejections[0][0], 'x')
+
+    def test_pivot_incremental_resuming(self):
+        """
+        Tests that a resumed run neither checks nor aggregates the
+        files checkpointed by the run it resumes
+        """
+        header: bytes = b'drop,length,path,user_agent,user_id\n'
+        files: dict[str, bytes] = {
+            'a': header + b'0,1,/b,,2\n',
+            'b': header + b'0,3,/c,,3\n'
+        }
+
+        with tempfile.TemporaryDirectory() as state_path, \
+                LocalCSVServer(files) as server, \
+                patch.object(ExtractionService, 'root_url', server.root_url):
+            store = StateStore(state_path)
+            store.start_run(resume=True)
+            with patch.object(
+                TransformationHandler,
+                'aggregate_file',
+                side_effect=[{2: {'/b': 1}}, KeyboardInterrupt()]
+            ):
+                with self.assertRaises(KeyboardInterrupt):
+                    TransformationHandler.pivot_incremental(
+                        ['a', 'b'],
+                        store,
+                        processes=1
+                    )
+            server.requests.clear()
+            store = StateStore(state_path)
+            store.start_run(resume=True)
+            pivot = TransformationHandler.pivot_incremental(
+                ['a', 'b'],
+                store,
+                processes=1
+            )
+
+        self.assertEqual(server.requests, ['HEAD /b.csv', 'GET /b.csv'])
+        self.assertEqual(list(pivot.iter_flattened_rows()), [
+            ['user_id', '/b', '/c'],
+            ['2', '1', '0'],
+            ['3', '0', '3']
+        ])
+
+    @patch.object(ErrorPolicy, 'policy', 'skip-row')
+    def test_pivot_incremental_resuming_with_rejections(self):
+        """
+        Tests that a resumed run carries over the counters and rejected
+        rows of the files checkpointed by the run it resumes
+        """
+        header: bytes = b'drop,length,path,user_agent,user_id\n'
+        files: dict[str, bytes] = {
+            'a': header + b'0,1,/b,,2\n0,x,/a,,1\n',
+            'b': header + b'0,3,/c,,3\n'
+        }
+        aggregate_file = TransformationHandler.aggregate_file
+
+        def aggregate_until_b(file_name: str, rows=None) \
+                -> dict[int, dict[str, int]]:
+            if file_name == 'b':
+                raise KeyboardInterrupt()
+            return aggregate_file(file_name, rows)
+
+        with tempfile.TemporaryDirectory() as state_path, \
+                LocalCSVServer(files) as server, \
+                patch.object(ExtractionService, 'root_url', server.root_url):
+            ErrorPolicy.reset()
+            store = StateStore(state_path)
+            store.start_run(resume=True)
+            with patch.object(TransformationHandler, 'aggregate_file',
+                              aggregate_until_b):
+                with self.assertRaises(KeyboardInterrupt):
+                    TransformationHandler.pivot_incremental(
+                        ['a', 'b'],
+                        store,
+                        processes=1
+                    )
+            ErrorPolicy.reset()
+            store = StateStore(state_path)
+            store.start_run(resume=True)
+            TransformationHandler.pivot_incremental(
+                ['a', 'b'],
+                store,
+                processes=1
+            )
+
+        self.assertEqual(
+            ErrorPolicy.rejections,
+            [['a', 'InvalidParams', '0', 'x', '/a', '', '1']]
+        )
+        self.assertEqual(ErrorPolicy.counters, {
+            'rows_seen': 3,
+            'rows_rejected': 1,
+            'files_seen': 2,
+            'files_rejected': 0
+        })
+
+    def test_merge_sorted_rows(self):
+        """
+        Tests that partial pivots are merged by summing lengths and
+        appending new users in order
+        """
+        test_rows: dict[int, dict[str, int]] = {
+            2: {'/': 1},
+            1: {'/test': 5}
+        }
+        test_partial_rows: dict[int, dict[str, int]] = {
+            3: {'/help': 12},
+            1: {'/': 10, '/test': 2}
+        }
+
+        actual_rows: dict[int, dict[str, int]] = \
+            TransformationHandler.merge_sorted_rows(
+                test_rows,
+                test_partial_rows
+            )
+
+        self.assertEqual(list(actual_rows.items()), [
+            (2, {'/': 1}),
+            (1, {'/test': 7, '/': 10}),
+            (3, {'/help': 12})
+        ])
+
+    def test_flatten_sparse_rows(self):
+        """
+        Tests that the paths missing from a user's dict
+        are flattened as zeros
+        """
+        test_rows: dict[int, dict[str, int]] = {
+            1: {
+                '/test': 5
+            },
+            2: {
+                '/': 1
+            }
+        }
+        test_paths: list[str] = ['/', '/test']
+
+        actual_flattened_rows: list[list[str]] = \
+            TransformationHandler.flatten_rows(
+                test_rows,
+                test_paths
+        )
+
+        self.assertEqual(actual_flattened_rows, [
+            ['user_id', '/', '/test'],
+            ['1', '0', '5'],
+            ['2', '1', '0']
+        ])
+
 
 class TestLoadingHandler(unittest.TestCase):
     def test_load(self):
@@ -0,0 +1,135 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from benchmarks.server import LocalCSVServer
+from src.etl.handlers import ExtractionHandler, TransformationHandler
+from src.etl.metrics import RunMetrics
+from src.etl.services import ExtractionService
+
+
+class TestRunMetrics(unittest.TestCase):
+    def setUp(self):
+        RunMetrics.reset()
+        self.addCleanup(RunMetrics.reset)
+
+    def slow_rows(self, count: int):
+        for index in range(count):
+            time.sleep(0.01)
+            yield index
+
+    def test_nested_phases(self):
+        """
+        Tests that a phase's wall time excludes the phases nested
+        inside it while its total time includes them
+        """
+        with RunMetrics.phase('outer'):
+            items: list[int] = list(
+                RunMetrics.meter('inner', self.slow_rows(3))
+            )
+
+        outer = RunMetrics.phases['outer']
+        inner = RunMetrics.phases['inner']
+        self.assertEqual(items, [0, 1, 2])
+        self.assertEqual(inner.rows_out, 3)
+        self.assertGreaterEqual(inner.wall_seconds, 0.03)
+        self.assertLess(outer.wall_seconds, 0.01)
+        self.assertGreaterEqual(outer.total_seconds, inner.wall_seconds)
+
+    def test_concurrent_meters(self):
+        """
+        Tests that rows metered against the same phase on several
+        threads at once are all counted
+        """
+        def meter_rows():
+            for _ in RunMetrics.meter('extract', range(20000)):
+                pass
+
+        threads: list[threading.Thread] = [
+            threading.Thread(target=meter_rows) for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(RunMetrics.phases['extract'].rows_out, 160000)
+
+    def test_meter_disabled(self):
+        """
+        Tests that iterables are passed through untouched, and that the
+        rows of a file are not timed, when metrics are disabled
+        """
+        rows: list[int] = [1, 2]
+
+        with patch.object(RunMetrics, 'enabled', False), \
+                patch.object(ExtractionService, 'iter_csv_rows',
+                             return_value=iter(rows)):
+            self.assertIs(RunMetrics.meter('inner', rows), rows)
+            self.assertEqual(list(ExtractionHandler.iter_file('a')), rows)
+
+        self.assertNotIn('extract', RunMetrics.phases)
+
+    def test_transform_report(self):
+        """
+        Tests that transforming rows records the rows in and out
+        of each transformation phase
+        """
+        TransformationHandler.transform([
+            ['0', '1', '/', '', '1'],
+            ['0', '2', '/', '', '1'],
+            ['0', '3', '/help', '', '2']
+        ])
+
+        phases: dict = RunMetrics.report()['phases']
+        self.assertEqual(phases['parse']['rows_in'], 3)
+        self.assertEqual(phases['parse']['rows_out'], 3)
+        self.assertEqual(phases['sort_rows_by_user_id']['rows_out'], 2)
+        self.assertEqual(phases['sparse_pivot']['rows_out'], 2)
+
+    def test_worker_metrics(self):
+        """
+        Tests that the phases and counters recorded in worker processes
+        are added to those of the run
+        """
+        header: bytes = b'drop,length,path,user_agent,user_id\n'
+        files: dict[str, bytes] = {
+            'a': header + b'0,1,/b,,2\n0,2,/a,,1\n',
+            'b': header + b'0,3,/c,,3\n'
+        }
+
+        with LocalCSVServer(files) as server, \
+                patch.object(ExtractionService, 'root_url', server.root_url):
+            TransformationHandler.pivot_files(['a', 'b'], processes=2)
+
+        phases: dict = RunMetrics.report()['phases']
+        self.assertEqual(phases['extract']['rows_out'], 3)
+        self.assertEqual(phases['parse']['rows_in'], 3)
+        self.assertGreater(phases['extract']['bytes'], 0)
+        self.assertEqual(RunMetrics.counters['files_extracted'], 2)
+
+    def test_write_report(self):
+        """
+        Tests that the run report is written with a tracemalloc profile
+        """
+        with tempfile.TemporaryDirectory() as output_path, \
+                patch.object(RunMetrics, 'profile_mode', 'tracemalloc'):
+            RunMetrics.start_profile()
+            with RunMetrics.phase('job'):
+                [str(index) for index in range(1000)]
+            profile: dict = RunMetrics.stop_profile(output_path)
+            RunMetrics.write_report(output_path, profile)
+
+            with open(os.path.join(output_path, 'run_report.json')) as file:
+                report: dict = json.load(file)
+
+        self.assertIn('job', report['phases'])
+        self.assertGreater(report['peak_rss_bytes']['self'], 0)
+        self.assertGreater(
+            report['profile']['tracemalloc']['peak_bytes'],
+            0
+        )
@@ -0,0 +1,120 @@
+import threading
+import unittest
+from typing import Iterator
+from unittest.mock import patch
+
+from src.etl.exceptions import BadResponse, InvalidParams
+from src.etl.metrics import RunMetrics
+from src.etl.pipeline import Pipeline
+
+
+class TestPipeline(unittest.TestCase):
+    def setUp(self):
+        RunMetrics.reset()
+        patcher = patch.multiple(
+            Pipeline,
+            enabled=True,
+            queue_size=2,
+            batch_size=3
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_stream(self):
+        """
+        Tests that items are streamed in order from the producing
+        stage's thread, with the queue's metrics recorded
+        """
+        threads: set[str] = set()
+
+        def produce() -> Iterator[int]:
+            for item in range(10):
+                threads.add(threading.current_thread().name)
+                yield item
+
+        with Pipeline.stream('numbers', produce()) as items:
+            self.assertEqual(list(items), list(range(10)))
+
+        self.assertEqual(threads, {'pipeline-numbers'})
+        queue: dict = RunMetrics.report()['queues']['numbers']
+        self.assertEqual(queue['batches'], 4)
+        self.assertEqual(queue['items'], 10)
+        self.assertLessEqual(queue['max_depth'], 2)
+
+    def test_stream_with_backpressure(self):
+        """
+        Tests that a producer is held back once the queue is full
+        """
+        produced: list[int] = []
+
+        def produce() -> Iterator[int]:
+            for item in range(100):
+                produced.append(item)
+                yield item
+
+        with Pipeline.stream('numbers', produce()) as items:
+            self.assertEqual(next(iter(items)), 0)
+            # wait until the producer is blocked on the full queue
+            while RunMetrics.get_queue('numbers').batches < 2:
+                pass
+            # the batch being consumed, the queued batches and
+            # the batch waiting to be queued
+            self.assertLessEqual(len(produced), (2 + 2) * 3)
+
+    def test_stream_with_producer_error(self):
+        """
+        Tests that an error in the producer is raised in the consumer
+        after every item produced before it
+        """
+        def produce() -> Iterator[int]:
+            yield from range(4)
+            raise BadResponse()
+
+        consumed: list[int] = []
+        with self.assertRaises(BadResponse):
+            with Pipeline.stream('numbers', produce()) as items:
+                for item in items:
+                    consumed.append(item)
+
+        self.assertEqual(consumed, [0, 1, 2, 3])
+
+    def test_stream_with_consumer_error(self):
+        """
+        Tests that an error in the consumer cancels the producer,
+        which is closed on its own thread before the error is raised
+        """
+        closed: threading.Event = threading.Event()
+
+        def produce() -> Iterator[int]:
+            try:
+                while True:
+                    yield 0
+            finally:
+                closed.set()
+
+        with self.assertRaises(InvalidParams):
+            with Pipeline.stream('numbers', produce()) as items:
+                next(iter(items))
+                raise InvalidParams()
+
+        self.assertTrue(closed.is_set())
+
+    def test_stream_disabled(self):
+        """
+        Tests that the iterable is consumed directly when
+        pipelining is disabled
+        """
+        items: list[int] = [1, 2]
+        with patch.object(Pipeline, 'enabled', False):
+            with Pipeline.stream('numbers', items) as streamed:
+                self.assertIs(streamed, items)
+
+    def test_stream_with_invalid_params(self):
+        """
+        Tests that a queue or batch size below 1 raises InvalidParams
+        """
+        for name in ['queue_size', 'batch_size']:
+            with patch.object(Pipeline, name, 0):
+                with self.assertRaises(InvalidParams):
+                    with Pipeline.stream('numbers', []):
+                        pass
@@ -0,0 +1,109 @@
+import unittest
+
+from src.etl.exceptions import InvalidParams
+from src.etl.pivot import SparsePivot
+
+
+class TestSparsePivot(unittest.TestCase):
+    def test_from_sorted_rows(self):
+        """
+        Tests that only the visited paths of each user are stored,
+        in path order, and that the source dicts are emptied
+        """
+        test_rows: dict[int, dict[str, int]] = {
+            1: {
+                '/test': 5,
+                '/': 10
+            },
+            2: {
+                '/': 1
+            },
+            3: {
+                '/help': 12
+            }
+        }
+        test_paths: list[str] = ['/', '/help', '/test']
+
+        pivot: SparsePivot = SparsePivot.from_sorted_rows(
+            test_rows,
+            test_paths
+        )
+
+        self.assertEqual(len(pivot), 3)
+        self.assertEqual(list(pivot.user_ids), [1, 2, 3])
+        self.assertEqual(list(pivot.offsets), [0, 2, 3, 4])
+        self.assertEqual(list(pivot.path_indexes), [0, 2, 0, 1])
+        self.assertEqual(list(pivot.lengths), [10, 5, 1, 12])
+        self.assertEqual(test_rows, {1: {}, 2: {}, 3: {}})
+
+    def test_from_sorted_rows_with_overflow(self):
+        """
+        Tests that lengths summed beyond 64 bits raise InvalidParams
+        """
+        with self.assertRaises(InvalidParams):
+            SparsePivot.from_sorted_rows({1: {'/': 2 ** 63}}, ['/'])
+
+    def test_iter_flattened_rows(self):
+        """
+        Tests that zeros are filled in only as rows are flattened
+        """
+        pivot = SparsePivot(['/', '/help', '/test'])
+        pivot.append(1, [(0, 10), (2, 5)])
+        pivot.append(2, [(0, 1)])
+        pivot.append(3, [(1, 12)])
+
+        self.assertEqual(list(pivot.iter_flattened_rows()), [
+            ['user_id', '/', '/help', '/test'],
+            ['1', '10', '0', '5'],
+            ['2', '1', '0', '0'],
+            ['3', '0', '12', '0']
+        ])
+
+    def test_iter_rows(self):
+        """
+        Tests that rows are yielded with integer cells
+        """
+        pivot = SparsePivot(['/', '/help'])
+        pivot.append(7, [(1, 3)])
+
+        self.assertEqual(list(pivot.iter_rows()), [
+            ['user_id', '/', '/help'],
+            [7, 0, 3]
+        ])
+
+    def test_to_sorted_rows(self):
+        """
+        Tests that a pivot expands back into the rows it was built from
+        """
+        sorted_rows: dict[int, dict[str, int]] = {
+            2: {'/b': 1, '/a': 4},
+            1: {'/c': 3}
+        }
+        pivot = SparsePivot.from_sorted_rows(
+            {user_id: dict(paths) for user_id, paths in sorted_rows.items()},
+            ['/a', '/b', '/c']
+        )
+
+        self.assertEqual(pivot.to_sorted_rows(), sorted_rows)
+        self.assertEqual(list(pivot.to_sorted_rows()), [2, 1])
+
+    def test_select(self):
+        """
+        Tests that selecting paths reindexes the kept paths and leaves
+        out users without any of them or below the least total length
+        """
+        pivot = SparsePivot.from_sorted_rows(
+            {1: {'/a': 1, '/c': 5}, 2: {'/b': 9}, 3: {'/a': 2, '/c': 1}},
+            ['/a', '/b', '/c']
+        )
+
+        self.assertEqual(list(pivot.path_totals()), [3, 9, 6])
+        self.assertEqual(list(pivot.select([0, 2]).iter_rows()), [
+            ['user_id', '/a', '/c'],
+            [1, 1, 5],
+            [3, 2, 1]
+        ])
+        self.assertEqual(list(pivot.select([0, 2], 4).iter_rows()), [
+            ['user_id', '/a', '/c'],
+            [1, 1, 5]
+        ])
@@ -0,0 +1,71 @@
+import unittest
+from unittest.mock import patch
+
+from src.etl.exceptions import (
+    BadResponse,
+    ErrorThresholdExceeded,
+    InvalidParams
+)
+from src.etl.policy import ErrorPolicy
+
+
+class TestErrorPolicy(unittest.TestCase):
+    def setUp(self):
+        ErrorPolicy.reset()
+
+    def test_reset_with_invalid_policy(self):
+        """
+        Tests that an unknown error policy raises InvalidParams
+        """
+        with patch.object(ErrorPolicy, 'policy', 'skip-everything'):
+            with self.assertRaises(InvalidParams):
+                ErrorPolicy.reset()
+
+    def test_reject_row(self):
+        """
+        Tests that a rejected row is counted and quarantined
+        with its source file and error
+        """
+        ErrorPolicy.reject_row('a', ['0', 'x', '/', '', '1'], InvalidParams())
+        ErrorPolicy.reject_file('b', BadResponse())
+
+        self.assertEqual(ErrorPolicy.counters['rows_rejected'], 1)
+        self.assertEqual(ErrorPolicy.counters['files_rejected'], 1)
+        self.assertEqual(list(ErrorPolicy.iter_quarantine_rows()), [
+            ['source', 'error', 'drop', 'length', 'path', 'user_agent',
+             'user_id'],
+            ['a', 'InvalidParams', '0', 'x', '/', '', '1'],
+            ['b', 'BadResponse']
+        ])
+
+    def test_drain_and_absorb(self):
+        """
+        Tests that rejections drained from one policy
+        are added to the counts of another
+        """
+        ErrorPolicy.count('rows_seen', 3)
+        ErrorPolicy.reject_row('a', ['x'], InvalidParams())
+        drained = ErrorPolicy.drain()
+
+        self.assertEqual(ErrorPolicy.counters, {})
+        ErrorPolicy.reset()
+        ErrorPolicy.count('rows_seen', 2)
+        ErrorPolicy.absorb(drained)
+
+        self.assertEqual(ErrorPolicy.counters['rows_seen'], 5)
+        self.assertEqual(ErrorPolicy.counters['rows_rejected'], 1)
+        self.assertEqual(ErrorPolicy.rejections, [['a', 'InvalidParams', 'x']])
+
+    def test_check(self):
+        """
+        Tests that the job only fails once the share of rejected
+        rows exceeds the maximum error ratio
+        """
+        ErrorPolicy.count('rows_seen', 10)
+        ErrorPolicy.count('rows_rejected', 1)
+
+        with patch.object(ErrorPolicy, 'max_error_ratio', 0.1):
+            ErrorPolicy.check()
+        with patch.object(ErrorPolicy, 'max_error_ratio', 0.05):
+            with self.assertRaises(ErrorThresholdExceeded):
+                ErrorPolicy.check()
@@ -0,0 +1,160 @@
+import unittest
+from unittest.mock import patch
+
+from benchmarks.server import LocalCSVServer
+from src.etl.exceptions import InvalidFormat, InvalidParams
+from src.etl.handlers import TransformationHandler
+from src.etl.policy import ErrorPolicy
+from src.etl.reports import Report, Reports
+from src.etl.selection import PivotSelection
+from src.etl.services import ExtractionService
+
+
+DEFINITIONS: str = (
+    'path_totals=path:sum,avg; user_visits=user_id:count,sum; '
+    'visits=user_id,path:count; total=:sum,count,avg'
+)
+
+
+class TestReports(unittest.TestCase):
+    def tearDown(self):
+        Reports.reports = None
+
+    def test_parse(self):
+        """
+        Tests that definitions are parsed into their name, keys and
+        aggregates, and that invalid definitions raise InvalidParams
+        """
+        report: Report = Report.parse(' visits = user_id, path : count ')
+        self.assertEqual(
+            (report.name, report.keys, report.aggregates),
+            ('visits', ['user_id', 'path'], ['count'])
+        )
+        for definition in ['visits', 'visits=path', 'visits=agent:sum',
+                           'visits=path:median', 'visits=path,path:sum',
+                           'output=path:sum', 'a b=path:sum']:
+            with self.assertRaises(InvalidParams):
+                Report.parse(definition)
+        with patch.object(Reports, 'definitions', 'a=path:sum;a=:sum'):
+            with self.assertRaises(InvalidParams):
+                Reports.reset()
+
+    def test_transform_with_reports(self):
+        """
+        Tests that every report is summed in the same pass as the
+        pivot, which is left unchanged, leaving out the paths left out
+        by the path patterns
+        """
+        test_rows: list[list[str]] = [
+            ['0', '1', '/b', '', '2'],
+            ['0', '2', '/a', '', '1'],
+            ['0', '4', '/b', '', '2'],
+            ['0', '3', '/a', '', '2'],
+            ['0', '8', '/x', '', '3']
+        ]
+        expected_rows: list[list[str]] = [
+            ['user_id', '/a', '/b'],
+            ['2', '3', '5'],
+            ['1', '2', '0']
+        ]
+
+        with patch.object(Reports, 'definitions', DEFINITIONS), \
+                patch.object(PivotSelection, 'exclude_paths', '/x'):
+            Reports.reset()
+            self.assertEqual(
+                TransformationHandler.transform(test_rows),
+                expected_rows
+            )
+            reports: list[Report] = Reports.results()
+
+        self.assertEqual(
+            {report.name: list(report.iter_rows()) for report in reports},
+            {
+                'path_totals': [
+                    ['path', 'sum_length', 'avg_length'],
+                    ['/a', 5, 2.5],
+                    ['/b', 5, 2.5]
+                ],
+                'user_visits': [
+                    ['user_id', 'count', 'sum_length'],
+                    [1, 1, 2],
+                    [2, 3, 8]
+                ],
+                'visits': [
+                    ['user_id', 'path', 'count'],
+                    [1, '/a', 1],
+                    [2, '/a', 1],
+                    [2, '/b', 2]
+                ],
+                'total': [
+                    ['sum_length', 'count', 'avg_length'],
+                    [10, 4, 2.5]
+                ]
+            }
+        )
+
+    def test_pivot_files_with_reports(self):
+        """
+        Tests that the report groups of each file are returned from
+        worker processes, and that those of a skipped file are dropped
+        """
+        header: bytes = b'drop,length,path,user_agent,user_id\n'
+        files: dict[str, bytes] = {
+            'a': header + b'0,1,/b,,2\n0,2,/a,,1\n',
+            'b': header + b'0,3,/c,,3\n0,x,/b,,2\n',
+            'c': header + b'0,5,/a,,1\n0,6,/d,,4\n'
+        }
+
+        with LocalCSVServer(files) as server, \
+                patch.object(ExtractionService, 'root_url', server.root_url), \
+                patch.object(Reports, 'definitions', 'paths=path:sum'), \
+                patch.object(ErrorPolicy, 'policy', 'skip-file'):
+            ErrorPolicy.reset()
+            Reports.reset()
+            TransformationHandler.pivot_files(['a', 'b', 'c'], processes=2)
+            reports: list[Report] = Reports.results()
+            ErrorPolicy.reset()
+
+        self.assertEqual(list(reports[0].iter_rows()), [
+            ['path', 'sum_length'],
+            ['/a', 7],
+            ['/b', 1],
+            ['/d', 6]
+        ])
+
+    def test_to_bytes(self):
+        """
+        Tests that serialized report groups are read back as drained,
+        and that groups of other definitions raise InvalidFormat
+        """
+        with patch.object(Reports, 'definitions', DEFINITIONS):
+            Reports.reset()
+            TransformationHandler.transform([['0', '1', '/a', '', '2']])
+            data: bytes = Reports.to_bytes(Reports.results())
+            drained: list[dict] = Reports.from_bytes(data)
+
+            self.assertEqual(drained, [
+                {'/a': [1, 1]},
+                {2: [1, 1]},
+                {(2, '/a'): [1, 1]},
+                {(): [1, 1]}
+            ])
+        with patch.object(Reports, 'definitions', 'paths=path:sum'):
+            Reports.reset()
+            for invalid_data in [b'', data, data[:-10]]:
+                with self.assertRaises(InvalidFormat):
+                    Reports.from_bytes(invalid_data)
+
+    def test_columnar_with_reports(self):
+        """
+        Tests that the columnar engine, which never parses rows into
+        Row instances, raises InvalidParams when reports are configured,
+        whether rows are streamed or files are pivoted on their own
+        """
+        with patch.object(Reports, 'definitions', 'paths=path:sum'), \
+                patch.object(TransformationHandler, 'engine', 'columnar'):
+            Reports.reset()
+            with self.assertRaises(InvalidParams):
+                TransformationHandler.transform([['0', '1', '/a', '', '2']])
+            with self.assertRaises(InvalidParams):
+                TransformationHandler.pivot_files(['a'], processes=1)
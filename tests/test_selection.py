@@ -0,0 +1,69 @@
+import unittest
+from unittest.mock import patch
+
+from src.etl.exceptions import InvalidParams
+from src.etl.pivot import SparsePivot
+from src.etl.selection import PivotSelection
+
+
+class TestPivotSelection(unittest.TestCase):
+    def setUp(self):
+        self.pivot = SparsePivot.from_sorted_rows(
+            {
+                1: {'/blog/a': 4, '/help': 1},
+                2: {'/blog/b': 2, '/home': 3},
+                3: {'/help': 5}
+            },
+            ['/blog/a', '/blog/b', '/help', '/home']
+        )
+
+    def test_select_without_selection(self):
+        """
+        Tests that the pivot is returned as is when nothing is selected
+        """
+        self.assertIs(PivotSelection.select(self.pivot), self.pivot)
+
+    def test_select_top_paths(self):
+        """
+        Tests that the paths with the greatest total length are kept
+        in path order, breaking ties by path
+        """
+        with patch.object(PivotSelection, 'top_paths', 2):
+            pivot: SparsePivot = PivotSelection.select(self.pivot)
+
+        self.assertEqual(list(pivot.iter_rows()), [
+            ['user_id', '/blog/a', '/help'],
+            [1, 4, 1],
+            [3, 0, 5]
+        ])
+
+    def test_select_paths_and_users(self):
+        """
+        Tests that patterns match from the start of each path, and that
+        users are kept by their total length across the kept paths
+        """
+        with patch.object(PivotSelection, 'include_paths', '/blog/|/help'), \
+                patch.object(PivotSelection, 'exclude_paths', r'/blog/b'), \
+                patch.object(PivotSelection, 'min_user_length', 5):
+            pivot: SparsePivot = PivotSelection.select(self.pivot)
+
+        self.assertEqual(list(pivot.iter_rows()), [
+            ['user_id', '/blog/a', '/help'],
+            [1, 4, 1],
+            [3, 0, 5]
+        ])
+
+    def test_select_with_invalid_params(self):
+        """
+        Tests that an invalid pattern or a negative count
+        raises InvalidParams
+        """
+        for name, value in [
+            ('include_paths', '('),
+            ('exclude_paths', '['),
+            ('top_paths', -1),
+            ('min_user_length', -1)
+        ]:
+            with patch.object(PivotSelection, name, value):
+                with self.assertRaises(InvalidParams):
+                    PivotSelection.select(self.pivot)
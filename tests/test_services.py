@@ -1,15 +1,21 @@
+import bz2
 import csv
+import gzip
+import lzma
 import os
-from typing import Union
+import tempfile
+from typing import Callable, Iterator, Union
 import unittest
 from unittest.mock import patch
 
+from benchmarks.server import LocalCSVServer
 from src.etl.exceptions import (
     InvalidParams,
     InvalidFilename,
     BadRequest,
     BadResponse
 )
+from src.etl.cache import ResponseCache
 from src.etl.services import ExtractionService, LoadingService
 
 
@@ -31,10 +37,91 @@ class TestExtractionService(unittest.TestCase):
 
         self.assertEqual(actual_file_names, expected_file_names)
 
+    def test_generate_file_names_from_manifest(self):
+        """
+        Tests that a manifest lists file names one per line, skipping
+        blank lines and comments and dropping .csv extensions
+        """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            manifest_path: str = os.path.join(temp_dir, 'manifest.txt')
+            with open(manifest_path, 'w') as file:
+                file.write('# backfill\n2021/01/02.csv\n\n2021/01/01\n')
+            with patch.object(ExtractionService, 'listing', 'manifest'), \
+                    patch.object(
+                        ExtractionService,
+                        'manifest_path',
+                        manifest_path
+                    ):
+                actual_file_names: list[str] = \
+                    ExtractionService.generate_file_names()
+
+        self.assertEqual(actual_file_names, ['2021/01/02', '2021/01/01'])
+
+    def test_generate_file_names_from_glob(self):
+        """
+        Tests that a glob over a file:// root lists the matching CSV
+        files relative to the root, in sorted order
+        """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for name in ['2021/01/02.csv', '2021/01/01.csv', '2021/notes.txt']:
+                path: str = os.path.join(temp_dir, name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'w'):
+                    pass
+            with patch.object(ExtractionService, 'listing', 'glob'), \
+                    patch.object(ExtractionService, 'pattern', '**/*'), \
+                    patch.object(
+                        ExtractionService,
+                        'root_url',
+                        f'file://{temp_dir}'
+                    ):
+                actual_file_names: list[str] = \
+                    ExtractionService.generate_file_names()
+
+        self.assertEqual(actual_file_names, ['2021/01/01', '2021/01/02'])
+
+    def test_generate_file_names_from_index(self):
+        """
+        Tests that an index page lists the CSV files it links to under
+        the root URL, ignoring any other links
+        """
+        files: dict[str, bytes] = {
+            '': b'<a href="b.csv">b</a> <a href=\'/a.csv\'>a</a>'
+                b'<a href="http://example.com/c.csv">c</a>'
+                b'<a href="d.txt">d</a> <a href="b.csv">b</a>'
+        }
+
+        with LocalCSVServer(files) as server, \
+                patch.object(ExtractionService, 'listing', 'index'), \
+                patch.object(ExtractionService, 'root_url', server.root_url):
+            actual_file_names: list[str] = \
+                ExtractionService.generate_file_names()
+
+        self.assertEqual(actual_file_names, ['b', 'a'])
+
+    def test_generate_file_names_for_shard(self):
+        """
+        Tests that the shards partition the file names into contiguous
+        blocks which together hold every file in order
+        """
+        shards: list[list[str]] = []
+        for index in range(3):
+            with patch.object(ExtractionService, 'shard', f'{index}/3'):
+                shards.append(ExtractionService.generate_file_names())
+
+        self.assertEqual(shards[0], list('abcdefgh'))
+        self.assertEqual(sum(shards, []), list('abcdefghijklmnopqrstuvwxyz'))
+        for shard in ['3/3', '-1/3', '0/0', '1', 'a/b']:
+            with self.assertRaises(InvalidParams):
+                ExtractionService.parse_shard(shard)
+
     class MockResponse:
         def __init__(self, ok: bool = True, condition: str = 'success'):
             self.ok: bool = ok
             self.condition: str = condition
+            self.status_code: int = 200 if ok else 404
+            self.headers: dict[str, str] = {}
+            self.closed: bool = False
             self.response_content: list[bytes] = [
                     b'drop,length,path,user_agent,user_id',
                     b'1,7,/,Mozilla/5.0 (X11; Fedora; Linux x86_64; rv:54.0) Gecko/20100101 Firefox/54.0\t,378',  # noqa: E501
@@ -42,14 +129,21 @@ class TestExtractionService(unittest.TestCase):
                     b''
                 ]
 
-        def iter_lines(self) -> Union[list[bytes], str]:
+        def iter_content(self, chunk_size: int) -> Union[list[bytes], str]:
             if self.ok and self.condition == 'success':
-                return self.response_content
+                body: bytes = b'\n'.join(self.response_content)
             elif self.condition == 'missing_headers':
-                return self.response_content[1:]
-            return self.condition
+                body = b'\n'.join(self.response_content[1:])
+            else:
+                return self.condition
+            # split the body into small chunks so that records and
+            # quoted fields straddle the chunk boundaries
+            return [body[i:i + 7] for i in range(0, len(body), 7)]
 
-    @patch('requests.get')
+        def close(self):
+            self.closed = True
+
+    @patch('requests.Session.get')
     def test_fetch_csv_rows(self, requests_get_mock):
         """
         Tests that the given CSV file returns successfully
@@ -68,10 +162,259 @@ class TestExtractionService(unittest.TestCase):
             test_file_name
         )
 
-        requests_get_mock.assert_called_once_with(expected_request_url)
+        requests_get_mock.assert_called_once_with(
+            expected_request_url,
+            stream=True,
+            timeout=ExtractionService.timeout,
+            headers={}
+        )
         self.assertEqual(actual_csv_rows, expected_csv_rows)
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
+    def test_iter_csv_rows(self, requests_get_mock):
+        """
+        Tests that the headers are validated before the first row
+        is consumed and that the response is closed once exhausted
+        """
+        mock_response = self.MockResponse()
+        requests_get_mock.return_value = mock_response
+
+        rows: Iterator[list[str]] = ExtractionService.iter_csv_rows('a')
+
+        self.assertFalse(mock_response.closed)
+        self.assertEqual(next(rows)[4], '378')
+        self.assertEqual(len(list(rows)), 1)
+        self.assertTrue(mock_response.closed)
+
+    def test_iter_decoded_lines(self):
+        """
+        Tests that multi-byte characters and lines split across
+        chunks are reassembled with their line endings
+        """
+        body: bytes = 'a,"b\nc",d\né,f\r\nlast'.encode('utf-8')
+        chunks: list[bytes] = [body[i:i + 1] for i in range(len(body))]
+
+        actual_lines: list[str] = list(
+            ExtractionService.iter_decoded_lines(chunks)
+        )
+
+        self.assertEqual(
+            actual_lines,
+            ['a,"b\n', 'c",d\n', 'é,f\r\n', 'last']
+        )
+        self.assertEqual(
+            list(csv.reader(actual_lines)),
+            [['a', 'b\nc', 'd'], ['é', 'f'], ['last']]
+        )
+
+    def test_iter_fast_records(self):
+        """
+        Tests that the fast parser keeps only the length, path and user
+        ID of each row, and reads the same rows as the general reader
+        when it has to fall back to it
+        """
+        header: bytes = b'drop,length,path,user_agent,user_id\n'
+        body: bytes = header + \
+            b'1,7,/a,"Mozilla/5.0 (X11, ""Linux"")",378\n' \
+            b'0,11,/\xc3\xa9,Safari,220\r\n'
+        unusual_body: bytes = body + \
+            b'0,3,"/b,c",Safari,1\n\n1,5,/d,"Mozilla\n5.0",2'
+
+        for chunk_size in [1, 7, 65536]:
+            with patch.object(ExtractionService, 'parser', 'fast'):
+                actual_records: list[list[str]] = list(
+                    ExtractionService.parse_records([
+                        body[start:start + chunk_size]
+                        for start in range(0, len(body), chunk_size)
+                    ])
+                )
+                unusual_records: list[list[str]] = list(
+                    ExtractionService.parse_records([
+                        unusual_body[start:start + chunk_size]
+                        for start in range(0, len(unusual_body), chunk_size)
+                    ])
+                )
+            expected_records: list[list[str]] = list(
+                ExtractionService.parse_records([unusual_body])
+            )
+
+            self.assertEqual(actual_records, [
+                ['drop', 'length', 'path', 'user_agent', 'user_id'],
+                ['', '7', '/a', '', '378'],
+                ['', '11', '/é', '', '220']
+            ])
+            self.assertEqual(
+                [[record[1], record[2], record[4]]
+                 for record in unusual_records if record],
+                [[record[1], record[2], record[4]]
+                 for record in expected_records if record]
+            )
+
+    def test_iter_fast_records_with_invalid_row(self):
+        """
+        Tests that the fast parser leaves a row with a length or user ID
+        which cannot be parsed to the general reader, so that the row
+        keeps all of its fields to be quarantined
+        """
+        header: bytes = b'drop,length,path,user_agent,user_id\n'
+        for line in [b'c,abc,/x,Safari,5\n', b'c,1,/x,Safari,5a\n',
+                     b'c,1,/x,Safari,' + str(2 ** 63).encode() + b'\n']:
+            with patch.object(ExtractionService, 'parser', 'fast'):
+                actual_records: list[list[str]] = list(
+                    ExtractionService.parse_records([
+                        header + b'0,1,/a,Safari,2\n' + line
+                    ])
+                )
+
+            self.assertEqual(
+                actual_records[2],
+                line.decode('utf-8').rstrip('\n').split(',')
+            )
+
+    def test_iter_fast_records_with_invalid_parser(self):
+        """
+        Tests that an unknown parser raises InvalidParams
+        """
+        with patch.object(ExtractionService, 'parser', 'regex'):
+            with self.assertRaises(InvalidParams):
+                ExtractionService.parse_records([b''])
+
+    def test_fetch_csv_rows_with_retries(self):
+        """
+        Tests that 5xx responses are retried and that the files
+        are fetched over a single kept-alive connection
+        """
+        files: dict[str, bytes] = {
+            name: b'drop,length,path,user_agent,user_id\n0,1,/,,1\n'
+            for name in ['a', 'b', 'c']
+        }
+
+        with LocalCSVServer(files, failures={'a': 2}) as server, \
+                patch.object(ExtractionService, 'root_url', server.root_url), \
+                patch.object(ExtractionService, 'backoff_factor', 0), \
+                patch.object(ExtractionService, 'session', None):
+            for name in files:
+                self.assertEqual(
+                    ExtractionService.fetch_csv_rows(name),
+                    [['0', '1', '/', '', '1']]
+                )
+            stats: dict[str, int] = ExtractionService.connection_stats()
+
+        self.assertEqual(server.requests.count('GET /a.csv'), 3)
+        self.assertEqual(
+            stats,
+            {'requests': 5, 'connections': 1, 'reused': 4}
+        )
+
+    def test_fetch_csv_rows_with_exhausted_retries(self):
+        """
+        Tests that a file which keeps failing with a 5xx response is
+        reported as a bad request once the retries run out
+        """
+        files: dict[str, bytes] = {'a': b''}
+
+        with LocalCSVServer(files, failures={'a': 10}) as server, \
+                patch.object(ExtractionService, 'root_url', server.root_url), \
+                patch.object(ExtractionService, 'backoff_factor', 0), \
+                patch.object(ExtractionService, 'max_retries', 2), \
+                patch.object(ExtractionService, 'session', None):
+            with self.assertRaises(BadRequest):
+                ExtractionService.fetch_csv_rows('a')
+
+        self.assertEqual(server.requests.count('GET /a.csv'), 3)
+
+    def test_fetch_csv_rows_with_cache(self):
+        """
+        Tests that a cached file is revalidated with its ETag and
+        served from disk when the server responds with a 304
+        """
+        files: dict[str, bytes] = {
+            'a': b'drop,length,path,user_agent,user_id\n0,1,/,"a, b",1\n'
+        }
+        expected_csv_rows: list[list[str]] = [['0', '1', '/', 'a, b', '1']]
+
+        with tempfile.TemporaryDirectory() as cache_path, \
+                LocalCSVServer(files) as server, \
+                patch.object(ExtractionService, 'root_url', server.root_url), \
+                patch.object(ExtractionService, 'session', None), \
+                patch.object(ExtractionService, 'cache',
+                             ResponseCache(cache_path, 1024, compress=True)):
+            for _ in range(2):
+                self.assertEqual(
+                    ExtractionService.fetch_csv_rows('a'),
+                    expected_csv_rows
+                )
+
+        self.assertEqual(server.statuses, [200, 304])
+
+    def test_fetch_csv_rows_with_evicted_cache(self):
+        """
+        Tests that a file whose cached copy is evicted after being
+        revalidated is fetched again in full
+        """
+        files: dict[str, bytes] = {
+            'a': b'drop,length,path,user_agent,user_id\n0,1,/,,1\n'
+        }
+
+        with tempfile.TemporaryDirectory() as cache_path, \
+                LocalCSVServer(files) as server, \
+                patch.object(ExtractionService, 'root_url', server.root_url), \
+                patch.object(ExtractionService, 'session', None), \
+                patch.object(ExtractionService, 'cache',
+                             ResponseCache(cache_path, 1024)) as cache:
+            ExtractionService.fetch_csv_rows('a')
+            validators = cache.validators
+
+            def validators_then_evict(url: str) -> dict[str, str]:
+                headers: dict[str, str] = validators(url)
+                os.remove(cache.body_path(url))
+                return headers
+
+            with patch.object(cache, 'validators', validators_then_evict):
+                csv_rows: list[list[str]] = \
+                    ExtractionService.fetch_csv_rows('a')
+
+        self.assertEqual(csv_rows, [['0', '1', '/', '', '1']])
+        self.assertEqual(server.statuses, [200, 304, 200])
+
+    def test_fetch_local_csv_rows(self):
+        """
+        Tests that files under a file:// root are read from the local
+        filesystem, yielding the same rows as when served over HTTP
+        """
+        body: bytes = b'drop,length,path,user_agent,user_id\r\n' \
+            b'0,7,/\xc3\xa9,"Mozilla/5.0 (X11,\n Linux)",378\r\n\r\n' \
+            b'1,11,/,Safari,220\n'
+
+        with tempfile.TemporaryDirectory() as temp_dir, \
+                LocalCSVServer({'a': body}) as server:
+            with open(os.path.join(temp_dir, 'a.csv'), 'wb') as file:
+                file.write(body)
+            with open(os.path.join(temp_dir, 'b.csv'), 'wb') as file:
+                file.write(b'length,path\n7,/\n')
+            with patch.object(ExtractionService, 'root_url', server.root_url):
+                expected_rows: list[list[str]] = \
+                    ExtractionService.fetch_csv_rows('a')
+            with patch.object(
+                ExtractionService,
+                'root_url',
+                f'file://{temp_dir}'
+            ), patch.object(ExtractionService, 'chunk_size', 5):
+                actual_rows: list[list[str]] = \
+                    ExtractionService.fetch_csv_rows('a')
+                version: dict[str, str] = ExtractionService.fetch_version('a')
+                with self.assertRaises(BadResponse):
+                    ExtractionService.fetch_csv_rows('b')
+                with self.assertRaises(InvalidFilename):
+                    ExtractionService.fetch_csv_rows('c')
+                with self.assertRaises(InvalidFilename):
+                    ExtractionService.fetch_version('c')
+
+        self.assertEqual(actual_rows, expected_rows)
+        self.assertEqual(version['size'], str(len(body)))
+        self.assertEqual(server.requests, ['GET /a.csv'])
+
+    @patch('requests.Session.get')
     def test_fetch_csv_rows_invalid_name(self, requests_get_mock):
         """
         Tests that the given CSV file name is invalid
@@ -85,9 +428,14 @@ class TestExtractionService(unittest.TestCase):
         with self.assertRaises(InvalidFilename):
             ExtractionService.fetch_csv_rows(test_file_name)
 
-        requests_get_mock.assert_called_once_with(expected_request_url)
+        requests_get_mock.assert_called_once_with(
+            expected_request_url,
+            stream=True,
+            timeout=ExtractionService.timeout,
+            headers={}
+        )
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_fetch_csv_rows_invalid_param(self, requests_get_mock):
         """
         Tests that CSV rows cannot be fetched using invalid
@@ -99,7 +447,7 @@ class TestExtractionService(unittest.TestCase):
 
             requests_get_mock.assert_not_called()
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_fetch_csv_rows_with_bad_request(self, requests_get_mock):
         """
         Tests that a generic error while fetching the CSV file
@@ -114,9 +462,14 @@ class TestExtractionService(unittest.TestCase):
         with self.assertRaises(BadRequest):
             ExtractionService.fetch_csv_rows(test_file_name)
 
-        requests_get_mock.assert_called_once_with(expected_request_url)
+        requests_get_mock.assert_called_once_with(
+            expected_request_url,
+            stream=True,
+            timeout=ExtractionService.timeout,
+            headers={}
+        )
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_fetch_csv_rows_with_bad_response_content(self, requests_get_mock):
         """
         Tests that an unexpected HTTP response body is handled
@@ -133,7 +486,12 @@ class TestExtractionService(unittest.TestCase):
             with self.assertRaises(BadResponse):
                 ExtractionService.fetch_csv_rows(test_file_name)
 
-            requests_get_mock.assert_called_with(expected_request_url)
+            requests_get_mock.assert_called_with(
+                expected_request_url,
+                stream=True,
+                timeout=ExtractionService.timeout,
+                headers={}
+            )
 
 
 class TestLoadingService(unittest.TestCase):
@@ -155,3 +513,77 @@ class TestLoadingService(unittest.TestCase):
             actual_rows: list[list[str]] = list(csv.reader(file))
             self.assertEqual(actual_rows, test_rows)
             os.remove(file_path)
+
+    def test_load_from_iterator(self):
+        """
+        Tests that a CSV is written from a single-use row iterator
+        """
+        test_name: str = 'test'
+        test_rows: list[list[str]] = [
+            ['a', 'b', 'c'],
+            ['1', '2', '3']
+        ]
+
+        LoadingService.load(test_name, iter(test_rows))
+
+        file_path = f'/usr/src/app/output/{test_name}.csv'
+        with open(file_path, 'r') as file:
+            actual_rows: list[list[str]] = list(csv.reader(file))
+            self.assertEqual(actual_rows, test_rows)
+            os.remove(file_path)
+
+    def test_load_compressed(self):
+        """
+        Tests that integer cells are written and that the output
+        can be compressed with each supported compression
+        """
+        test_rows: list[list[Union[str, int]]] = [
+            ['user_id', '/a,b'],
+            [1, 20]
+        ]
+        openers: dict[str, tuple[str, Callable]] = {
+            'gzip': ('.gz', gzip.open),
+            'bz2': ('.bz2', bz2.open),
+            'xz': ('.xz', lzma.open)
+        }
+
+        with tempfile.TemporaryDirectory() as output_path, \
+                patch.object(LoadingService, 'output_file_path', output_path):
+            for compression, (extension, opener) in openers.items():
+                with patch.object(LoadingService, 'compression', compression):
+                    LoadingService.load('test', iter(test_rows))
+
+                with opener(f'{output_path}/test.csv{extension}', 'rt',
+                            newline='') as file:
+                    self.assertEqual(
+                        list(csv.reader(file)),
+                        [['user_id', '/a,b'], ['1', '20']]
+                    )
+
+    def test_load_is_atomic(self):
+        """
+        Tests that a failed write leaves the previous output in place
+        and no temporary files behind
+        """
+        def failing_rows():
+            yield ['a', 'b']
+            raise RuntimeError()
+
+        with tempfile.TemporaryDirectory() as output_path, \
+                patch.object(LoadingService, 'output_file_path', output_path):
+            LoadingService.load('test', [['a'], ['1']])
+
+            with self.assertRaises(RuntimeError):
+                LoadingService.load('test', failing_rows())
+
+            self.assertEqual(os.listdir(output_path), ['test.csv'])
+            with open(f'{output_path}/test.csv', 'r') as file:
+                self.assertEqual(list(csv.reader(file)), [['a'], ['1']])
+
+    def test_load_with_invalid_compression(self):
+        """
+        Tests that an unknown compression is rejected
+        """
+        with patch.object(LoadingService, 'compression', 'unknown'), \
+                self.assertRaises(InvalidParams):
+            LoadingService.load('test', [])
@@ -0,0 +1,177 @@
+import os
+import random
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from benchmarks.server import LocalCSVServer
+from src.etl.exceptions import InvalidFormat, InvalidParams
+from src.etl.handlers import TransformationHandler
+from src.etl.selection import PivotSelection
+from src.etl.services import ExtractionService, LoadingService
+from src.etl.sketches import CountMinSketch, HyperLogLog, PathSketch
+
+
+class TestSketches(unittest.TestCase):
+    def generate_rows(self, count: int, seed: int = 0) -> list[list[str]]:
+        generator = random.Random(seed)
+        return [
+            [
+                '0',
+                str(generator.randint(1, 100)),
+                # a few paths take most of the page views
+                f'/{int(generator.paretovariate(0.8))}',
+                '',
+                str(generator.randint(0, 5000))
+            ]
+            for _ in range(count)
+        ]
+
+    def exact_totals(self, rows: list[list[str]]) \
+            -> tuple[dict[str, int], dict[str, set[int]]]:
+        totals: dict[str, int] = {}
+        users: dict[str, set[int]] = {}
+        for _, length, path, _, user_id in rows:
+            totals[path] = totals.get(path, 0) + int(length)
+            users.setdefault(path, set()).add(int(user_id))
+        return totals, users
+
+    def test_count_min_sketch(self):
+        """
+        Tests that counts are never underestimated, and that a sketch
+        sized for the error bounds stays within them
+        """
+        sketch = CountMinSketch.for_error(0.01, 0.01)
+        self.assertEqual((sketch.width, sketch.depth), (272, 5))
+        counts: dict[str, int] = {f'/{index}': index for index in range(500)}
+        for key, count in counts.items():
+            sketch.add(key, count)
+
+        for key, count in counts.items():
+            self.assertGreaterEqual(sketch.estimate(key), count)
+            self.assertLessEqual(sketch.estimate(key), count + sketch.total)
+        overestimated: int = sum(
+            sketch.estimate(key) - count > 0.01 * sketch.total
+            for key, count in counts.items()
+        )
+        self.assertLessEqual(overestimated, 0.01 * len(counts) + 1)
+
+    def test_hyperloglog(self):
+        """
+        Tests that distinct values are counted within a few standard
+        errors, and that merging counts the union of two sketches
+        """
+        first, second = HyperLogLog(10), HyperLogLog(10)
+        for value in range(20000):
+            first.add(value)
+            first.add(value)
+            second.add(value + 10000)
+
+        self.assertAlmostEqual(first.estimate(), 20000, delta=2000)
+        first.merge(second)
+        self.assertAlmostEqual(first.estimate(), 30000, delta=3000)
+        self.assertEqual(HyperLogLog(4).estimate(), 0)
+        with self.assertRaises(InvalidParams):
+            first.merge(HyperLogLog(12))
+
+    def test_path_sketch(self):
+        """
+        Tests that the heaviest paths are found with their exact
+        totals, and that every estimate bounds the true total
+        """
+        test_rows: list[list[str]] = self.generate_rows(20000)
+        totals, users = self.exact_totals(test_rows)
+
+        with patch.object(PathSketch, 'capacity', 20):
+            sketch: PathSketch = TransformationHandler.sketch(test_rows)
+
+        self.assertGreater(len(totals), 20)
+        self.assertEqual(len(sketch.counts), 20)
+        estimates = list(sketch.iter_estimates(5))
+        self.assertEqual(
+            [path for path, _, _, _ in estimates],
+            sorted(totals, key=lambda path: (-totals[path], path))[:5]
+        )
+        for path, total, error, distinct_users in sketch.iter_estimates():
+            self.assertLessEqual(total - error, totals[path])
+            self.assertGreaterEqual(total, totals[path])
+        for path, total, error, distinct_users in estimates:
+            self.assertEqual((total, error), (totals[path], 0))
+            self.assertAlmostEqual(
+                distinct_users,
+                len(users[path]),
+                delta=0.15 * len(users[path])
+            )
+
+    def test_merge(self):
+        """
+        Tests that sketches of parts of the rows, serialized and merged,
+        estimate the same top paths as a sketch of all of them
+        """
+        test_rows: list[list[str]] = self.generate_rows(12000, seed=1)
+        totals, _ = self.exact_totals(test_rows)
+
+        with patch.object(PathSketch, 'capacity', 30):
+            merged: PathSketch = PathSketch.create()
+            for start in range(0, len(test_rows), 4000):
+                sketch: PathSketch = TransformationHandler.sketch(
+                    test_rows[start:start + 4000]
+                )
+                merged.merge(PathSketch.from_bytes(sketch.to_bytes()))
+
+        self.assertEqual(merged.rows, 12000)
+        self.assertEqual(
+            [(path, total) for path, total, _, _
+             in merged.iter_estimates(5)],
+            [
+                (path, totals[path]) for path
+                in sorted(totals, key=lambda path: (-totals[path], path))[:5]
+            ]
+        )
+        with self.assertRaises(InvalidParams):
+            merged.merge(PathSketch(10, CountMinSketch(1, 1), 4))
+
+    def test_from_bytes_with_invalid_format(self):
+        """
+        Tests that reading anything but a serialized sketch raises
+        InvalidFormat
+        """
+        data: bytes = PathSketch.create().to_bytes()
+        for invalid_data in [b'', b'{}', data[:-10],
+                             data.replace(b'path-sketch/1', b'other')]:
+            with self.assertRaises(InvalidFormat):
+                PathSketch.from_bytes(invalid_data)
+
+    def test_sketch_files(self):
+        """
+        Tests that sketching files in worker processes, and writing and
+        reading back the sketch, keeps the estimates of a single sketch
+        of all of their rows, with the path patterns applied
+        """
+        header: bytes = b'drop,length,path,user_agent,user_id\n'
+        files: dict[str, bytes] = {
+            'a': header + b'0,1,/b,,2\n0,2,/a,,1\n0,4,/x,,1\n',
+            'b': header + b'0,3,/c,,3\n0,4,/b,,2\n',
+            'c': header + b'0,5,/a,,1\n0,6,/d,,4\n'
+        }
+
+        with LocalCSVServer(files) as server, \
+                tempfile.TemporaryDirectory() as output_path, \
+                patch.object(PivotSelection, 'exclude_paths', '/x'), \
+                patch.object(LoadingService, 'output_file_path', output_path):
+            with patch.object(ExtractionService, 'root_url',
+                              server.root_url):
+                sketch: PathSketch = TransformationHandler.sketch_files(
+                    ['a', 'b', 'c'],
+                    processes=2
+                )
+            LoadingService.load_sketch('top_paths', sketch)
+            sketch = LoadingService.read_sketch('top_paths')
+
+            self.assertEqual(os.listdir(output_path), ['top_paths.sketch'])
+        self.assertEqual(list(sketch.iter_rows(3)), [
+            ['path', 'total_length', 'total_length_error', 'distinct_users'],
+            ['/a', 7, 0, 1],
+            ['/d', 6, 0, 1],
+            ['/b', 5, 0, 1]
+        ])
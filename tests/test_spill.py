@@ -0,0 +1,126 @@
+import os
+import random
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from src.etl.exceptions import InvalidParams
+from src.etl.handlers import TransformationHandler
+from src.etl.metrics import RunMetrics
+from src.etl.pivot import SparsePivot
+from src.etl.selection import PivotSelection
+from src.etl.spill import SpillingAggregator
+
+
+class TestSpillingAggregator(unittest.TestCase):
+    def setUp(self):
+        RunMetrics.reset()
+
+    def generate_rows(self, count: int) -> list[list[str]]:
+        generator = random.Random(count)
+        return [
+            [
+                '0',
+                str(generator.randint(0, 100)),
+                f'/{generator.randint(0, 30)}',
+                '',
+                str(generator.randint(-20, 200))
+            ]
+            for _ in range(count)
+        ]
+
+    def test_pivot(self):
+        """
+        Tests that spilling to disk produces the same pivot as
+        aggregating in memory, and removes its spill files
+        """
+        test_rows: list[list[str]] = self.generate_rows(3000)
+        expected_pivot: SparsePivot = TransformationHandler.pivot(test_rows)
+
+        with tempfile.TemporaryDirectory() as spill_path, \
+                patch.multiple(
+                    TransformationHandler,
+                    memory_budget=5000,
+                    spill_partitions=3,
+                    spill_path=spill_path
+                ):
+            actual_pivot: SparsePivot = TransformationHandler.pivot(test_rows)
+            self.assertEqual(os.listdir(spill_path), [])
+
+        self.assertGreater(RunMetrics.counters['spills'], 1)
+        self.assertEqual(
+            list(actual_pivot.iter_rows()),
+            list(expected_pivot.iter_rows())
+        )
+
+    def test_pivot_with_path_filter(self):
+        """
+        Tests that users first seen on a left out path keep their
+        place when their sums are spilled
+        """
+        test_rows: list[list[str]] = self.generate_rows(2000)
+
+        with patch.object(PivotSelection, 'exclude_paths', '/1'):
+            expected_pivot: SparsePivot = \
+                TransformationHandler.pivot(test_rows)
+            with patch.object(TransformationHandler, 'memory_budget', 3000):
+                actual_pivot: SparsePivot = \
+                    TransformationHandler.pivot(test_rows)
+
+        self.assertEqual(
+            list(actual_pivot.iter_rows()),
+            list(expected_pivot.iter_rows())
+        )
+
+    def test_merge_partials(self):
+        """
+        Tests that merging partials while spilling produces the same
+        pivot as merging them in memory
+        """
+        partials: list[dict[int, dict[str, int]]] = []
+        for count in range(50, 60):
+            sorted_rows, _ = TransformationHandler.sort_rows_by_user_id(
+                TransformationHandler.parse_rows(self.generate_rows(count))
+            )
+            partials.append(sorted_rows)
+        copies: list[dict[int, dict[str, int]]] = [
+            {user_id: dict(paths) for user_id, paths in partial.items()}
+            for partial in partials
+        ]
+
+        expected_pivot: SparsePivot = \
+            TransformationHandler.merge_partials(copies)
+        with patch.object(TransformationHandler, 'memory_budget', 2000):
+            actual_pivot: SparsePivot = \
+                TransformationHandler.merge_partials(partials)
+
+        self.assertEqual(
+            list(actual_pivot.iter_rows()),
+            list(expected_pivot.iter_rows())
+        )
+
+    def test_pivot_without_spilling(self):
+        """
+        Tests that nothing is written to disk within the budget
+        """
+        with SpillingAggregator(10 ** 6, 4, '') as aggregator:
+            aggregator.add_partial({2: {'/b': 1}, 1: {'/a': 2}})
+            aggregator.add_partial({2: {'/a': 3}})
+            pivot: SparsePivot = aggregator.pivot()
+
+            self.assertIsNone(aggregator.directory)
+        self.assertEqual(list(pivot.iter_rows()), [
+            ['user_id', '/a', '/b'],
+            [2, 3, 1],
+            [1, 2, 0]
+        ])
+
+    def test_aggregator_with_invalid_params(self):
+        """
+        Tests that a negative memory budget or no partitions
+        raises InvalidParams
+        """
+        with self.assertRaises(InvalidParams):
+            SpillingAggregator(-1, 4, '')
+        with self.assertRaises(InvalidParams):
+            SpillingAggregator(10 ** 6, 0, '')
@@ -0,0 +1,86 @@
+import os
+import tempfile
+import unittest
+
+from src.etl.state import StateStore
+
+
+class TestStateStore(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+
+    def test_save_partial(self):
+        """
+        Tests that partial pivots and their versions survive
+        being reloaded by a new store
+        """
+        test_partial_rows: dict[int, dict[str, int]] = {1: {'/': 10}}
+        test_version: dict[str, str] = {'etag': '"abc"'}
+        StateStore(self.temp_dir.name).save_partial(
+            'daily/2021-01-01',
+            test_partial_rows,
+            test_version
+        )
+
+        store = StateStore(self.temp_dir.name)
+
+        self.assertTrue(store.is_current('daily/2021-01-01', test_version))
+        self.assertFalse(store.is_current('daily/2021-01-01', {'etag': ''}))
+        self.assertEqual(
+            store.load_partial('daily/2021-01-01'),
+            test_partial_rows
+        )
+
+    def test_is_current_without_validators(self):
+        """
+        Tests that a file without validators is always aggregated again
+        """
+        store = StateStore(self.temp_dir.name)
+        store.save_partial('a', {}, {})
+
+        self.assertFalse(store.is_current('a', {}))
+
+    def test_remove(self):
+        """
+        Tests that removed files are dropped from the manifest and disk
+        """
+        store = StateStore(self.temp_dir.name)
+        store.save_partial('a', {1: {'/': 1}}, {'etag': '"a"'})
+
+        store.remove('a')
+
+        self.assertEqual(StateStore(self.temp_dir.name).manifest, {})
+        self.assertFalse(os.path.exists(store.partial_path('a')))
+
+    def test_resume_run(self):
+        """
+        Tests that the checkpoints of an unfinished run are only
+        kept when resuming, and are discarded once a run finishes
+        """
+        store = StateStore(self.temp_dir.name)
+        store.start_run(resume=True)
+        store.save_partial('a', {1: {'/': 1}}, {})
+        with open(os.path.join(self.temp_dir.name, 'partials', 'b.tmp'), 'w'):
+            pass
+
+        resumed_store = StateStore(self.temp_dir.name)
+
+        self.assertTrue(resumed_store.start_run(resume=True))
+        self.assertEqual(resumed_store.checkpoints, {'a'})
+        self.assertEqual(
+            os.listdir(os.path.join(self.temp_dir.name, 'partials')),
+            [os.path.basename(store.partial_path('a'))]
+        )
+        self.assertFalse(
+            StateStore(self.temp_dir.name).start_run(resume=False)
+        )
+
+        store = StateStore(self.temp_dir.name)
+        store.start_run(resume=True)
+        store.save_partial('a', {1: {'/': 1}}, {})
+        store.finish_run()
+
+        self.assertFalse(
+            StateStore(self.temp_dir.name).start_run(resume=True)
+        )
@@ -0,0 +1,123 @@
+import unittest
+from unittest.mock import patch
+
+from src.etl.exceptions import InvalidParams
+from src.etl.handlers import TransformationHandler
+from src.etl.services import ExtractionService
+from src.etl.useragents import UserAgentClassifier
+
+
+CHROME: str = (
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+    '(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+)
+SAFARI_IPHONE: str = (
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) '
+    'AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 '
+    'Mobile/15E148 Safari/604.1'
+)
+EDGE_ANDROID_TABLET: str = (
+    'Mozilla/5.0 (Linux; Android 13; SM-X700) AppleWebKit/537.36 '
+    '(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36 EdgA/120.0'
+)
+GOOGLEBOT: str = (
+    'Mozilla/5.0 (compatible; Googlebot/2.1; '
+    '+http://www.google.com/bot.html)'
+)
+
+
+class TestUserAgentClassifier(unittest.TestCase):
+    def tearDown(self):
+        UserAgentClassifier.classify = None
+
+    def test_parse(self):
+        """
+        Tests that user agents are classified by device and browser
+        """
+        for user_agent, family in [
+            (CHROME, 'desktop/chrome'),
+            (SAFARI_IPHONE, 'mobile/safari'),
+            (EDGE_ANDROID_TABLET, 'tablet/edge'),
+            (GOOGLEBOT, 'bot'),
+            ('Mozilla/5.0 (Linux; Android 13) Mobile', 'mobile/other'),
+            ('', 'unknown')
+        ]:
+            self.assertEqual(
+                UserAgentClassifier.parse('device-browser', user_agent),
+                family
+            )
+        self.assertEqual(
+            UserAgentClassifier.parse('device', CHROME),
+            'desktop'
+        )
+        self.assertEqual(
+            UserAgentClassifier.parse('browser', CHROME),
+            'chrome'
+        )
+
+    def test_reset_with_invalid_params(self):
+        """
+        Tests that an unknown dimension, an empty cache, or the fast
+        parser, which leaves out user agents, raises InvalidParams
+        """
+        for name, value in [('dimension', 'os'), ('cache_size', 0)]:
+            with patch.object(UserAgentClassifier, name, value):
+                with self.assertRaises(InvalidParams):
+                    UserAgentClassifier.reset()
+        with patch.object(UserAgentClassifier, 'dimension', 'device'), \
+                patch.object(ExtractionService, 'parser', 'fast'):
+            with self.assertRaises(InvalidParams):
+                UserAgentClassifier.reset()
+
+    def test_transform_with_dimension(self):
+        """
+        Tests that both engines split each path by the family of its
+        user agent, classified through the bounded cache
+        """
+        test_rows: list[list[str]] = [
+            ['0', '1', '/a', CHROME, '1'],
+            ['0', '2', '/a', SAFARI_IPHONE, '1'],
+            ['0', '4', '/b', GOOGLEBOT, '2'],
+            ['0', '3', '/a', CHROME, '2'],
+            ['0', '5', '/a', CHROME, '1']
+        ]
+
+        with patch.object(UserAgentClassifier, 'dimension', 'device'), \
+                patch.object(UserAgentClassifier, 'cache_size', 2):
+            for engine in ['row', 'columnar']:
+                UserAgentClassifier.reset()
+                with patch.object(TransformationHandler, 'engine', engine):
+                    self.assertEqual(
+                        TransformationHandler.transform(test_rows),
+                        [
+                            ['user_id', '/a#desktop', '/a#mobile', '/b#bot'],
+                            ['1', '6', '2', '0'],
+                            ['2', '3', '0', '4']
+                        ]
+                    )
+                # the Chrome user agent is evicted by the bot before
+                # it is seen again
+                self.assertEqual(UserAgentClassifier.stats(), {
+                    'hits': 1,
+                    'misses': 4,
+                    'hit_rate': 0.2,
+                    'size': 2,
+                    'max_size': 2
+                })
+
+    def test_drain_and_absorb(self):
+        """
+        Tests that the cache statistics drained from one process
+        are added to those of another
+        """
+        with patch.object(UserAgentClassifier, 'dimension', 'browser'):
+            UserAgentClassifier.reset()
+            UserAgentClassifier.classify(CHROME)
+            UserAgentClassifier.classify(CHROME)
+            drained: tuple[int, int] = UserAgentClassifier.drain()
+
+            self.assertEqual(drained, (1, 1))
+            self.assertEqual(UserAgentClassifier.drain(), (0, 0))
+            UserAgentClassifier.absorb(drained)
+            self.assertEqual(UserAgentClassifier.stats()['hits'], 1)
+            self.assertEqual(UserAgentClassifier.stats()['misses'], 1)